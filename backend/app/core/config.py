@@ -1,8 +1,46 @@
 import os
+from typing import Dict, Optional, Tuple
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+def _parse_model_timeouts(raw: str) -> Dict[str, float]:
+    """解析 "model=秒数,model=秒数" 形式的按模型超时配置"""
+    timeouts = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        model, seconds = item.split("=", 1)
+        try:
+            timeouts[model.strip()] = float(seconds)
+        except ValueError:
+            continue
+    return timeouts
+
+
+def _optional_int(raw: Optional[str]) -> Optional[int]:
+    """未设置或为空时返回 None，表示沿用默认值"""
+    if raw is None or not raw.strip():
+        return None
+    return int(raw)
+
+
+def _parse_model_prices(raw: str) -> Dict[str, Tuple[float, float]]:
+    """解析 "model=输入单价:输出单价,..." 形式的按模型单价配置（每千 token）"""
+    prices = {}
+    for item in raw.split(","):
+        if "=" not in item or ":" not in item:
+            continue
+        model, pair = item.split("=", 1)
+        prompt_price, completion_price = pair.split(":", 1)
+        try:
+            prices[model.strip()] = (float(prompt_price), float(completion_price))
+        except ValueError:
+            continue
+    return prices
+
+
 class Settings:
     PROJECT_NAME: str = "KaoYan MindCoach API"
     PROJECT_VERSION: str = "1.0.0"
@@ -10,17 +48,119 @@ class Settings:
     MONGO_CONNECTION_STRING: str = os.getenv("MONGO_CONNECTION_STRING", "mongodb://localhost:27017")
     MONGO_DB_NAME: str = os.getenv("MONGO_DB_NAME", "kaoyan_mindcoach")
 
+    # 数据库连接：默认本地 SQLite 文件，也可以设为 postgresql+asyncpg://用户:密码@主机:端口/库名
+    DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./kaoyan_mindcoach.db")
+    # 引擎配置档：dev（打印 SQL）/ prod / bench，见 app/db/sqlite_database.py
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "prod")
+    # 连接池大小，未设置时使用配置档中的值
+    DB_POOL_SIZE: Optional[int] = _optional_int(os.getenv("DB_POOL_SIZE"))
+    DB_MAX_OVERFLOW: Optional[int] = _optional_int(os.getenv("DB_MAX_OVERFLOW"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    # 连接最长复用秒数，避免被数据库或中间网络设备断开的空闲连接
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    # asyncpg 每个连接缓存的预编译语句数；经 PgBouncer 事务池连接时设为 0
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+
     SECRET_KEY: str = os.getenv("SECRET_KEY", "super-secret-key")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # 运维接口（/ai/scheduler-stats、/ai/telemetry、/ai/metrics、/emotional-aid/cache-stats）的访问令牌，
+    # 请求头 Authorization: Bearer <令牌>；未设置时这些接口一律拒绝访问
+    OPS_API_TOKEN: Optional[str] = os.getenv("OPS_API_TOKEN") or None
 
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
     
     # DeepSeek API 配置
     DEEPSEEK_API_KEY: str = os.getenv("DEEPSEEK_API_KEY")
     DEEPSEEK_BASE_URL: str = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+    DEEPSEEK_MAX_CONNECTIONS: int = int(os.getenv("DEEPSEEK_MAX_CONNECTIONS", "50"))
+    DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    DEEPSEEK_KEEPALIVE_EXPIRY: float = float(os.getenv("DEEPSEEK_KEEPALIVE_EXPIRY", "90"))
+    DEEPSEEK_CONNECT_RETRIES: int = int(os.getenv("DEEPSEEK_CONNECT_RETRIES", "2"))
     OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
 
+    # LLM 网关连接池配置
+    LLM_MAX_CONNECTIONS: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+    LLM_HTTP2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "1"))
+    LLM_CONNECT_RETRIES: int = int(os.getenv("LLM_CONNECT_RETRIES", "1"))
+    LLM_DEFAULT_TIMEOUT: float = float(os.getenv("LLM_DEFAULT_TIMEOUT", "60"))
+    # 按模型区分的请求超时（秒），视觉模型需要上传图片，明显慢于文本模型
+    LLM_MODEL_TIMEOUTS: Dict[str, float] = _parse_model_timeouts(
+        os.getenv("LLM_MODEL_TIMEOUTS", "qwen-plus=30,qwen-vl-plus=90,qwen3-omni-flash=60,deepseek-v3=120")
+    )
+
+    # 调用遥测的费用估算：每千 token 的输入/输出单价（参考价，以服务商官方价格为准）
+    LLM_MODEL_PRICES: Dict[str, Tuple[float, float]] = _parse_model_prices(
+        os.getenv(
+            "LLM_MODEL_PRICES",
+            "qwen-plus=0.0008:0.002,qwen-vl-plus=0.0015:0.0045,qwen3-omni-flash=0.0018:0.0069,"
+            "deepseek-chat=0.002:0.008,deepseek-v3=0.002:0.008"
+        )
+    )
+    LLM_PRICE_CURRENCY: str = os.getenv("LLM_PRICE_CURRENCY", "CNY")
+
+    # 大模型调度：每个上游服务的并发上限与每分钟 token 预算
+    LLM_DASHSCOPE_MAX_CONCURRENCY: int = int(os.getenv("LLM_DASHSCOPE_MAX_CONCURRENCY", "16"))
+    LLM_DASHSCOPE_TOKENS_PER_MINUTE: int = int(os.getenv("LLM_DASHSCOPE_TOKENS_PER_MINUTE", "300000"))
+    DEEPSEEK_MAX_CONCURRENCY: int = int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "8"))
+    DEEPSEEK_TOKENS_PER_MINUTE: int = int(os.getenv("DEEPSEEK_TOKENS_PER_MINUTE", "200000"))
+    # 低优先级调用最多使用的预算比例、直接放弃的预算使用率阈值、最长排队时间（秒）
+    LLM_LOW_PRIORITY_BUDGET_RATIO: float = float(os.getenv("LLM_LOW_PRIORITY_BUDGET_RATIO", "0.8"))
+    LLM_SHED_THRESHOLD: float = float(os.getenv("LLM_SHED_THRESHOLD", "0.95"))
+    LLM_LOW_PRIORITY_MAX_WAIT: float = float(os.getenv("LLM_LOW_PRIORITY_MAX_WAIT", "20"))
+
+    # 情绪急救 / 场景模拟响应缓存
+    EMOTIONAL_AID_CACHE_TTL: float = float(os.getenv("EMOTIONAL_AID_CACHE_TTL", "1800"))
+    EMOTIONAL_AID_CACHE_MAX_ENTRIES: int = int(os.getenv("EMOTIONAL_AID_CACHE_MAX_ENTRIES", "256"))
+    EMOTIONAL_AID_CACHE_VARIANTS: int = int(os.getenv("EMOTIONAL_AID_CACHE_VARIANTS", "3"))
+    EMOTIONAL_AID_INTENSITY_BUCKET: float = float(os.getenv("EMOTIONAL_AID_INTENSITY_BUCKET", "2"))
+
+    # 消息情绪分析：一次调用同时生成情绪报告与回复（请求可单独指定，解析失败时退回两次调用）
+    MESSENGER_COMBINED_MODE: bool = os.getenv("MESSENGER_COMBINED_MODE", "true").lower() == "true"
+
+    # 画作AI后台任务：worker 数量（即并发调用上限）、排队上限、服务重启打断任务时的最大执行次数
+    AI_JOB_WORKERS: int = int(os.getenv("AI_JOB_WORKERS", "4"))
+    AI_JOB_MAX_PENDING: int = int(os.getenv("AI_JOB_MAX_PENDING", "200"))
+    AI_JOB_MAX_ATTEMPTS: int = int(os.getenv("AI_JOB_MAX_ATTEMPTS", "2"))
+    # 已结束（成功 / 失败）任务的保留天数（0 表示不清理）与清理间隔（秒）
+    AI_JOB_RETENTION_DAYS: int = int(os.getenv("AI_JOB_RETENTION_DAYS", "7"))
+    AI_JOB_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("AI_JOB_SWEEP_INTERVAL_SECONDS", "3600"))
+
+    # /ai/chat 对话记忆：历史上下文 token 预算（含滚动摘要）、摘要长度上限、单次摘要合并的输入上限、
+    # 每次读取的最近历史消息条数、缓存摘要的用户数
+    CHAT_MEMORY_TOKEN_BUDGET: int = int(os.getenv("CHAT_MEMORY_TOKEN_BUDGET", "1500"))
+    CHAT_MEMORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("CHAT_MEMORY_SUMMARY_MAX_TOKENS", "300"))
+    CHAT_MEMORY_SUMMARY_INPUT_BUDGET: int = int(os.getenv("CHAT_MEMORY_SUMMARY_INPUT_BUDGET", "2000"))
+    CHAT_HISTORY_WINDOW: int = int(os.getenv("CHAT_HISTORY_WINDOW", "60"))
+    CHAT_MEMORY_MAX_USERS: int = int(os.getenv("CHAT_MEMORY_MAX_USERS", "1000"))
+
+    # 视觉模型输入图片预处理：最长边像素上限、重新编码格式（JPEG / WEBP）与质量、线程池大小
+    IMAGE_PREPROCESS_ENABLED: bool = os.getenv("IMAGE_PREPROCESS_ENABLED", "true").lower() == "true"
+    IMAGE_PREPROCESS_MAX_SIDE: int = int(os.getenv("IMAGE_PREPROCESS_MAX_SIDE", "1024"))
+    IMAGE_PREPROCESS_FORMAT: str = os.getenv("IMAGE_PREPROCESS_FORMAT", "JPEG")
+    IMAGE_PREPROCESS_QUALITY: int = int(os.getenv("IMAGE_PREPROCESS_QUALITY", "85"))
+    IMAGE_PREPROCESS_WORKERS: int = int(os.getenv("IMAGE_PREPROCESS_WORKERS", "2"))
+
+    # 画作分析感知哈希缓存：近似画作复用分析结果的最大汉明距离（分段索引最多支持 3）
+    PAINTING_ANALYSIS_CACHE_ENABLED: bool = os.getenv("PAINTING_ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+    PAINTING_ANALYSIS_CACHE_MAX_DISTANCE: int = int(os.getenv("PAINTING_ANALYSIS_CACHE_MAX_DISTANCE", "3"))
+    # 墨迹覆盖率低于该值（几乎空白的画布）时不查也不写缓存
+    PAINTING_ANALYSIS_CACHE_MIN_INK: float = float(os.getenv("PAINTING_ANALYSIS_CACHE_MIN_INK", "0.02"))
+
+    # 画作列表（画廊）：默认/最大每页条数、缩略图最长边像素
+    PAINTING_LIST_PAGE_SIZE: int = int(os.getenv("PAINTING_LIST_PAGE_SIZE", "20"))
+    PAINTING_LIST_MAX_PAGE_SIZE: int = int(os.getenv("PAINTING_LIST_MAX_PAGE_SIZE", "100"))
+    PAINTING_THUMBNAIL_SIZE: int = int(os.getenv("PAINTING_THUMBNAIL_SIZE", "256"))
+
+    # 完整画作报告 /paintings/full-report：各分支的超时（秒），analysis 超时后故事和引导不再生成
+    # analysis 依次调用两次 qwen-vl-plus，实际预算不低于两次调用超时之和（见 painting_report.section_timeout）
+    PAINTING_REPORT_TIMEOUTS: Dict[str, float] = _parse_model_timeouts(
+        os.getenv("PAINTING_REPORT_TIMEOUTS", "analysis=190,mind_mirror=90,healing_story=45,mindfulness_guidance=45")
+    )
+
 
 settings = Settings()
 
@@ -0,0 +1,51 @@
+"""
+SQLite / PostgreSQL 兼容工具
+模型和查询只通过这里使用与数据库相关的写法，两种后端共用同一套代码
+"""
+
+from sqlalchemy import JSON, Date
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+# JSON 列：SQLite 存为 TEXT，PostgreSQL 使用 JSONB（二进制存储，读取时不必重新解析文本）
+PortableJSON = JSON().with_variant(postgresql.JSONB(), "postgresql")
+
+
+class day_bucket(FunctionElement):
+    """
+    把时间列截断到日期，用于按天 GROUP BY；结果类型为 Date，两种后端都返回 datetime.date。
+    时间列存的是 UTC，因此按 UTC 日期分组
+    """
+    type = Date()
+    name = "day_bucket"
+    inherit_cache = True
+
+
+@compiles(day_bucket)
+def _compile_day_bucket(element, compiler, **kw):
+    return f"CAST({compiler.process(element.clauses, **kw)} AS DATE)"
+
+
+@compiles(day_bucket, "sqlite")
+def _compile_day_bucket_sqlite(element, compiler, **kw):
+    # SQLite 的时间存为 "YYYY-MM-DD HH:MM:SS" 文本，date() 取日期部分
+    return f"date({compiler.process(element.clauses, **kw)})"
+
+
+_INSERT_BY_DIALECT = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def dialect_insert(session, table):
+    """
+    按会话连接的数据库返回对应方言的 insert 语句，
+    两种方言都支持 on_conflict_do_nothing / on_conflict_do_update(index_elements=...) 和 returning
+    """
+    dialect_name = session.get_bind().dialect.name
+    try:
+        return _INSERT_BY_DIALECT[dialect_name](table)
+    except KeyError:
+        raise NotImplementedError(f"不支持的数据库类型: {dialect_name}")
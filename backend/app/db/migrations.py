@@ -0,0 +1,616 @@
+"""
+数据库版本化迁移
+schema_version 表记录已执行的迁移版本，启动时只执行版本号更高的步骤；
+数据库已是最新版本时只查询一次版本号，不再执行 create_all 和结构反射。
+
+每个迁移步骤都必须可重复执行（中途失败或多个进程同时启动时会被再次执行）：
+- 加列前先检查列是否存在，建索引使用 IF NOT EXISTS
+- 每个索引单独一个事务，PostgreSQL 上使用 CREATE INDEX CONCURRENTLY，不阻塞读写
+- 大表回填按主键游标分批，每批一个事务
+
+新增迁移时在 MIGRATIONS 末尾追加，版本号递增，已发布的步骤不要修改
+"""
+
+import base64
+import binascii
+import hashlib
+import re
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+    JSON, Boolean, Column, Date, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, MetaData, String, Table, Text,
+    bindparam, func, inspect, insert, select, text, update
+)
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+DEFAULT_BATCH_SIZE = 500
+INLINE_IMAGE_BATCH_SIZE = 50
+
+_version_metadata = MetaData()
+schema_version_table = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+class Migration:
+    """一个迁移步骤：upgrade 接收引擎，自行管理事务"""
+
+    def __init__(self, version: int, description: str, upgrade: Callable[[AsyncEngine], Awaitable[None]]):
+        self.version = version
+        self.description = description
+        self.upgrade = upgrade
+
+
+# ---------- 迁移步骤使用的工具函数 ----------
+
+async def add_columns(engine: AsyncEngine, table: str, columns: List[Tuple[str, str]]):
+    """给已有表补齐缺少的列，columns 为 [(列名, 列定义)]"""
+    def _add(sync_conn) -> List[str]:
+        inspector = inspect(sync_conn)
+        if table not in inspector.get_table_names():
+            return []
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        added = []
+        for name, ddl in columns:
+            if name not in existing:
+                sync_conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                added.append(name)
+        return added
+
+    async with engine.begin() as conn:
+        added = await conn.run_sync(_add)
+    if added:
+        print(f"数据库迁移: {table} 新增列 {', '.join(added)}")
+
+
+async def create_index(engine: AsyncEngine, name: str, table: str, columns: Sequence[str], unique: bool = False):
+    """
+    创建索引（已存在时跳过）
+
+    每个索引单独执行，不与其他步骤共用长事务；PostgreSQL 上使用 CONCURRENTLY 在线建索引，
+    需要在事务外执行。SQLite 没有在线建索引，建索引期间只阻塞写入，读取不受影响（WAL 模式）
+    """
+    unique_sql = "UNIQUE " if unique else ""
+    column_sql = ", ".join(columns)
+    if engine.dialect.name == "postgresql":
+        async with engine.connect() as conn:
+            conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(
+                f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_sql})"
+            ))
+        return
+    async with engine.begin() as conn:
+        await conn.execute(text(f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} ON {table} ({column_sql})"))
+
+
+async def backfill_in_batches(
+    engine: AsyncEngine,
+    fetch_batch: Callable[[Any, Any, int], Awaitable[Sequence[Any]]],
+    apply_batch: Callable[[Any, Sequence[Any]], Awaitable[int]],
+    batch_key: Callable[[Any], Any],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    label: str = "回填"
+) -> int:
+    """
+    分批回填大表：fetch_batch(session, 上一批最后的键, batch_size) 取一批待处理记录，
+    apply_batch(session, 记录) 处理并返回处理条数；每批一个事务提交，按键游标前进保证每条只处理一次
+    """
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False)
+    processed = 0
+    last_key = None
+    while True:
+        async with session_factory() as session:
+            rows = await fetch_batch(session, last_key, batch_size)
+            if not rows:
+                break
+            processed += await apply_batch(session, rows)
+            last_key = batch_key(rows[-1])
+            await session.commit()
+    if processed:
+        print(f"数据库迁移: {label} {processed} 条")
+    return processed
+
+
+# ---------- 迁移步骤 ----------
+
+# 迁移 1 建出的表结构按当时的模型固定在这里，之后的表和列由后续迁移添加，不引用会继续演进的 ORM 模型。
+# PostgreSQL 支持晚于迁移 1 加入，PostgreSQL 上首次建库时 JSON 列即为 JSONB、时间列不带时区，这里与之一致
+_v1_metadata = MetaData()
+_V1_JSON = JSON().with_variant(JSONB(), "postgresql")
+Table(
+    "users",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String, unique=True, index=True, nullable=False),
+    Column("username", String, nullable=False),
+    Column("hashed_password", String, nullable=False),
+    Column("exam_date", DateTime, nullable=True),
+    Column("selected_subjects", Text, nullable=True),
+    Column("ai_companion_style", String, nullable=True),
+    Column("created_at", DateTime, server_default=func.now()),
+    Column("is_active", Boolean),
+)
+Table(
+    "messages",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", String, index=True),
+    Column("message_type", String),
+    Column("text_content", Text, nullable=True),
+    Column("audio_path", String, nullable=True),
+    Column("image_path", String, nullable=True),
+    Column("sender", String),
+    Column("emotion_report", _V1_JSON, nullable=True),
+    Column("risk_level", String, nullable=True),
+    Column("ai_reply_text", Text, nullable=True),
+    Column("ai_reply_video_path", String, nullable=True),
+    Column("created_at", DateTime),
+)
+Table(
+    "mood_entries",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("mood", String(50), nullable=False),
+    Column("stress_level", Integer, nullable=False),
+    Column("notes", Text, nullable=True),
+    Column("created_at", DateTime),
+    Index("ix_mood_entries_user_created", "user_id", "created_at"),
+)
+Table(
+    "task_entries",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("text", String(500), nullable=False),
+    Column("completed", Boolean, nullable=False),
+    Column("task_date", Date, nullable=False),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Index("ix_task_entries_user_date", "user_id", "task_date"),
+)
+Table(
+    "calendar_notes",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("note_date", Date, nullable=False, index=True),
+    Column("note_text", Text, nullable=True),
+    Column("color", String(20), nullable=False),
+    Column("progress", Integer, nullable=False),
+    Column("ddl_date", Date, nullable=True),
+    Column("stress_score", Integer, nullable=False),
+    Column("created_at", DateTime),
+    Column("updated_at", DateTime),
+    Index("uq_calendar_notes_user_date", "user_id", "note_date", unique=True),
+)
+Table(
+    "sleep_entries",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("sleep_hours", Float, nullable=False),
+    Column("sleep_date", DateTime, nullable=False),
+    Column("created_at", DateTime),
+    Index("ix_sleep_entries_user_sleep_date", "user_id", "sleep_date"),
+    Index("ix_sleep_entries_user_created", "user_id", "created_at"),
+)
+Table(
+    "painting_entries",
+    _v1_metadata,
+    Column("id", String, primary_key=True),
+    Column("user_id", String, nullable=False),
+    Column("image_data_url", Text, nullable=False),
+    Column("image_hash", String(64), nullable=True, index=True),
+    Column("image_mime", String(50), nullable=True),
+    Column("image_size", Integer, nullable=True),
+    Column("ai_analysis", _V1_JSON, nullable=True),
+    Column("created_at", DateTime, server_default=func.now()),
+    Column("painting_time_seconds", Integer),
+    Column("submitted_at", DateTime),
+    Index("ix_painting_entries_user_created", "user_id", "created_at", "id"),
+)
+Table(
+    "image_blobs",
+    _v1_metadata,
+    Column("hash", String(64), primary_key=True),
+    Column("mime", String(50), nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("thumbnail_hash", String(64), nullable=True),
+    Column("created_at", DateTime, server_default=func.now()),
+)
+Table(
+    "ai_jobs",
+    _v1_metadata,
+    Column("id", String, primary_key=True),
+    Column("kind", String, nullable=False),
+    Column("user_id", String, nullable=False),
+    Column("painting_id", String, nullable=True),
+    Column("status", String, nullable=False),
+    Column("payload", _V1_JSON, nullable=True),
+    Column("result", _V1_JSON, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("attempts", Integer),
+    Column("created_at", DateTime, server_default=func.now()),
+    Column("started_at", DateTime, nullable=True),
+    Column("finished_at", DateTime, nullable=True),
+    Index("ix_ai_jobs_status_created_at", "status", "created_at"),
+    Index("ix_ai_jobs_user_id", "user_id"),
+)
+Table(
+    "painting_analysis_cache",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("cache_key", String(64), nullable=False),
+    Column("dhash", String(16), nullable=False),
+    Column("band0", Integer, nullable=False),
+    Column("band1", Integer, nullable=False),
+    Column("band2", Integer, nullable=False),
+    Column("band3", Integer, nullable=False),
+    Column("painting_id", String, nullable=True),
+    Column("analysis", _V1_JSON, nullable=False),
+    Column("hit_count", Integer),
+    Column("created_at", DateTime, server_default=func.now()),
+    Index("ix_painting_analysis_cache_band0", "cache_key", "band0"),
+    Index("ix_painting_analysis_cache_band1", "cache_key", "band1"),
+    Index("ix_painting_analysis_cache_band2", "cache_key", "band2"),
+    Index("ix_painting_analysis_cache_band3", "cache_key", "band3"),
+)
+Table(
+    "painting_features",
+    _v1_metadata,
+    Column("painting_id", String, primary_key=True),
+    Column("user_id", String, nullable=False),
+    Column("width", Integer),
+    Column("height", Integer),
+    Column("ink_coverage", Float),
+    Column("warm_ratio", Float),
+    Column("cool_ratio", Float),
+    Column("achromatic_ratio", Float),
+    Column("mean_hue", Float),
+    Column("mean_saturation", Float),
+    Column("mean_value", Float),
+    Column("color_diversity", Integer),
+    Column("edge_density", Float),
+    Column("stroke_continuity", Float),
+    Column("center_x", Float),
+    Column("center_y", Float),
+    Column("created_at", DateTime, server_default=func.now()),
+    Index("ix_painting_features_user_created", "user_id", "created_at"),
+)
+Table(
+    "ai_chat_messages",
+    _v1_metadata,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("user_id", String, nullable=False),
+    Column("conversation_id", String, nullable=False),
+    Column("role", String(20), nullable=False),
+    Column("content", Text, nullable=False),
+    Column("created_at", DateTime, nullable=False),
+    Index("ix_ai_chat_messages_user_created", "user_id", "created_at"),
+)
+
+
+async def _initial_schema(engine: AsyncEngine):
+    # 已有的表（迁移工具引入前由 create_all 建出）保持不变，缺失的列和索引由迁移 2-4 补齐
+    async with engine.begin() as conn:
+        await conn.run_sync(_v1_metadata.create_all)
+
+
+async def _calendar_stress_columns(engine: AsyncEngine):
+    # 原 migrate_add_stress_score.py 脚本的内容
+    await add_columns(engine, "calendar_notes", [
+        ("ddl_date", "DATE"),
+        ("stress_score", "INTEGER NOT NULL DEFAULT 0"),
+    ])
+
+
+async def _painting_image_columns(engine: AsyncEngine):
+    await add_columns(engine, "painting_entries", [
+        ("image_hash", "VARCHAR(64)"),
+        ("image_mime", "VARCHAR(50)"),
+        ("image_size", "INTEGER"),
+    ])
+    await add_columns(engine, "image_blobs", [
+        ("thumbnail_hash", "VARCHAR(64)"),
+    ])
+    await create_index(engine, "ix_painting_entries_image_hash", "painting_entries", ["image_hash"])
+    await create_index(engine, "ix_painting_entries_user_created", "painting_entries", ["user_id", "created_at", "id"])
+
+
+async def _journal_user_time_indexes(engine: AsyncEngine):
+    await create_index(engine, "ix_mood_entries_user_created", "mood_entries", ["user_id", "created_at"])
+    await create_index(engine, "ix_task_entries_user_date", "task_entries", ["user_id", "task_date"])
+    await create_index(engine, "ix_sleep_entries_user_sleep_date", "sleep_entries", ["user_id", "sleep_date"])
+    await create_index(engine, "ix_sleep_entries_user_created", "sleep_entries", ["user_id", "created_at"])
+    await create_index(engine, "ix_ai_chat_messages_user_created", "ai_chat_messages", ["user_id", "created_at"])
+
+    # 创建唯一索引前，同一用户同一天的重复备注只保留最新的一条
+    def _has_unique_index(sync_conn) -> bool:
+        return any(
+            index["name"] == "uq_calendar_notes_user_date"
+            for index in inspect(sync_conn).get_indexes("calendar_notes")
+        )
+
+    async with engine.begin() as conn:
+        if not await conn.run_sync(_has_unique_index):
+            result = await conn.execute(text(
+                "DELETE FROM calendar_notes WHERE id NOT IN "
+                "(SELECT MAX(id) FROM calendar_notes GROUP BY user_id, note_date)"
+            ))
+            if result.rowcount:
+                print(f"数据库迁移: 删除 {result.rowcount} 条重复的日历备注")
+    await create_index(engine, "uq_calendar_notes_user_date", "calendar_notes", ["user_id", "note_date"], unique=True)
+
+
+# 迁移 5、6 使用的表结构按当时的版本固定在这里（只包含用到的列），不引用会继续演进的 ORM 模型和服务代码
+_v5_metadata = MetaData()
+_v5_painting_entries = Table(
+    "painting_entries",
+    _v5_metadata,
+    Column("id", String, primary_key=True),
+    Column("image_data_url", Text),
+    Column("image_hash", String(64)),
+    Column("image_mime", String(50)),
+    Column("image_size", Integer),
+)
+_v5_image_blobs = Table(
+    "image_blobs",
+    _v5_metadata,
+    Column("hash", String(64), primary_key=True),
+    Column("mime", String(50)),
+    Column("size", Integer),
+    Column("data", LargeBinary),
+)
+_V5_DATA_URL = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?P<params>(?:;[^,;]*)*),(?P<data>.*)$", re.DOTALL)
+
+
+def _v5_parse_data_url(data_url: str) -> Tuple[str, bytes]:
+    """解析 base64 data URL，返回 (mime, 原始字节)；格式不正确时抛出 ValueError"""
+    match = _V5_DATA_URL.match(data_url.strip()) if data_url else None
+    if not match or ";base64" not in match.group("params"):
+        raise ValueError("图片数据不是 base64 data URL")
+    try:
+        data = base64.b64decode(match.group("data"), validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"图片 base64 解码失败: {e}")
+    if not data:
+        raise ValueError("图片数据为空")
+    return match.group("mime") or "application/octet-stream", data
+
+
+async def _inline_images_to_blobs(engine: AsyncEngine):
+    """把 image_data_url 中的 base64 图片迁移到 image_blobs；无法解析的旧数据保持原样并跳过"""
+    paintings = _v5_painting_entries
+    insert_blob = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}[engine.dialect.name]
+
+    async def fetch_batch(session, last_id, batch_size):
+        result = await session.execute(
+            select(paintings.c.id, paintings.c.image_data_url).where(
+                paintings.c.image_hash.is_(None),
+                paintings.c.image_data_url != "",
+                paintings.c.id > (last_id or "")
+            ).order_by(paintings.c.id).limit(batch_size)
+        )
+        return result.all()
+
+    async def apply_batch(session, rows):
+        migrated = 0
+        for row in rows:
+            try:
+                mime, data = _v5_parse_data_url(row.image_data_url)
+            except ValueError as e:
+                print(f"画作 {row.id} 图片迁移跳过: {e}")
+                continue
+            image_hash = hashlib.sha256(data).hexdigest()
+            await session.execute(
+                insert_blob(_v5_image_blobs)
+                .values(hash=image_hash, mime=mime, size=len(data), data=data)
+                .on_conflict_do_nothing(index_elements=["hash"])
+            )
+            await session.execute(
+                update(paintings).where(paintings.c.id == row.id).values(
+                    image_hash=image_hash, image_mime=mime, image_size=len(data), image_data_url=""
+                )
+            )
+            migrated += 1
+        return migrated
+
+    await backfill_in_batches(
+        engine,
+        fetch_batch,
+        apply_batch,
+        batch_key=lambda row: row.id,
+        batch_size=INLINE_IMAGE_BATCH_SIZE,
+        label="画作图片迁移到 image_blobs"
+    )
+
+
+_v6_metadata = MetaData()
+# 只用于解析 daily_user_stats.user_id 的外键
+_v6_users = Table("users", _v6_metadata, Column("id", Integer, primary_key=True))
+_v6_daily_user_stats = Table(
+    "daily_user_stats",
+    _v6_metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("user_id", Integer, ForeignKey("users.id"), nullable=False),
+    Column("stat_date", Date, nullable=False),
+    Column("mood_count", Integer, nullable=False),
+    Column("stress_level_sum", Integer, nullable=False),
+    Column("top_mood", String(50), nullable=True),
+    Column("sleep_count", Integer, nullable=False),
+    Column("sleep_hours_sum", Float, nullable=False),
+    Column("task_count", Integer, nullable=False),
+    Column("task_completed", Integer, nullable=False),
+    Column("ddl_stress_score", Integer, nullable=True),
+    Column("updated_at", DateTime),
+)
+
+# 各类原始记录按 (用户, 天) 汇总的 SELECT（{day} 替换为按方言截断日期的表达式），以及它负责的汇总列；
+# 日期按 UTC 划分，心情取当天出现次数最多的一种（次数相同取最近记录的）
+_V6_ROLLUPS = [
+    ("""
+        SELECT user_id, day, record_count, stress_total, mood FROM (
+            SELECT user_id, day, mood,
+                ROW_NUMBER() OVER (PARTITION BY user_id, day ORDER BY mood_count DESC, last_at DESC) AS mood_rank,
+                SUM(mood_count) OVER (PARTITION BY user_id, day) AS record_count,
+                SUM(stress_sum) OVER (PARTITION BY user_id, day) AS stress_total
+            FROM (
+                SELECT user_id, {day} AS day, mood, COUNT(*) AS mood_count,
+                    SUM(stress_level) AS stress_sum, MAX(created_at) AS last_at
+                FROM mood_entries WHERE user_id BETWEEN :first_user AND :last_user
+                GROUP BY user_id, {day}, mood
+            ) per_mood
+        ) ranked WHERE mood_rank = 1
+    """, "created_at", ["mood_count", "stress_level_sum", "top_mood"]),
+    ("""
+        SELECT user_id, {day} AS day, COUNT(*), SUM(sleep_hours) FROM sleep_entries
+        WHERE user_id BETWEEN :first_user AND :last_user GROUP BY user_id, {day}
+    """, "sleep_date", ["sleep_count", "sleep_hours_sum"]),
+    ("""
+        SELECT user_id, task_date, COUNT(*), SUM(CASE WHEN completed THEN 1 ELSE 0 END) FROM task_entries
+        WHERE user_id BETWEEN :first_user AND :last_user GROUP BY user_id, task_date
+    """, None, ["task_count", "task_completed"]),
+    ("""
+        SELECT user_id, note_date, MAX(stress_score) FROM calendar_notes
+        WHERE user_id BETWEEN :first_user AND :last_user GROUP BY user_id, note_date
+    """, None, ["ddl_stress_score"]),
+]
+_V6_COUNTERS = ["mood_count", "stress_level_sum", "sleep_count", "sleep_hours_sum", "task_count", "task_completed"]
+
+
+async def _daily_user_stats(engine: AsyncEngine):
+    async with engine.begin() as conn:
+        await conn.run_sync(_v6_metadata.create_all, tables=[_v6_daily_user_stats])
+    await create_index(engine, "uq_daily_user_stats_user_date", "daily_user_stats", ["user_id", "stat_date"], unique=True)
+
+    day_sql = "date({column})" if engine.dialect.name == "sqlite" else "CAST({column} AS DATE)"
+    statements = []
+    for select_sql, day_column, columns in _V6_ROLLUPS:
+        select_sql = select_sql.format(day=day_sql.format(column=day_column)) if day_column else select_sql
+        # 其他来源的计数列先写 0，冲突时只覆盖本来源的列
+        zero_columns = [column for column in _V6_COUNTERS if column not in columns]
+        insert_columns = ["user_id", "stat_date"] + columns + zero_columns + ["updated_at"]
+        statements.append(text(
+            f"INSERT INTO daily_user_stats ({', '.join(insert_columns)}) "
+            f"SELECT source.*, {', '.join(['0'] * len(zero_columns))}, :now "
+            f"FROM ({select_sql}) source WHERE 1 = 1 "
+            f"ON CONFLICT (user_id, stat_date) DO UPDATE SET "
+            + ", ".join(f"{column} = excluded.{column}" for column in columns + ["updated_at"])
+        ).bindparams(bindparam("now", type_=DateTime)))
+
+    async def fetch_batch(session, last_user, batch_size):
+        result = await session.execute(
+            select(_v6_users.c.id).where(_v6_users.c.id > (last_user or 0)).order_by(_v6_users.c.id).limit(batch_size)
+        )
+        return result.scalars().all()
+
+    async def apply_batch(session, user_ids):
+        # 一批用户一个事务：先删除已有汇总行再按原始记录重建，重复执行结果相同
+        params = {"first_user": user_ids[0], "last_user": user_ids[-1], "now": datetime.utcnow()}
+        await session.execute(
+            text("DELETE FROM daily_user_stats WHERE user_id BETWEEN :first_user AND :last_user"),
+            {"first_user": user_ids[0], "last_user": user_ids[-1]}
+        )
+        for statement in statements:
+            await session.execute(statement, params)
+        return len(user_ids)
+
+    await backfill_in_batches(
+        engine,
+        fetch_batch,
+        apply_batch,
+        batch_key=lambda user_id: user_id,
+        label="daily_user_stats 按用户回填"
+    )
+
+
+async def _analysis_cache_painting_index(engine: AsyncEngine):
+    await create_index(engine, "ix_painting_analysis_cache_painting_id", "painting_analysis_cache", ["painting_id"])
+
+
+async def _ai_job_image_hash(engine: AsyncEngine):
+    await add_columns(engine, "ai_jobs", [
+        ("image_hash", "VARCHAR(64)"),
+    ])
+    await create_index(engine, "ix_ai_jobs_image_hash", "ai_jobs", ["image_hash"])
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "创建初始表结构", _initial_schema),
+    Migration(2, "calendar_notes 增加 ddl_date / stress_score", _calendar_stress_columns),
+    Migration(3, "画作图片改为按哈希存储，增加画廊列表索引", _painting_image_columns),
+    Migration(4, "日志类表增加 (user_id, 时间) 复合索引，日历备注 (user_id, note_date) 唯一", _journal_user_time_indexes),
+    Migration(5, "内联 base64 图片分批迁移到 image_blobs", _inline_images_to_blobs),
+    Migration(6, "新增每日汇总表 daily_user_stats 并按现有记录回填", _daily_user_stats),
+    Migration(7, "painting_analysis_cache 增加 painting_id 索引（删除画作时清理缓存）", _analysis_cache_painting_index),
+    Migration(8, "ai_jobs 增加 image_hash（任务图片存入 image_blobs，不再内联在 payload 中）", _ai_job_image_hash),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+
+# ---------- 执行 ----------
+
+async def get_schema_version(engine: AsyncEngine) -> int:
+    """返回已执行的最高版本号，没有版本表时视为 0（只执行一次查询，不做结构反射）"""
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(select(func.max(schema_version_table.c.version)))
+            return result.scalar() or 0
+    except DBAPIError:
+        return 0
+
+
+async def applied_migrations(engine: AsyncEngine) -> Dict[int, datetime]:
+    """返回已执行的迁移及执行时间；只读，没有版本表时返回空字典，不创建版本表"""
+    async with engine.connect() as conn:
+        if not await conn.run_sync(lambda sync_conn: inspect(sync_conn).has_table(schema_version_table.name)):
+            return {}
+        result = await conn.execute(select(schema_version_table.c.version, schema_version_table.c.applied_at))
+        return {row.version: row.applied_at for row in result}
+
+
+async def _record(engine: AsyncEngine, migration: Migration):
+    async with engine.begin() as conn:
+        await conn.run_sync(schema_version_table.create, checkfirst=True)
+        exists = await conn.execute(
+            select(schema_version_table.c.version).where(schema_version_table.c.version == migration.version)
+        )
+        if exists.scalar_one_or_none() is None:
+            await conn.execute(insert(schema_version_table).values(
+                version=migration.version,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+
+
+async def run_migrations(engine: AsyncEngine, target: Optional[int] = None) -> List[int]:
+    """执行所有未执行的迁移（直到 target 版本），返回本次执行的版本号"""
+    target = LATEST_VERSION if target is None else target
+    current = await get_schema_version(engine)
+    if current >= target:
+        return []
+
+    applied = []
+    for migration in MIGRATIONS:
+        if migration.version <= current or migration.version > target:
+            continue
+        print(f"数据库迁移: 执行 {migration.version} - {migration.description}")
+        await migration.upgrade(engine)
+        await _record(engine, migration)
+        applied.append(migration.version)
+    print(f"数据库迁移: 版本 {current} -> {applied[-1] if applied else current}")
+    return applied
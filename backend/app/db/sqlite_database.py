@@ -1,12 +1,128 @@
-import os
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from typing import Any, Dict
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
+from app.core.config import settings
+
+# 数据库URL，默认本地 SQLite 文件；设为 postgresql+asyncpg://... 时使用 PostgreSQL
+DATABASE_URL = settings.DATABASE_URL
+
+# 引擎配置档（DB_PROFILE 选择），连接池大小可以用 DB_POOL_SIZE / DB_MAX_OVERFLOW 覆盖：
+# - dev: 打印全部 SQL，只开 WAL 和锁等待，便于调试
+# - prod: 关闭 SQL 日志；WAL 下读写互不阻塞，synchronous=NORMAL 在 WAL 模式下断电最多丢最近一次提交、不会损坏数据库；
+#   加大页缓存、启用 mmap、临时表放内存
+# - bench: 与 prod 相同但 synchronous=OFF，只用于压测和批量导入，不保证断电安全
+# PostgreSQL 只使用其中的 echo 与连接池大小，pragmas 仅对 SQLite 生效
+_TUNED_PRAGMAS: Dict[str, Any] = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,  # 负数单位为 KiB，即 64MB
+    "mmap_size": 268435456,  # 256MB
+    "temp_store": "MEMORY",
+}
+
+DB_PROFILES: Dict[str, Dict[str, Any]] = {
+    "dev": {
+        "echo": True,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "pragmas": {"journal_mode": "WAL", "busy_timeout": 5000},
+    },
+    "prod": {
+        "echo": False,
+        "pool_size": 10,
+        "max_overflow": 20,
+        "pragmas": _TUNED_PRAGMAS,
+    },
+    "bench": {
+        "echo": False,
+        "pool_size": 20,
+        "max_overflow": 20,
+        "pragmas": {**_TUNED_PRAGMAS, "synchronous": "OFF"},
+    },
+}
+
+
+def _profile_config(profile: str) -> Dict[str, Any]:
+    if profile not in DB_PROFILES:
+        print(f"未知的数据库配置档 {profile}，使用 prod")
+        profile = "prod"
+    return DB_PROFILES[profile]
+
+
+def _pool_options(config: Dict[str, Any]) -> Dict[str, Any]:
+    """连接池参数：配置档的默认值，环境变量设置了的以环境变量为准"""
+    return {
+        "pool_size": settings.DB_POOL_SIZE if settings.DB_POOL_SIZE is not None else config["pool_size"],
+        "max_overflow": settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW is not None else config["max_overflow"],
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def create_sqlite_engine(database_url: str, profile: str) -> AsyncEngine:
+    """按配置档创建 SQLite 异步引擎，每个新连接建立时执行对应的 PRAGMA"""
+    config = _profile_config(profile)
+    # aiosqlite 文件数据库默认使用 NullPool，每次会话都新建连接并重新执行 PRAGMA，这里改为复用连接
+    sqlite_engine = create_async_engine(
+        database_url,
+        echo=config["echo"],
+        poolclass=AsyncAdaptedQueuePool,
+        connect_args={"check_same_thread": False},
+        **_pool_options(config)
+    )
+    pragmas = config["pragmas"]
+
+    @event.listens_for(sqlite_engine.sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return sqlite_engine
+
+
+def create_postgres_engine(database_url: str, profile: str) -> AsyncEngine:
+    """
+    按配置档创建 PostgreSQL（asyncpg）异步引擎
+
+    - pool_pre_ping: 取出连接时先探活，数据库重启或连接被断开后自动换新连接
+    - pool_recycle: 连接最长复用时间
+    - prepared_statement_cache_size: 每个连接缓存预编译语句，相同查询不再重复解析和规划
+    - 会话时区设为 UTC，与模型中不带时区的 UTC 时间、SQLite 的 CURRENT_TIMESTAMP 一致
+    """
+    config = _profile_config(profile)
+    return create_async_engine(
+        database_url,
+        echo=config["echo"],
+        pool_pre_ping=True,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        connect_args={
+            "prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+            "server_settings": {
+                "application_name": "kaoyan_mindcoach",
+                "timezone": "UTC",
+            },
+        },
+        **_pool_options(config)
+    )
+
+
+def create_database_engine(database_url: str, profile: str) -> AsyncEngine:
+    """按 URL 的数据库类型创建引擎，目前支持 sqlite+aiosqlite 与 postgresql+asyncpg"""
+    backend = make_url(database_url).get_backend_name()
+    if backend == "sqlite":
+        return create_sqlite_engine(database_url, profile)
+    if backend == "postgresql":
+        return create_postgres_engine(database_url, profile)
+    raise ValueError(f"不支持的数据库类型: {backend}")
 
-# SQLite数据库URL
-DATABASE_URL = "sqlite+aiosqlite:///./kaoyan_mindcoach.db"
 
 # 创建异步引擎
-engine = create_async_engine(DATABASE_URL, echo=True, connect_args={"check_same_thread": False})
+engine = create_database_engine(DATABASE_URL, settings.DB_PROFILE)
 
 # 创建异步会话工厂
 AsyncSessionLocal = async_sessionmaker(
@@ -19,11 +135,11 @@ AsyncSessionLocal = async_sessionmaker(
 Base = declarative_base()
 
 async def connect_to_sqlite():
-    print("SQLite connection ready!")
+    print(f"Database connection ready! ({engine.dialect.name})")
 
 async def close_sqlite_connection():
     await engine.dispose()
-    print("Disconnected from SQLite!")
+    print(f"Disconnected from database! ({engine.dialect.name})")
 
 async def get_database():
     async with AsyncSessionLocal() as session:
@@ -33,22 +149,6 @@ async def get_database():
             await session.close()
 
 async def create_tables():
-    """创建所有表"""
-    # 只导入SQLAlchemy模型以确保表被创建
-    try:
-        from app.models.sqlite_user import User
-        from app.models.messenger import MessengerEntry  
-        from app.models.mood import MoodEntry
-        from app.models.task import TaskEntry
-        # 注意：以下是 Pydantic 模型，不是 SQLAlchemy 模型，所以不需要导入
-        # - app.models.painting.PaintingEntry
-        # - app.models.report.WeeklyReport  
-        # - app.models.error.ErrorEntry
-        print("成功导入所有SQLAlchemy模型")
-    except ImportError as e:
-        print(f"导入模型时出错: {e}")
-        # 即使导入失败，也要创建基础表结构
-        pass
-    
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
\ No newline at end of file
+    """执行未完成的数据库迁移；已是最新版本时只查询一次版本号"""
+    from app.db.migrations import run_migrations
+    await run_migrations(engine)
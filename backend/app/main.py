@@ -3,6 +3,9 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.db.sqlite_database import connect_to_sqlite, close_sqlite_connection, create_tables
+from app.services.llm_gateway import llm_gateway
+from app.services.ai_jobs import ai_job_queue
+from app.services.llm_telemetry import TelemetryContextMiddleware
 from app.routers import sqlite_auth as auth, users, moods, tasks, ai, errors, reports, paintings, messengers, calendar_notes, sleeps, stress_prescription , emotional_aid
 
 # 导入所有模型以确保数据库表被创建
@@ -11,6 +14,7 @@ from app.models.mood import MoodEntry
 from app.models.task import TaskEntry
 from app.models.calendar_note import CalendarNote
 from app.models.sleep import SleepEntry
+from app.models.daily_user_stats import DailyUserStats
 from app.routers import sqlite_auth as auth, users, moods, tasks, ai, errors, reports, paintings, messengers, tts
 
 app = FastAPI(
@@ -27,14 +31,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 记录当前请求路径，大模型调用遥测按调用接口打标签
+app.add_middleware(TelemetryContextMiddleware)
+
 @app.on_event("startup")
 async def startup_event():
     # 创建数据库表
     await create_tables()
     await connect_to_sqlite()
+    # 创建应用生命周期内复用的大模型连接池
+    await llm_gateway.startup()
+    # 启动画作AI后台任务 worker，并恢复上次未完成的任务
+    await ai_job_queue.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await ai_job_queue.stop()
+    await llm_gateway.aclose()
     await close_sqlite_connection()
 
 # Include routers
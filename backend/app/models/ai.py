@@ -2,6 +2,8 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 
 from pydantic import BaseModel, Field, ConfigDict
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from app.db.sqlite_database import Base
 
 class AIAnalysisResult(BaseModel):
     stress_index: float
@@ -20,3 +22,19 @@ class AIConversation(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+
+
+class AIChatMessageORM(Base):
+    """AI对话消息，只追加不修改；按 (user_id, created_at) 索引读取每个用户最近的消息窗口"""
+    __tablename__ = "ai_chat_messages"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, nullable=False)
+    conversation_id = Column(String, nullable=False)  # 同一次 /ai/chat 请求中的消息共用一个会话ID
+    role = Column(String(20), nullable=False)  # user / assistant
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_ai_chat_messages_user_created", "user_id", "created_at"),
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime, date
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from app.db.sqlite_database import Base
 
@@ -22,3 +22,8 @@ class CalendarNote(Base):
     # 关联到用户
     user = relationship("User", back_populates="calendar_notes")
 
+    # 每个用户每天只有一条备注，创建接口依赖它做 upsert；同时服务于按用户的日期范围查询
+    __table_args__ = (
+        Index("uq_calendar_notes_user_date", "user_id", "note_date", unique=True),
+    )
+
@@ -0,0 +1,28 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index
+from app.db.sqlite_database import Base
+
+class DailyUserStats(Base):
+    """
+    每个用户每天一行的汇总：心情、睡眠、任务、DDL 紧张分数
+    由 app/services/daily_rollup.py 在原始记录写入的同一事务中刷新；图表和压力处方只读这里
+    """
+    __tablename__ = "daily_user_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    stat_date = Column(Date, nullable=False)  # UTC 日期；睡眠按 sleep_date，任务按 task_date，DDL 按 note_date
+    mood_count = Column(Integer, nullable=False, default=0)
+    stress_level_sum = Column(Integer, nullable=False, default=0)  # 平均压力 = stress_level_sum / mood_count
+    top_mood = Column(String(50), nullable=True)  # 当天出现次数最多的心情
+    sleep_count = Column(Integer, nullable=False, default=0)
+    sleep_hours_sum = Column(Float, nullable=False, default=0)
+    task_count = Column(Integer, nullable=False, default=0)
+    task_completed = Column(Integer, nullable=False, default=0)
+    ddl_stress_score = Column(Integer, nullable=True)  # 当天日历备注的紧张分数，没有备注时为空
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    # 刷新时按 (user_id, stat_date) upsert；图表按用户的日期范围读取
+    __table_args__ = (
+        Index("uq_daily_user_stats_user_date", "user_id", "stat_date", unique=True),
+    )
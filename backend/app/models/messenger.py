@@ -1,10 +1,9 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON
-from sqlalchemy.orm import declarative_base
+from sqlalchemy import Column, Integer, String, DateTime, Text
 from pydantic import BaseModel, Field
-
-Base = declarative_base()
+from app.db.compat import PortableJSON
+from app.db.sqlite_database import Base
 
 class MessengerEntry(Base):
     __tablename__ = "messages"
@@ -16,7 +15,7 @@ class MessengerEntry(Base):
     audio_path = Column(String, nullable=True)
     image_path = Column(String, nullable=True)
     sender = Column(String)  # user or ai
-    emotion_report = Column(JSON, nullable=True)  # AI情绪分析报告
+    emotion_report = Column(PortableJSON, nullable=True)  # AI情绪分析报告
     risk_level = Column(String, nullable=True)  # green, yellow, red
     ai_reply_text = Column(Text, nullable=True)
     ai_reply_video_path = Column(String, nullable=True)
@@ -27,6 +26,7 @@ class EmotionReport(BaseModel):
     main_emotions: List[str] = Field(description="主要情绪，如焦虑、疲惫等")
     possible_causes: List[str] = Field(description="可能原因")
     explanation: str = Field(description="分析解释")
+    risk_level: str = Field(default="green", description="风险评估：green, yellow, red")
     risk_keywords: List[str] = Field(default=[], description="风险关键词")
 
 class AIReply(BaseModel):
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.sqlite_database import Base
 
@@ -17,3 +17,8 @@ class MoodEntry(Base):
     # 关系
     user = relationship("User", back_populates="mood_entries")
 
+    # 按用户查询并按时间排序 / 范围过滤（/moods/latest、/moods/weekly-stats 等）
+    __table_args__ = (
+        Index("ix_mood_entries_user_created", "user_id", "created_at"),
+    )
+
@@ -1,6 +1,6 @@
 from datetime import datetime
 from typing import Optional
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.db.sqlite_database import Base
 
@@ -16,3 +16,9 @@ class SleepEntry(Base):
     # 关系
     user = relationship("User", back_populates="sleep_entries")
 
+    # /sleeps/weekly-data 按 sleep_date 范围查询；/sleeps/today 和列表按 created_at 查询
+    __table_args__ = (
+        Index("ix_sleep_entries_user_sleep_date", "user_id", "sleep_date"),
+        Index("ix_sleep_entries_user_created", "user_id", "created_at"),
+    )
+
@@ -1,14 +1,123 @@
-from sqlalchemy import Column, String, Integer, DateTime, JSON, Text
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, Index, LargeBinary
+from sqlalchemy.orm import query_expression
 from sqlalchemy.sql import func
+from app.db.compat import PortableJSON
 from app.db.sqlite_database import Base
 
+# 时间列与其他表一致，统一存 UTC 的不带时区时间；JSON 列使用 PortableJSON，PostgreSQL 上为 JSONB
+
 class PaintingEntryORM(Base):
     __tablename__ = "painting_entries"
     
     id = Column(String, primary_key=True)
     user_id = Column(String, nullable=False)
-    image_data_url = Column(Text, nullable=False)  # 使用Text存储长的base64字符串
-    ai_analysis = Column(JSON, nullable=True)  # 存储AI分析结果的JSON
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # 旧版本直接存 base64 data URL；现在图片存入 image_blobs，这里只在迁移前保留旧数据，新记录为空字符串
+    image_data_url = Column(Text, nullable=False, default="")
+    image_hash = Column(String(64), nullable=True, index=True)  # image_blobs 的 sha256
+    image_mime = Column(String(50), nullable=True)
+    image_size = Column(Integer, nullable=True)  # 原始字节数
+    ai_analysis = Column(PortableJSON, nullable=True)  # 存储AI分析结果的JSON
+    created_at = Column(DateTime, server_default=func.now())
     painting_time_seconds = Column(Integer, default=0)
-    submitted_at = Column(DateTime(timezone=True))
\ No newline at end of file
+    submitted_at = Column(DateTime)
+    # 列表查询时按需计算的字段（是否已有分析结果），不对应实际列
+    has_analysis = query_expression()
+
+    # (user_id, created_at, id) 索引覆盖画廊列表的过滤、排序与游标条件
+    __table_args__ = (
+        Index("ix_painting_entries_user_created", "user_id", "created_at", "id"),
+    )
+
+
+class ImageBlobORM(Base):
+    """按内容 sha256 寻址的图片数据，相同图片只存一份"""
+    __tablename__ = "image_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    mime = Column(String(50), nullable=False)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    thumbnail_hash = Column(String(64), nullable=True)  # 缩略图同样存在本表中，首次请求时生成
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class AIJobORM(Base):
+    """画作相关的后台AI任务，落库保证服务重启后未完成的任务可以继续执行"""
+    __tablename__ = "ai_jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # analyze / story / mind_mirror / guidance
+    user_id = Column(String, nullable=False)
+    painting_id = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="queued")  # queued / running / succeeded / failed
+    payload = Column(PortableJSON, nullable=True)  # 任务参数
+    image_hash = Column(String(64), nullable=True)  # 未关联画作时任务图片在 image_blobs 中的 sha256
+    result = Column(PortableJSON, nullable=True)  # 任务结果
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_ai_jobs_status_created_at", "status", "created_at"),
+        Index("ix_ai_jobs_user_id", "user_id"),
+        Index("ix_ai_jobs_image_hash", "image_hash"),
+    )
+
+
+class PaintingAnalysisCacheORM(Base):
+    """
+    画作分析结果的感知哈希索引
+
+    64 位 dHash 拆成 4 段 16 位分别建索引：汉明距离不超过 3 的两个哈希至少有一段完全相同，
+    查询时按任一段相等取候选，再在候选中计算完整距离
+    """
+    __tablename__ = "painting_analysis_cache"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    cache_key = Column(String(64), nullable=False)  # 绘画模式 + 主题 + 提示词版本
+    dhash = Column(String(16), nullable=False)  # 十六进制
+    band0 = Column(Integer, nullable=False)
+    band1 = Column(Integer, nullable=False)
+    band2 = Column(Integer, nullable=False)
+    band3 = Column(Integer, nullable=False)
+    painting_id = Column(String, nullable=True)
+    analysis = Column(PortableJSON, nullable=False)
+    hit_count = Column(Integer, default=0)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_painting_analysis_cache_band0", "cache_key", "band0"),
+        Index("ix_painting_analysis_cache_band1", "cache_key", "band1"),
+        Index("ix_painting_analysis_cache_band2", "cache_key", "band2"),
+        Index("ix_painting_analysis_cache_band3", "cache_key", "band3"),
+        Index("ix_painting_analysis_cache_painting_id", "painting_id"),
+    )
+
+
+class PaintingFeaturesORM(Base):
+    """画作的本地图像指标（比例类字段均为 0~1），用于提示词事实和统计查询"""
+    __tablename__ = "painting_features"
+
+    painting_id = Column(String, primary_key=True)
+    user_id = Column(String, nullable=False)
+    width = Column(Integer)
+    height = Column(Integer)
+    ink_coverage = Column(Float)
+    warm_ratio = Column(Float)
+    cool_ratio = Column(Float)
+    achromatic_ratio = Column(Float)
+    mean_hue = Column(Float)  # 0~360
+    mean_saturation = Column(Float)
+    mean_value = Column(Float)
+    color_diversity = Column(Integer)  # 占比超过 2% 的色相区间数（共 12 个）
+    edge_density = Column(Float)
+    stroke_continuity = Column(Float)
+    center_x = Column(Float)
+    center_y = Column(Float)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_painting_features_user_created", "user_id", "created_at"),
+    )
@@ -1,6 +1,6 @@
 from datetime import datetime, date
 from typing import Optional
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Date, Index
 from sqlalchemy.orm import relationship
 from app.db.sqlite_database import Base
 
@@ -18,3 +18,8 @@ class TaskEntry(Base):
     # 关联到用户
     user = relationship("User", back_populates="task_entries")
 
+    # 按用户和日期查询（/tasks/today）
+    __table_args__ = (
+        Index("ix_task_entries_user_date", "user_id", "task_date"),
+    )
+
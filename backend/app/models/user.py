@@ -5,7 +5,11 @@ from pydantic import BaseModel, Field, ConfigDict
 
 class UserInDB(BaseModel):
     model_config = ConfigDict(
-        arbitrary_types_allowed=True
+        populate_by_name=True,
+        arbitrary_types_allowed=True,
+        json_encoders={
+            datetime: lambda dt: dt.isoformat()
+        }
     )
     
     id: Optional[str] = Field(alias="_id")
@@ -17,11 +21,3 @@ class UserInDB(BaseModel):
     ai_companion_style: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
-
-    class Config:
-        populate_by_name = True
-        arbitrary_types_allowed = True
-        json_encoders = {
-            datetime: lambda dt: dt.isoformat()
-        }
-
@@ -1,5 +1,6 @@
-import openai
 from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
 from app.schemas.ai import AIAnalysisResultOut, AIChatMessage
 from app.models.ai import AIConversation
 from datetime import date
@@ -20,9 +21,7 @@ async def get_users_input(start_date:date,end_date:date,courses:list[str])->Basi
 async def make_plans(start_date:date,end_date:date,courses:list[str]):
     basic_info = await get_users_input(start_date,end_date,courses)
 
-    if settings.OPENAI_API_KEY:
-        openai.api_key = settings.OPENAI_API_KEY
-    else:
+    if not settings.OPENAI_API_KEY:
         print("Warning: OpenAI API key is not set. AI functionalities will be mocked.")
 
 
@@ -36,7 +35,9 @@ async def make_plans(start_date:date,end_date:date,courses:list[str]):
         )
 
     else:
-        response = openai.chat.completions.create(
+        # 备考计划属于批量生成类调用，接近限流时延后或放弃
+        response = await llm_gateway.chat_completion(
+            priority=Priority.LOW,
             model="deepseek-v3",
             messages=[
                 {"role": "system", "content": "你是一个考研规划助手，擅长根据到考研日期时间情况来规划考生的复习计划。"},
@@ -3,7 +3,16 @@ from fastapi import APIRouter, Depends, HTTPException
 from app.models.user import UserInDB
 from app.schemas.ai import AIAnalysisResultOut, AIChatRequest, AIChatResponse
 from app.services.auth import get_current_active_user
+from app.services.sqlite_auth import require_ops_token
 from app.services.ai import analyze_mood_with_ai, get_ai_chat_response, generate_emergency_guidance, generate_scenario_simulation
+from app.services.llm_gateway import llm_gateway
+from app.services.ai_jobs import ai_job_queue
+from app.services.conversation_memory import conversation_memory
+from app.services.image_preprocess import image_preprocessor
+from app.services.painting_cache import painting_analysis_cache
+from app.services.llm_scheduler import llm_scheduler
+from app.services.llm_telemetry import llm_telemetry
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -52,3 +61,26 @@ async def create_scenario_simulation(
     simulation = await generate_scenario_simulation(request.scenario_type, request.user_concerns)
     return simulation
 
+@router.get("/scheduler-stats", dependencies=[Depends(require_ops_token)])
+async def get_scheduler_stats():
+    """获取大模型调度状态：各优先级队列深度、排队耗时、token 预算使用情况、画作后台任务队列、对话记忆摘要"""
+    return {
+        "providers": llm_scheduler.stats(),
+        "single_flight": llm_gateway.single_flight.stats(),
+        "ai_jobs": ai_job_queue.stats(),
+        "chat_memory": conversation_memory.stats()
+    }
+
+@router.get("/telemetry", dependencies=[Depends(require_ops_token)])
+async def get_llm_telemetry():
+    """获取大模型调用遥测：按模型、调用接口、功能模块统计的首字延迟、耗时、token 用量、错误与估算费用，以及图片预处理节省的上传字节、画作分析缓存命中率"""
+    return {
+        **llm_telemetry.stats(),
+        "image_preprocess": image_preprocessor.stats(),
+        "painting_analysis_cache": painting_analysis_cache.stats()
+    }
+
+@router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_ops_token)])
+async def get_llm_metrics():
+    """以 Prometheus 文本格式导出大模型调用遥测"""
+    return PlainTextResponse(llm_telemetry.prometheus(), media_type="text/plain; version=0.0.4")
@@ -8,7 +8,9 @@ from app.models.sqlite_user import User
 from app.models.calendar_note import CalendarNote
 from app.schemas.calendar_note import CalendarNoteCreate, CalendarNoteUpdate, CalendarNoteOut
 from app.services.sqlite_auth import get_current_active_user
+from app.db.compat import dialect_insert
 from app.db.sqlite_database import get_database
+from app.services.daily_rollup import ROLLUP_DDL, refresh_daily_stats
 
 router = APIRouter()
 
@@ -77,45 +79,31 @@ async def create_calendar_note(
         current_date = date.today()
         stress_score = calculate_stress_score(note.ddl_date, current_date, note.progress)
         
-        # 检查该日期是否已存在备注
-        result = await db.execute(
-            select(CalendarNote).where(
-                and_(
-                    CalendarNote.user_id == current_user.id,
-                    CalendarNote.note_date == note.note_date
-                )
-            )
-        )
-        existing_note = result.scalar_one_or_none()
-        
-        if existing_note:
-            # 如果已存在，更新它
-            existing_note.note_text = note.note_text
-            existing_note.color = note.color
-            existing_note.progress = note.progress
-            existing_note.ddl_date = note.ddl_date
-            existing_note.stress_score = stress_score
-            existing_note.updated_at = datetime.utcnow()
-            await db.commit()
-            await db.refresh(existing_note)
-            return CalendarNoteOut.from_orm(existing_note)
-        else:
-            # 否则创建新的
-            db_note = CalendarNote(
-                user_id=current_user.id,
-                note_date=note.note_date,
-                note_text=note.note_text,
-                color=note.color,
-                progress=note.progress,
-                ddl_date=note.ddl_date,
-                stress_score=stress_score,
-                created_at=datetime.utcnow(),
-                updated_at=datetime.utcnow()
-            )
-            db.add(db_note)
-            await db.commit()
-            await db.refresh(db_note)
-            return CalendarNoteOut.from_orm(db_note)
+        # 同一用户同一天只有一条备注（唯一索引 uq_calendar_notes_user_date），已存在时更新
+        now = datetime.utcnow()
+        values = {
+            "note_text": note.note_text,
+            "color": note.color,
+            "progress": note.progress,
+            "ddl_date": note.ddl_date,
+            "stress_score": stress_score,
+            "updated_at": now,
+        }
+        statement = dialect_insert(db, CalendarNote).values(
+            user_id=current_user.id,
+            note_date=note.note_date,
+            created_at=now,
+            **values
+        ).on_conflict_do_update(
+            index_elements=[CalendarNote.user_id, CalendarNote.note_date],
+            set_=values
+        ).returning(CalendarNote)
+        result = await db.execute(statement, execution_options={"populate_existing": True})
+        # 提交后实例会过期，先转换再提交
+        note_out = CalendarNoteOut.from_orm(result.scalar_one())
+        await refresh_daily_stats(db, current_user.id, [note.note_date], ROLLUP_DDL)
+        await db.commit()
+        return note_out
             
     except Exception as e:
         await db.rollback()
@@ -193,6 +181,7 @@ async def update_calendar_note(
     note.stress_score = calculate_stress_score(note.ddl_date, current_date, note.progress)
     
     note.updated_at = datetime.utcnow()
+    await refresh_daily_stats(db, current_user.id, [note.note_date], ROLLUP_DDL)
     
     await db.commit()
     await db.refresh(note)
@@ -219,7 +208,9 @@ async def delete_calendar_note(
     if not note:
         raise HTTPException(status_code=404, detail="备注不存在")
     
+    note_date = note.note_date
     await db.delete(note)
+    await refresh_daily_stats(db, current_user.id, [note_date], ROLLUP_DDL)
     await db.commit()
     
     return
@@ -245,6 +236,7 @@ async def delete_calendar_note_by_date(
         raise HTTPException(status_code=404, detail="该日期没有备注")
     
     await db.delete(note)
+    await refresh_daily_stats(db, current_user.id, [note_date], ROLLUP_DDL)
     await db.commit()
     
     return
@@ -282,6 +274,7 @@ async def get_stress_scores_by_range(
     # 重新计算所有紧张分数（以防过了一天，分数需要更新）
     current_date = date.today()
     stress_scores = {}
+    changed_dates = []
     
     for note in notes:
         # 重新计算紧张分数
@@ -291,10 +284,12 @@ async def get_stress_scores_by_range(
         if new_stress_score != note.stress_score:
             note.stress_score = new_stress_score
             note.updated_at = datetime.utcnow()
+            changed_dates.append(note.note_date)
         
         stress_scores[str(note.note_date)] = note.stress_score
     
     # 提交更新
+    await refresh_daily_stats(db, current_user.id, changed_dates, ROLLUP_DDL)
     await db.commit()
     
     return stress_scores
@@ -317,7 +312,7 @@ async def recalculate_all_stress_scores(
         notes = result.scalars().all()
         
         current_date = date.today()
-        updated_count = 0
+        changed_dates = []
         
         for note in notes:
             # 重新计算紧张分数
@@ -327,9 +322,11 @@ async def recalculate_all_stress_scores(
             if new_stress_score != note.stress_score:
                 note.stress_score = new_stress_score
                 note.updated_at = datetime.utcnow()
-                updated_count += 1
+                changed_dates.append(note.note_date)
         
+        await refresh_daily_stats(db, current_user.id, changed_dates, ROLLUP_DDL)
         await db.commit()
+        updated_count = len(changed_dates)
         
         return {
             "message": f"成功重新计算 {updated_count} 条日历备注的紧张分数",
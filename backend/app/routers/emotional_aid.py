@@ -1,6 +1,10 @@
+import json
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.services.ai import generate_emergency_guidance, generate_scenario_simulation
+from app.services.ai import generate_emergency_guidance, generate_scenario_simulation, stream_emergency_guidance
+from app.services.ai_cache import get_cache_stats
+from app.services.sqlite_auth import require_ops_token
 from typing import Optional
 
 router = APIRouter(prefix="/emotional-aid", tags=["Emotional Aid"])
@@ -37,6 +41,33 @@ async def get_emergency_guidance(request: EmergencyRequest):
         raise HTTPException(status_code=500, detail=f"生成急救指导失败: {str(e)}")
 
 
+@router.post("/emergency-guidance/stream")
+async def get_emergency_guidance_stream(request: EmergencyRequest):
+    """
+    流式获取90秒情绪急救指导（SSE）
+
+    每个字段生成完成即发送 {"type": "field", "key": ..., "value": ...}，voice_script 最先到达，可直接交给 TTS；
+    最后发送 {"type": "result", "data": ...} 完整结果与 [DONE]
+    """
+    async def stream_generator():
+        async for event in stream_emergency_guidance(
+            emotion_state=request.emotion_state,
+            intensity=request.intensity
+        ):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        stream_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
 @router.post("/scenario-simulation")
 async def get_scenario_simulation(request: ScenarioRequest):
     """获取场景模拟指导"""
@@ -53,6 +84,15 @@ async def get_scenario_simulation(request: ScenarioRequest):
         raise HTTPException(status_code=500, detail=f"生成场景模拟失败: {str(e)}")
 
 
+@router.get("/cache-stats", dependencies=[Depends(require_ops_token)])
+async def get_emotional_aid_cache_stats():
+    """获取急救指导 / 场景模拟缓存的命中统计"""
+    return {
+        "success": True,
+        "data": get_cache_stats()
+    }
+
+
 @router.post("/breathing-exercise")
 async def get_breathing_exercise(request: BreathingExerciseRequest):
     """获取呼吸练习配置"""
@@ -1,16 +1,16 @@
 import os
 import base64
 import asyncio
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_
 from app.models.user import UserInDB
 from app.models.messenger import MessengerEntry, EmotionReport, AIReply
 from app.schemas.messenger import MessengerCreate, MessengerOut, EmotionAnalysisResponse, MessageHistoryResponse
 from app.services.auth import get_current_active_user
-from app.db.sqlite_database import get_database
+from app.db.sqlite_database import get_database, AsyncSessionLocal
 from app.services.messenger_ai import messenger_ai_service
 from app.services.crisis_intervention import crisis_intervention_service
 import json
@@ -25,10 +25,15 @@ async def send_message(
     anonymous_mode: bool = Form(False),
     audio_file: UploadFile = File(None),
     image_file: UploadFile = File(None),
+    combined_mode: Optional[bool] = Form(None),
     current_user: Annotated[UserInDB, Depends(get_current_active_user)] = None,
     db: AsyncSession = Depends(get_database)
 ):
-    """发送多模态消息并获取AI分析回复"""
+    """
+    发送多模态消息并获取AI分析回复
+
+    combined_mode: 是否一次调用同时完成情绪分析与回复生成，不传时使用服务端配置
+    """
     try:
         # 处理匿名模式
         user_id = "anonymous" if anonymous_mode else str(current_user.id)
@@ -58,19 +63,11 @@ async def send_message(
         await db.flush()  # 获取ID
         
         # AI情绪分析
-        audio_features = None
-        image_analysis = None
-        
-        if audio_path:
-            # 这里应该分析音频特征（语速、音调等）
-            audio_features = {"speed": "正常", "pitch": "中等", "volume": "中等"}
-        
-        if image_path:
-            # 这里应该分析图像内容
-            image_analysis = {"description": "用户上传的图片"}
+        audio_features, image_analysis = extract_modal_features(audio_path, image_path)
         
-        emotion_report = await messenger_ai_service.analyze_emotion(
-            text_content or "", audio_features, image_analysis
+        # 情绪分析与AI回复生成（合并模式下为一次调用）
+        emotion_report, ai_reply = await messenger_ai_service.analyze_and_reply(
+            text_content or "", audio_features, image_analysis, combined=combined_mode
         )
         
         # 危机评估
@@ -81,22 +78,8 @@ async def send_message(
         # 获取危机干预资源
         crisis_resources = crisis_intervention_service.get_crisis_resources(risk_level)
         
-        # 生成AI回复（包含危机干预信息）
-        ai_reply = await messenger_ai_service.generate_ai_reply(emotion_report, text_content or "")
-        
         # 如果是高风险，添加立即响应
-        if risk_level == "red":
-            immediate_response = crisis_intervention_service.get_immediate_response(risk_level)
-            ai_reply.empathy_text = immediate_response + "\n\n" + ai_reply.empathy_text
-            ai_reply.resource_links.extend([
-                resource["name"] + ": " + resource["phone"] 
-                for resource in crisis_resources["resources"]["hotlines"]
-            ])
-        elif risk_level == "yellow":
-            ai_reply.resource_links.extend([
-                resource["name"] 
-                for resource in crisis_resources["resources"]["online_resources"]
-            ])
+        apply_crisis_intervention(ai_reply, risk_level, crisis_resources)
         
         # 生成视频回复
         video_content = await messenger_ai_service.generate_video_reply(ai_reply)
@@ -131,6 +114,143 @@ async def send_message(
         await db.rollback()
         raise HTTPException(status_code=500, detail=f"处理消息失败: {str(e)}")
 
+@router.post("/send-message/stream")
+async def send_message_stream(
+    message_type: str = Form(...),
+    text_content: str = Form(None),
+    anonymous_mode: bool = Form(False),
+    audio_file: UploadFile = File(None),
+    image_file: UploadFile = File(None),
+    combined_mode: Optional[bool] = Form(None),
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)] = None
+):
+    """
+    发送多模态消息并以流式（SSE）获取AI分析回复
+
+    combined_mode: 是否一次调用同时完成情绪分析与回复生成，不传时使用服务端配置；
+    合并模式下情绪报告字段生成完成即发送，不必等待回复部分
+
+    事件顺序：
+    1. {"type": "emotion_report", ...}  情绪分析与危机评估结果，解析完成后立即发送
+    2. {"type": "reply_delta", "content": ...}  AI回复的文本片段，随模型输出逐段发送；
+       高风险（red）时第一个片段就是危机干预提示，与最终 empathy_text 的开头一致
+       {"type": "reply_field", "key": ..., "value": ...}  回复的单个字段（如 practical_tips）生成完成即发送，已含危机干预调整
+       {"type": "reply_reset"}  之前收到的 reply_delta / reply_field 作废（生成中途失败，重新生成或改用默认回复），
+       之后重新发送回复片段
+    3. {"type": "ai_reply", ...}  完整的结构化回复（含危机干预信息）与消息ID
+    4. [DONE]
+    """
+    user_id = "anonymous" if anonymous_mode else str(current_user.id)
+
+    # 上传文件需在返回响应前读取完毕
+    audio_path = await save_uploaded_file(audio_file, "audio") if audio_file else None
+    image_path = await save_uploaded_file(image_file, "image") if image_file else None
+    audio_features, image_analysis = extract_modal_features(audio_path, image_path)
+
+    async def stream_generator():
+        try:
+            emotion_report = None
+            risk_level = None
+            crisis_resources = None
+            ai_reply = None
+            async for event in messenger_ai_service.stream_analyze_and_reply(
+                text_content or "", audio_features, image_analysis, combined=combined_mode
+            ):
+                if event["type"] == "emotion_report":
+                    emotion_report = event["report"]
+                    risk_level = crisis_intervention_service.assess_risk_level(
+                        text_content or "", emotion_report.dict()
+                    )
+                    crisis_resources = crisis_intervention_service.get_crisis_resources(risk_level)
+
+                    report_data = {
+                        'type': 'emotion_report',
+                        'data': {
+                            'emotion_report': emotion_report.dict(),
+                            'risk_level': risk_level,
+                            'crisis_resources': crisis_resources if risk_level in ["red", "yellow"] else None
+                        }
+                    }
+                    yield f"data: {json.dumps(report_data, ensure_ascii=False)}\n\n"
+                    # 危机干预提示会加在 empathy_text 前面，先于模型生成的正文发出
+                    prefix = crisis_reply_prefix(risk_level)
+                    if prefix:
+                        yield f"data: {json.dumps({'type': 'reply_delta', 'content': prefix}, ensure_ascii=False)}\n\n"
+                elif event["type"] == "reset":
+                    yield f"data: {json.dumps({'type': 'reply_reset'}, ensure_ascii=False)}\n\n"
+                    prefix = crisis_reply_prefix(risk_level)
+                    if prefix:
+                        yield f"data: {json.dumps({'type': 'reply_delta', 'content': prefix}, ensure_ascii=False)}\n\n"
+                elif event["type"] == "delta":
+                    delta_data = {'type': 'reply_delta', 'content': event["content"]}
+                    yield f"data: {json.dumps(delta_data, ensure_ascii=False)}\n\n"
+                elif event["type"] == "reply_field":
+                    value = crisis_field_value(event["key"], event["value"], risk_level, crisis_resources)
+                    field_data = {'type': 'reply_field', 'key': event["key"], 'value': value}
+                    yield f"data: {json.dumps(field_data, ensure_ascii=False)}\n\n"
+                else:
+                    ai_reply = event["reply"]
+
+            apply_crisis_intervention(ai_reply, risk_level, crisis_resources)
+            video_content = await messenger_ai_service.generate_video_reply(ai_reply)
+
+            # 流式响应开始后请求级会话可能已关闭，这里单独打开会话保存记录
+            async with AsyncSessionLocal() as db:
+                try:
+                    message_entry = MessengerEntry(
+                        user_id=user_id,
+                        message_type=message_type,
+                        text_content=text_content,
+                        audio_path=audio_path,
+                        image_path=image_path,
+                        sender="user",
+                        emotion_report=emotion_report.dict(),
+                        risk_level=risk_level,
+                        ai_reply_text=video_content,
+                        created_at=datetime.utcnow()
+                    )
+                    ai_message = MessengerEntry(
+                        user_id=user_id,
+                        message_type="text",
+                        text_content=video_content,
+                        sender="ai",
+                        created_at=datetime.utcnow()
+                    )
+                    db.add_all([message_entry, ai_message])
+                    # 提交后属性会过期，先 flush 取出 id
+                    await db.flush()
+                    message_id = message_entry.id
+                    await db.commit()
+                except Exception as e:
+                    await db.rollback()
+                    print(f"保存消息失败: {e}")
+                    message_id = None
+
+            reply_data = {
+                'type': 'ai_reply',
+                'data': {
+                    'message_id': message_id,
+                    'ai_reply': ai_reply.dict(),
+                    'video_url': None
+                }
+            }
+            yield f"data: {json.dumps(reply_data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            error_data = {'type': 'error', 'message': f"处理消息失败: {str(e)}"}
+            yield f"data: {json.dumps(error_data, ensure_ascii=False)}\n\n"
+
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        stream_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get("/history", response_model=MessageHistoryResponse)
 async def get_message_history(
     current_user: Annotated[UserInDB, Depends(get_current_active_user)],
@@ -303,6 +423,49 @@ async def save_uploaded_file(file: UploadFile, file_type: str) -> str:
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"文件保存失败: {str(e)}")
 
+def extract_modal_features(audio_path: Optional[str], image_path: Optional[str]):
+    """提取语音与图像特征，返回 (audio_features, image_analysis)"""
+    audio_features = None
+    image_analysis = None
+    
+    if audio_path:
+        # 这里应该分析音频特征（语速、音调等）
+        audio_features = {"speed": "正常", "pitch": "中等", "volume": "中等"}
+    
+    if image_path:
+        # 这里应该分析图像内容
+        image_analysis = {"description": "用户上传的图片"}
+    
+    return audio_features, image_analysis
+
+def crisis_reply_prefix(risk_level: Optional[str]) -> str:
+    """高风险时加在 empathy_text 前面的立即响应（含分隔空行），其他等级为空字符串"""
+    if risk_level == "red":
+        return crisis_intervention_service.get_immediate_response(risk_level) + "\n\n"
+    return ""
+
+def crisis_field_value(key: str, value, risk_level: Optional[str], crisis_resources: Optional[dict]):
+    """按风险等级调整AI回复的单个字段；流式发送的 reply_field 与最终回复共用这一处理"""
+    if key == "empathy_text":
+        return crisis_reply_prefix(risk_level) + value
+    if key == "resource_links":
+        if risk_level == "red":
+            return value + [
+                resource["name"] + ": " + resource["phone"] 
+                for resource in crisis_resources["resources"]["hotlines"]
+            ]
+        if risk_level == "yellow":
+            return value + [
+                resource["name"] 
+                for resource in crisis_resources["resources"]["online_resources"]
+            ]
+    return value
+
+def apply_crisis_intervention(ai_reply: AIReply, risk_level: str, crisis_resources: dict):
+    """根据风险等级在AI回复中加入立即响应与求助资源"""
+    for key in ("empathy_text", "resource_links"):
+        setattr(ai_reply, key, crisis_field_value(key, getattr(ai_reply, key), risk_level, crisis_resources))
+
 def determine_risk_level(emotion_report: EmotionReport) -> str:
     """确定风险等级"""
     if emotion_report.risk_keywords:
@@ -1,5 +1,5 @@
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, func
 from app.models.sqlite_user import User
@@ -7,6 +7,8 @@ from app.schemas.mood import MoodCreate, MoodOut
 from app.services.sqlite_auth import get_current_active_user
 from app.db.sqlite_database import get_database, AsyncSessionLocal
 from app.models.mood import MoodEntry
+from app.services.daily_rollup import ROLLUP_MOOD, load_daily_stats, refresh_daily_stats
+from app.services.stats_queries import DEFAULT_WINDOW_DAYS, MAX_WINDOW_DAYS, weekday_name, window_days
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -24,6 +26,7 @@ async def create_mood_entry(
     
     mood_entry = MoodEntry(**mood_data)
     db.add(mood_entry)
+    await refresh_daily_stats(db, current_user.id, [mood_data['created_at'].date()], ROLLUP_MOOD)
     await db.commit()
     await db.refresh(mood_entry)
     
@@ -64,62 +67,34 @@ async def get_latest_mood(
 
 @router.get("/weekly-scores")
 async def get_weekly_mood_scores(
-    current_user: Annotated[User, Depends(get_current_active_user)]
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    days: int = Query(DEFAULT_WINDOW_DAYS, ge=1, le=MAX_WINDOW_DAYS)
 ):
     """
-    获取近7天的心情得分（简化版）
-    返回格式：[{date: "周一", score: 7.5}, ...]
+    获取近 days 天（默认7天）的心情得分，读取每日汇总表
+    返回格式：[{date: "2025-01-01", weekday: "周一", score: 7.5, count: 2}, ...]
     """
     try:
-        one_week_ago = datetime.utcnow() - timedelta(days=7)
-        
+        dates = window_days(days)
         async with AsyncSessionLocal() as db:
-            # 查询近7天的情绪记录
-            result = await db.execute(
-                select(MoodEntry)
-                .where(
-                    MoodEntry.user_id == current_user.id,
-                    MoodEntry.created_at >= one_week_ago
-                )
-                .order_by(MoodEntry.created_at)
-            )
-            moods = result.scalars().all()
-            
-            # 按日期分组
-            daily_scores = {}
-            for mood in moods:
-                date_key = mood.created_at.date()
-                if date_key not in daily_scores:
-                    daily_scores[date_key] = []
-                daily_scores[date_key].append(mood.stress_level)
-            
-            # 生成结果
-            scores = []
-            weekday_names = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-            
-            for i in range(6, -1, -1):
-                date = (datetime.utcnow() - timedelta(days=i)).date()
-                weekday = weekday_names[date.weekday()]
-                
-                if date in daily_scores:
-                    avg_score = sum(daily_scores[date]) / len(daily_scores[date])
-                    count = len(daily_scores[date])
-                else:
-                    avg_score = 5.0
-                    count = 0
-                
-                scores.append({
-                    'date': str(date),
-                    'weekday': weekday,
-                    'score': round(avg_score, 1),
-                    'count': count
-                })
-            
-            return {
-                'success': True,
-                'data': scores
-            }
-            
+            daily_stats = await load_daily_stats(db, current_user.id, dates[0])
+
+        scores = []
+        for date in dates:
+            row = daily_stats.get(date)
+            has_data = row is not None and row.mood_count > 0
+            scores.append({
+                'date': str(date),
+                'weekday': weekday_name(date),
+                'score': round(row.stress_level_sum / row.mood_count, 1) if has_data else 5.0,
+                'count': row.mood_count if has_data else 0
+            })
+
+        return {
+            'success': True,
+            'data': scores
+        }
+
     except Exception as e:
         print(f"❌ 获取心情得分失败: {str(e)}")
         import traceback
@@ -133,74 +108,35 @@ async def get_weekly_mood_scores(
 
 @router.get("/weekly-stats")
 async def get_weekly_mood_stats(
-    current_user: Annotated[User, Depends(get_current_active_user)]
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    days: int = Query(DEFAULT_WINDOW_DAYS, ge=1, le=MAX_WINDOW_DAYS)
 ):
     """
-    获取近一周的情绪统计数据
-    返回每天的平均压力等级，用于压力雷达图表
+    获取近 days 天（默认一周）的情绪统计数据
+    返回每天的平均压力等级和出现最多的心情，用于压力雷达图表；读取每日汇总表，不扫描原始记录
     """
     try:
-        # 计算一周前的日期
-        one_week_ago = datetime.utcnow() - timedelta(days=7)
-        
-        # 手动创建数据库会话
+        dates = window_days(days)
         async with AsyncSessionLocal() as db:
-            # 获取近一周的所有情绪记录
-            result = await db.execute(
-                select(MoodEntry)
-                .where(
-                    MoodEntry.user_id == current_user.id,
-                    MoodEntry.created_at >= one_week_ago
-                )
-                .order_by(MoodEntry.created_at)
-            )
-            moods = result.scalars().all()
-        
-            # 按日期分组统计
-            daily_stats = {}
-            for mood in moods:
-                # 获取日期（不包含时间）
-                date_key = mood.created_at.date()
-                
-                if date_key not in daily_stats:
-                    daily_stats[date_key] = {
-                        'stress_levels': [],
-                        'moods': []
-                    }
-                
-                daily_stats[date_key]['stress_levels'].append(mood.stress_level)
-                daily_stats[date_key]['moods'].append(mood.mood)
-            
-            # 生成近7天的数据（即使某天没有记录也要显示）
-            weekly_data = []
-            for i in range(6, -1, -1):  # 从6天前到今天
-                date = (datetime.utcnow() - timedelta(days=i)).date()
-                
-                if date in daily_stats:
-                    # 计算当天的平均压力等级
-                    avg_stress = sum(daily_stats[date]['stress_levels']) / len(daily_stats[date]['stress_levels'])
-                    most_common_mood = max(set(daily_stats[date]['moods']), key=daily_stats[date]['moods'].count)
-                else:
-                    # 如果当天没有记录，使用默认值
-                    avg_stress = 5
-                    most_common_mood = 'calm'
-                
-                # 格式化日期为星期几
-                weekday_names = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-                weekday = weekday_names[date.weekday()]
-                
-                weekly_data.append({
-                    'date': str(date),
-                    'weekday': weekday,
-                    'avg_stress_level': round(avg_stress, 2),
-                    'mood': most_common_mood,
-                    'record_count': len(daily_stats.get(date, {}).get('stress_levels', []))
-                })
-            
-            return {
-                'weekly_data': weekly_data,
-                'total_records': len(moods)
-            }
+            daily_stats = await load_daily_stats(db, current_user.id, dates[0])
+
+        # 没有记录的日期也要显示，使用默认值
+        weekly_data = []
+        for date in dates:
+            row = daily_stats.get(date)
+            has_data = row is not None and row.mood_count > 0
+            weekly_data.append({
+                'date': str(date),
+                'weekday': weekday_name(date),
+                'avg_stress_level': round(row.stress_level_sum / row.mood_count, 2) if has_data else 5,
+                'mood': row.top_mood if has_data else 'calm',
+                'record_count': row.mood_count if has_data else 0
+            })
+
+        return {
+            'weekly_data': weekly_data,
+            'total_records': sum(day['record_count'] for day in weekly_data)
+        }
     except Exception as e:
         print(f"❌ 获取周情绪数据时出错: {str(e)}")
         print(f"错误类型: {type(e).__name__}")
@@ -247,7 +183,9 @@ async def delete_mood(
     if not mood:
         raise HTTPException(status_code=404, detail="Mood entry not found")
     
+    mood_day = mood.created_at.date()
     await db.delete(mood)
+    await refresh_daily_stats(db, current_user.id, [mood_day], ROLLUP_MOOD)
     await db.commit()
     return
 
@@ -1,18 +1,93 @@
-from typing import Annotated, List, Dict, Any, Optional
+import base64
+import binascii
+import json
+from typing import Annotated, List, Dict, Any, Optional, Tuple
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from app.models.user import UserInDB
-from app.schemas.painting import PaintingCreate, PaintingOut
+from app.schemas.painting import PaintingCreate, PaintingOut, PaintingPage, PaintingSummaryOut
+from app.core.config import settings
 from app.services.auth import get_current_active_user, get_current_user
 from app.db.sqlite_database import AsyncSessionLocal
 from app.models.painting import PaintingEntry
-from app.models.sqlite_models import PaintingEntryORM
+from app.models.sqlite_models import PaintingAnalysisCacheORM, PaintingEntryORM, PaintingFeaturesORM
 from app.services.ai import analyze_painting_with_qwen_vl, generate_mindfulness_guidance, generate_healing_story, generate_mind_mirror
+from app.services.ai_jobs import ai_job_queue, job_to_dict, JobError, JobQueueFullError, JOB_KINDS
+from app.services.image_store import get_image, get_thumbnail, image_url, release_image, store_painting_image, thumbnail_url
+from app.services.painting_cache import painting_analysis_cache
+from app.services.painting_report import build_full_report
 from pydantic import BaseModel
+from sqlalchemy import and_, delete, or_
+from sqlalchemy.orm import defer, load_only, with_expression
 
 router = APIRouter()
 
+# 图片内容不可变，按哈希长期缓存
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+
+def _painting_out(entry: PaintingEntryORM) -> PaintingOut:
+    return PaintingOut(
+        id=entry.id,
+        user_id=entry.user_id,
+        image_hash=entry.image_hash,
+        image_url=image_url(entry.image_hash),
+        image_mime=entry.image_mime,
+        image_size=entry.image_size,
+        painting_time_seconds=entry.painting_time_seconds or 0,
+        ai_analysis=entry.ai_analysis,
+        created_at=entry.created_at,
+        submitted_at=entry.submitted_at
+    )
+
+
+def _encode_cursor(entry: PaintingEntryORM) -> str:
+    raw = json.dumps([entry.created_at.isoformat(), entry.id])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, painting_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(painting_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def _image_response(blob, etag: str, request: Request) -> Response:
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=blob.data, media_type=blob.mime, headers=headers)
+
+
+async def _save_painting(
+    session,
+    painting_id: str,
+    user_id: str,
+    image_data_url: str,
+    painting_time_seconds: int,
+    now: datetime
+) -> PaintingEntryORM:
+    """图片存入 blob 表后创建画作记录（同一事务，由调用方提交）"""
+    db_entry = PaintingEntryORM(
+        id=painting_id,
+        user_id=user_id,
+        created_at=now,
+        painting_time_seconds=painting_time_seconds,
+        submitted_at=now
+    )
+    try:
+        await store_painting_image(session, db_entry, image_data_url)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    session.add(db_entry)
+    return db_entry
+
+
 @router.post("/", response_model=PaintingOut)
 async def create_painting_entry(
     painting: PaintingCreate,
@@ -23,28 +98,19 @@ async def create_painting_entry(
         painting_id = str(uuid.uuid4())
         now = datetime.utcnow()
         
-        db_entry = PaintingEntryORM(
-            id=painting_id,
-            user_id=str(current_user.id),
-            image_data_url=painting.image_data_url,
-            painting_time_seconds=painting.painting_time_seconds,
-            created_at=now,
-            submitted_at=now
+        db_entry = await _save_painting(
+            session,
+            painting_id,
+            str(current_user.id),
+            painting.image_data_url,
+            painting.painting_time_seconds,
+            now
         )
-        
-        session.add(db_entry)
         await session.commit()
         await session.refresh(db_entry)
         
         # 转换为PaintingOut返回
-        return PaintingOut(
-            id=db_entry.id,
-            user_id=db_entry.user_id,
-            image_data_url=db_entry.image_data_url,
-            painting_time_seconds=db_entry.painting_time_seconds,
-            submitted_at=db_entry.submitted_at,
-            ai_analysis=db_entry.ai_analysis
-        )
+        return _painting_out(db_entry)
 
 @router.get("/", response_model=List[PaintingOut])
 async def get_user_paintings(
@@ -55,21 +121,73 @@ async def get_user_paintings(
         result = await session.execute(
             select(PaintingEntryORM).where(
                 PaintingEntryORM.user_id == str(current_user.id)
+            ).options(
+                defer(PaintingEntryORM.image_data_url)
             ).order_by(PaintingEntryORM.created_at.desc())
         )
         painting_entries = result.scalars().all()
         
-        return [
-            PaintingOut(
+        return [_painting_out(entry) for entry in painting_entries]
+
+@router.get("/list", response_model=PaintingPage)
+async def list_user_paintings(
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)],
+    limit: int = Query(settings.PAINTING_LIST_PAGE_SIZE, ge=1, le=settings.PAINTING_LIST_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """
+    画廊列表：按创建时间倒序分页，只返回元数据和缩略图地址
+
+    只加载列表需要的列（图片和分析 JSON 不读取），按 (created_at, id) 游标翻页，
+    走 (user_id, created_at, id) 索引，每页耗时与历史画作数量无关；完整内容通过 /paintings/{id} 按需获取
+    """
+    from sqlalchemy import select
+
+    statement = select(PaintingEntryORM).where(
+        PaintingEntryORM.user_id == str(current_user.id)
+    ).options(
+        load_only(
+            PaintingEntryORM.id,
+            PaintingEntryORM.image_hash,
+            PaintingEntryORM.image_size,
+            PaintingEntryORM.painting_time_seconds,
+            PaintingEntryORM.created_at,
+            PaintingEntryORM.submitted_at
+        ),
+        with_expression(PaintingEntryORM.has_analysis, PaintingEntryORM.ai_analysis.isnot(None))
+    ).order_by(
+        PaintingEntryORM.created_at.desc(), PaintingEntryORM.id.desc()
+    ).limit(limit + 1)
+
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        statement = statement.where(or_(
+            PaintingEntryORM.created_at < cursor_created_at,
+            and_(PaintingEntryORM.created_at == cursor_created_at, PaintingEntryORM.id < cursor_id)
+        ))
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(statement)
+        entries = result.scalars().all()
+
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    return PaintingPage(
+        items=[
+            PaintingSummaryOut(
                 id=entry.id,
-                user_id=entry.user_id,
-                image_data_url=entry.image_data_url,
-                painting_time_seconds=entry.painting_time_seconds,
-                submitted_at=entry.submitted_at,
-                ai_analysis=entry.ai_analysis
+                image_url=image_url(entry.image_hash),
+                thumbnail_url=thumbnail_url(entry.image_hash),
+                image_size=entry.image_size,
+                painting_time_seconds=entry.painting_time_seconds or 0,
+                has_analysis=bool(entry.has_analysis),
+                created_at=entry.created_at,
+                submitted_at=entry.submitted_at
             )
-            for entry in painting_entries
-        ]
+            for entry in entries
+        ],
+        next_cursor=_encode_cursor(entries[-1]) if has_more else None
+    )
 
 @router.get("/{painting_id}", response_model=PaintingOut)
 async def get_painting_by_id(
@@ -82,21 +200,68 @@ async def get_painting_by_id(
         result = await session.execute(
             select(PaintingEntryORM).where(
                 PaintingEntryORM.id == painting_id
-            )
+            ).options(defer(PaintingEntryORM.image_data_url))
         )
         entry = result.scalar_one_or_none()
         
         if not entry or entry.user_id != str(current_user.id):
             raise HTTPException(status_code=404, detail="Painting entry not found")
         
-        return PaintingOut(
-            id=entry.id,
-            user_id=entry.user_id,
-            image_data_url=entry.image_data_url,
-            painting_time_seconds=entry.painting_time_seconds,
-            submitted_at=entry.submitted_at,
-            ai_analysis=entry.ai_analysis
+        return _painting_out(entry)
+
+async def _require_image_owner(image_hash: str, current_user: UserInDB):
+    """只有拥有引用该图片的画作的用户才能读取；其他情况一律 404，不暴露图片是否存在"""
+    from sqlalchemy import select
+
+    async with AsyncSessionLocal() as session:
+        owned = await session.scalar(
+            select(
+                select(PaintingEntryORM.id).where(
+                    PaintingEntryORM.user_id == str(current_user.id),
+                    PaintingEntryORM.image_hash == image_hash
+                ).exists()
+            )
         )
+    if not owned:
+        raise HTTPException(status_code=404, detail="图片不存在")
+
+@router.get("/images/{image_hash}")
+async def get_painting_image(
+    image_hash: str,
+    request: Request,
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)]
+):
+    """
+    按内容哈希返回画作图片（只能读取自己画作的图片）
+
+    哈希即内容，使用强 ETag 并允许长期缓存；If-None-Match 命中时返回 304
+    """
+    await _require_image_owner(image_hash, current_user)
+    etag = f'"{image_hash}"'
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return _image_response(None, etag, request)
+
+    blob = await get_image(image_hash)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return _image_response(blob, etag, request)
+
+@router.get("/images/{image_hash}/thumbnail")
+async def get_painting_thumbnail(
+    image_hash: str,
+    request: Request,
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)]
+):
+    """
+    画廊缩略图，首次请求时生成并保存（只能读取自己画作的缩略图，按原图哈希校验）
+
+    ETag 由缩略图自身的内容哈希决定；客户端已缓存时仍需一次主键查询确认缩略图哈希
+    """
+    await _require_image_owner(image_hash, current_user)
+    blob = await get_thumbnail(image_hash)
+    if blob is None:
+        raise HTTPException(status_code=404, detail="图片不存在")
+    return _image_response(blob, f'"{blob.hash}"', request)
 
 class PaintingAnalysisRequest(BaseModel):
     image_data_url: str
@@ -138,29 +303,30 @@ async def analyze_painting(
             created_at=now
         )
         
-        # 使用SQLAlchemy ORM插入数据
+        # 使用SQLAlchemy ORM插入数据，图片存入 blob 表
         async with AsyncSessionLocal() as session:
-            db_entry = PaintingEntryORM(
-                id=painting_id,
-                user_id=user_id,
-                image_data_url=request.image_data_url,
-                created_at=now,
-                painting_time_seconds=request.painting_time_seconds,
-                submitted_at=now
+            db_entry = await _save_painting(
+                session,
+                painting_id,
+                user_id,
+                request.image_data_url,
+                request.painting_time_seconds,
+                now
             )
-            session.add(db_entry)
             await session.commit()
             await session.refresh(db_entry)
             
         print(f"[ANALYZE ENDPOINT] 已保存绘画记录，ID: {painting_id}")
         
         print("[ANALYZE ENDPOINT] 调用AI服务分析画作...")
-        # 调用AI服务分析画作
-        analysis_result = await analyze_painting_with_qwen_vl(
+        # 调用AI服务分析画作；本接口未认证，所有调用方共用同一个测试用户，
+        # 不传用户 ID，避免不同学生之间复用近似画作的分析结果
+        analysis_result = await painting_analysis_cache.analyze(
             request.image_data_url,
             request.painting_mode,
             request.theme,
-            local_analysis=None
+            painting_id=painting_id,
+            user_id=None
         )
         
         print(f"[ANALYZE ENDPOINT] 收到AI服务响应")
@@ -214,6 +380,58 @@ async def analyze_painting(
             "mood_analysis": {}
         }
 
+@router.post("/full-report")
+async def create_full_painting_report(
+    request: PaintingAnalysisRequest,
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)]
+):
+    """
+    一次请求生成完整画作报告（SSE）
+
+    保存画作后先发送 {"type": "painting", "painting_id": ...}；分析、心灵镜像、疗愈故事、正念引导并发生成，
+    每完成一项发送一次 {"type": "section", ...}，最后发送 {"type": "report", ...} 和 [DONE]；
+    合并后的结果写入画作的 ai_analysis，之后可通过 GET /paintings/{id} 获取
+    """
+    import uuid
+    user_id = str(current_user.id)
+    painting_id = str(uuid.uuid4())
+    now = datetime.utcnow()
+
+    async with AsyncSessionLocal() as session:
+        await _save_painting(
+            session,
+            painting_id,
+            user_id,
+            request.image_data_url,
+            request.painting_time_seconds,
+            now
+        )
+        await session.commit()
+
+    async def stream_generator():
+        yield f"data: {json.dumps({'type': 'painting', 'painting_id': painting_id}, ensure_ascii=False)}\n\n"
+        async for event in build_full_report(
+            painting_id,
+            user_id,
+            request.image_data_url,
+            request.painting_mode,
+            request.theme,
+            request.painting_time_seconds,
+            now
+        ):
+            yield f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        stream_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.delete("/{painting_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_painting(
     painting_id: str,
@@ -232,7 +450,11 @@ async def delete_painting(
         if not entry:
             raise HTTPException(status_code=404, detail="Painting entry not found")
         
+        # 派生数据（本地特征、以该画作为来源的分析缓存）与画作在同一事务中删除
+        await session.execute(delete(PaintingFeaturesORM).where(PaintingFeaturesORM.painting_id == entry.id))
+        await session.execute(delete(PaintingAnalysisCacheORM).where(PaintingAnalysisCacheORM.painting_id == entry.id))
         await session.delete(entry)
+        await release_image(session, entry.image_hash, entry.id)
         await session.commit()
 
 
@@ -530,3 +752,124 @@ async def analyze_painting_test(request: dict):
         "analysis_result": "测试分析结果"
     }
 
+
+class PaintingJobRequest(BaseModel):
+    kind: str  # analyze / story / mind_mirror / guidance
+    painting_id: Optional[str] = None
+    image_data_url: Optional[str] = None
+    painting_mode: str = "free_drawing"
+    theme: Optional[str] = None
+    painting_time_seconds: int = 0
+    analysis_result: Optional[Dict[str, Any]] = None
+
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_painting_job(
+    request: PaintingJobRequest,
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)]
+) -> Dict[str, Any]:
+    """
+    提交画作AI后台任务，立即返回任务ID
+
+    - analyze: 未指定 painting_id 时先用 image_data_url 创建画作记录
+    - story / mind_mirror: 指定 painting_id 时结果写回该画作，否则只保存在任务结果中
+    - guidance: 需要已完成分析的 painting_id
+    通过 GET /jobs/{job_id} 轮询或 GET /jobs/{job_id}/events 订阅结果
+    """
+    if request.kind not in JOB_KINDS:
+        raise HTTPException(status_code=400, detail=f"不支持的任务类型: {request.kind}")
+
+    user_id = str(current_user.id)
+    painting_id = request.painting_id
+    payload: Dict[str, Any] = {}
+    image_data_url = None
+
+    async with AsyncSessionLocal() as session:
+        from sqlalchemy import select
+        if painting_id:
+            result = await session.execute(
+                select(PaintingEntryORM.id).where(
+                    PaintingEntryORM.id == painting_id,
+                    PaintingEntryORM.user_id == user_id
+                )
+            )
+            if result.scalar_one_or_none() is None:
+                raise HTTPException(status_code=404, detail="画作不存在")
+        elif request.kind == "analyze":
+            if not request.image_data_url:
+                raise HTTPException(status_code=400, detail="缺少必要的图片数据")
+            import uuid
+            painting_id = str(uuid.uuid4())
+            await _save_painting(
+                session,
+                painting_id,
+                user_id,
+                request.image_data_url,
+                request.painting_time_seconds,
+                datetime.utcnow()
+            )
+            await session.commit()
+        elif request.kind == "guidance":
+            raise HTTPException(status_code=400, detail="缺少画作ID")
+
+    if request.kind == "analyze":
+        payload = {"painting_mode": request.painting_mode, "theme": request.theme}
+    elif request.kind in ("story", "mind_mirror"):
+        if not painting_id and not request.image_data_url:
+            raise HTTPException(status_code=400, detail="缺少必要的图片数据")
+        if not painting_id:
+            # 图片由任务队列存入 image_blobs，任务记录只保存哈希
+            image_data_url = request.image_data_url
+        if request.analysis_result:
+            payload["analysis_result"] = request.analysis_result
+
+    try:
+        return await ai_job_queue.submit(
+            request.kind, user_id, painting_id=painting_id, payload=payload, image_data_url=image_data_url
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except JobError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/jobs/{job_id}")
+async def get_painting_job(
+    job_id: str,
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)]
+) -> Dict[str, Any]:
+    """查询任务状态，完成后 result 中为结果"""
+    job = await ai_job_queue.get(job_id)
+    if not job or job.user_id != str(current_user.id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job_to_dict(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_painting_job_events(
+    job_id: str,
+    current_user: Annotated[UserInDB, Depends(get_current_active_user)]
+):
+    """
+    订阅任务状态（SSE）
+
+    先发送当前状态，之后每次状态变化发送一次 {"type": "status", "job": ...}，任务结束后发送 [DONE]
+    """
+    job = await ai_job_queue.get(job_id)
+    if not job or job.user_id != str(current_user.id):
+        raise HTTPException(status_code=404, detail="任务不存在")
+
+    async def stream_generator():
+        async for snapshot in ai_job_queue.subscribe(job_id):
+            yield f"data: {json.dumps({'type': 'status', 'job': snapshot}, ensure_ascii=False)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(
+        stream_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
@@ -1,5 +1,5 @@
 from typing import Annotated, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, desc, and_
 from app.models.sqlite_user import User
@@ -7,6 +7,8 @@ from app.schemas.sleep import SleepCreate, SleepOut
 from app.services.sqlite_auth import get_current_active_user
 from app.db.sqlite_database import get_database, AsyncSessionLocal
 from app.models.sleep import SleepEntry
+from app.services.daily_rollup import ROLLUP_SLEEP, load_daily_stats, refresh_daily_stats
+from app.services.stats_queries import DEFAULT_WINDOW_DAYS, MAX_WINDOW_DAYS, weekday_name, window_days
 from datetime import datetime, timedelta
 
 router = APIRouter()
@@ -67,6 +69,7 @@ async def create_sleep_entry(
     )
     
     db.add(sleep_entry)
+    await refresh_daily_stats(db, current_user.id, [sleep_date.date()], ROLLUP_SLEEP)
     await db.commit()
     await db.refresh(sleep_entry)
     
@@ -104,57 +107,36 @@ async def get_today_sleep_entry(
 
 @router.get("/weekly-data")
 async def get_weekly_sleep_data(
-    current_user: Annotated[User, Depends(get_current_active_user)]
+    current_user: Annotated[User, Depends(get_current_active_user)],
+    days: int = Query(DEFAULT_WINDOW_DAYS, ge=1, le=MAX_WINDOW_DAYS)
 ):
     """
-    获取近7天的睡眠时长数据
+    获取近 days 天（默认7天）的睡眠时长数据，读取每日汇总表
     返回格式：[{date: "2025-01-01", sleep_hours: 7.5, weekday: "周一"}, ...]
     如果某天没有数据，默认显示7小时
     """
     try:
-        one_week_ago = datetime.utcnow() - timedelta(days=7)
-        
+        dates = window_days(days)
         async with AsyncSessionLocal() as db:
-            # 查询近7天的睡眠记录
-            result = await db.execute(
-                select(SleepEntry)
-                .where(
-                    SleepEntry.user_id == current_user.id,
-                    SleepEntry.sleep_date >= one_week_ago
-                )
-                .order_by(SleepEntry.sleep_date)
-            )
-            sleep_entries = result.scalars().all()
-            
-            # 按日期组织数据
-            sleep_data = {}
-            for entry in sleep_entries:
-                date_key = entry.sleep_date.date()
-                sleep_data[date_key] = entry.sleep_hours
-            
-            # 生成近7天的数据
-            weekly_data = []
-            weekday_names = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
-            
-            for i in range(6, -1, -1):
-                date = (datetime.utcnow() - timedelta(days=i)).date()
-                weekday = weekday_names[date.weekday()]
-                
+            sleep_data = await load_daily_stats(db, current_user.id, dates[0])
+
+        weekly_data = []
+        for date in dates:
+            row = sleep_data.get(date)
+            has_data = row is not None and row.sleep_count > 0
+            weekly_data.append({
+                'date': str(date),
+                'weekday': weekday_name(date),
                 # 如果没有数据，默认显示7小时
-                sleep_hours = sleep_data.get(date, 7.0)
-                
-                weekly_data.append({
-                    'date': str(date),
-                    'weekday': weekday,
-                    'sleep_hours': sleep_hours,
-                    'has_data': date in sleep_data
-                })
-            
-            return {
-                'success': True,
-                'data': weekly_data
-            }
-            
+                'sleep_hours': row.sleep_hours_sum / row.sleep_count if has_data else 7.0,
+                'has_data': has_data
+            })
+
+        return {
+            'success': True,
+            'data': weekly_data
+        }
+
     except Exception as e:
         print(f"❌ 获取睡眠数据失败: {str(e)}")
         import traceback
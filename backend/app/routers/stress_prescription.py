@@ -10,7 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, and_
 
 from app.models.sqlite_user import User
-from app.models.calendar_note import CalendarNote
+from app.models.daily_user_stats import DailyUserStats
 from app.models.sleep import SleepEntry
 from app.models.mood import MoodEntry
 from app.services.sqlite_auth import get_current_active_user
@@ -35,19 +35,20 @@ async def generate_prescription(
     4. 心理情绪压力
     """
     try:
-        # 1. 获取 DDL 平均紧张分数（最近 7 天有任务的）
+        # 1. 获取 DDL 平均紧张分数（今天及以后有任务的），读取每日汇总表
         today = date.today()
         result = await db.execute(
-            select(func.avg(CalendarNote.stress_score))
+            select(func.avg(DailyUserStats.ddl_stress_score))
             .where(
                 and_(
-                    CalendarNote.user_id == current_user.id,
-                    CalendarNote.stress_score > 0,
-                    CalendarNote.note_date >= today
+                    DailyUserStats.user_id == current_user.id,
+                    DailyUserStats.ddl_stress_score > 0,
+                    DailyUserStats.stat_date >= today
                 )
             )
         )
-        avg_ddl_score = result.scalar() or 0
+        # PostgreSQL 上 AVG(integer) 返回 Decimal，转成 float 便于计算和序列化
+        avg_ddl_score = float(result.scalar() or 0)
         
         # 2. 获取最近的睡眠时长
         result = await db.execute(
@@ -8,6 +8,7 @@ from app.schemas.task import TaskCreate, TaskUpdate, TaskOut
 from app.services.sqlite_auth import get_current_active_user
 from app.db.sqlite_database import get_database
 from app.models.task import TaskEntry
+from app.services.daily_rollup import ROLLUP_TASK, refresh_daily_stats
 
 router = APIRouter()
 
@@ -31,6 +32,7 @@ async def create_task(
         )
         
         db.add(db_task)
+        await refresh_daily_stats(db, current_user.id, [task_date], ROLLUP_TASK)
         await db.commit()
         await db.refresh(db_task)
         
@@ -112,6 +114,7 @@ async def update_task(
             db_task.completed = task_update.completed
         
         db_task.updated_at = datetime.utcnow()
+        await refresh_daily_stats(db, current_user.id, [db_task.task_date], ROLLUP_TASK)
         
         await db.commit()
         await db.refresh(db_task)
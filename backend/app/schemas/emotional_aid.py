@@ -0,0 +1,14 @@
+from typing import List, Literal
+from pydantic import BaseModel, Field
+
+# 大模型结构化输出的校验模型，缺失或无效字段由调用方补默认值
+
+class EmergencyGuidanceOutput(BaseModel):
+    voice_script: str = Field(min_length=1, description="语音引导词")
+    visual_prompt: str = Field(min_length=1, description="视觉场景描述")
+    music_type: Literal["nature_sounds", "relaxing_piano", "meditation_bell"] = "nature_sounds"
+
+class ScenarioSimulationOutput(BaseModel):
+    preparation_steps: List[str] = Field(min_length=1, description="具体准备步骤")
+    mindset_guidance: str = Field(min_length=1, description="心态调整指导")
+    visualization_script: str = Field(min_length=1, description="可视化引导脚本")
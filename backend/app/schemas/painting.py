@@ -1,4 +1,4 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from pydantic import BaseModel, ConfigDict
 
@@ -6,12 +6,32 @@ class PaintingCreate(BaseModel):
     image_data_url: str
     painting_time_seconds: int = 0
 
-class PaintingOut(PaintingCreate):
+class PaintingOut(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     
     id: str
     user_id: str
+    image_hash: Optional[str] = None
+    image_url: Optional[str] = None  # 图片通过 /paintings/images/{hash} 单独获取
+    image_mime: Optional[str] = None
+    image_size: Optional[int] = None
+    painting_time_seconds: int = 0
     ai_analysis: Optional[Dict[str, Any]] = None
-    created_at: datetime
+    created_at: Optional[datetime] = None
+    submitted_at: Optional[datetime] = None
+
+
+class PaintingSummaryOut(BaseModel):
+    """画廊列表项：只含元数据和缩略图地址，完整分析通过 /paintings/{id} 按需获取"""
+    id: str
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    image_size: Optional[int] = None
+    painting_time_seconds: int = 0
+    has_analysis: bool = False
+    created_at: Optional[datetime] = None
     submitted_at: Optional[datetime] = None
 
+class PaintingPage(BaseModel):
+    items: List[PaintingSummaryOut]
+    next_cursor: Optional[str] = None  # 为空表示没有更多
@@ -1,10 +1,8 @@
 import os
 import asyncio
-import httpx
 import random
 from dotenv import load_dotenv
-from openai import OpenAI
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator, Tuple
 
 # 确保.env文件存在且正确加载
 print(f"当前工作目录: {os.getcwd()}")
@@ -26,35 +24,25 @@ print(f"OPENAI_API_BASE值: {openai_api_base or '未设置，将使用默认值'
 # 然后再导入settings，确保环境变量已加载
 from app.core.config import settings
 from app.schemas.ai import AIAnalysisResultOut, AIChatMessage
-from app.db.database import get_database
-from app.models.ai import AIConversation
 
-# 初始化客户端 - 完全复制test.py的初始化方式
-client = None
-try:
-    # 直接从os获取环境变量，与test.py完全一致
-    api_key = openai_api_key
-    api_base = openai_api_base or "https://dashscope.aliyuncs.com/compatible-mode/v1"
-    
-    print(f"初始化客户端 - API Key前10位: {api_key[:10]}..." if api_key else "API Key未设置")
-    print(f"使用的端点: {api_base}")
-    
-    # 创建自定义HTTP客户端，与test.py完全一致
-    http_client = httpx.Client(timeout=120.0)  # 增加超时时间以避免网络问题
-    client = OpenAI(
-        api_key=api_key,
-        base_url=api_base,
-        http_client=http_client,
-    )
-    print("OpenAI客户端初始化成功")
-except Exception as e:
-    print(f"OpenAI客户端初始化失败: {e}")
-    import traceback
-    traceback.print_exc()
-    client = None
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
+from app.services.conversation_memory import conversation_memory
+from app.services.chat_history import append_messages, load_recent_turns
+from app.services.image_preprocess import image_preprocessor
+from app.services.painting_features import describe_features, features_to_analysis_data
+from app.services.ai_cache import (
+    emergency_guidance_cache,
+    scenario_simulation_cache,
+    emergency_guidance_key,
+    scenario_simulation_key,
+    quantize_intensity,
+)
+from app.services.json_stream import is_complete, iter_json_fields, parse_json_text, validate_field, validate_fields
+from app.schemas.emotional_aid import EmergencyGuidanceOutput, ScenarioSimulationOutput
 
 async def analyze_mood_with_ai(text: str) -> AIAnalysisResultOut:
-    if not settings.OPENAI_API_KEY or not client:
+    if not llm_gateway.is_available():
         print("OpenAI API key not set. Returning mock AI analysis.")
         return AIAnalysisResultOut(
             stress_index=0.5,
@@ -64,7 +52,8 @@ async def analyze_mood_with_ai(text: str) -> AIAnalysisResultOut:
         )
     try:
         # 使用客户端实例调用API，适应SDK 1.3.5版本
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat_completion(
+            priority=Priority.NORMAL,
             model="qwen-plus",
             messages=[
                 {"role": "system", "content": "你是一个心理健康助手，擅长分析用户情绪并提供建议。"},
@@ -112,149 +101,77 @@ async def analyze_mood_with_ai(text: str) -> AIAnalysisResultOut:
             intervention_suggestion="建议进行深呼吸练习。"
         )
 
+EMERGENCY_GUIDANCE_DEFAULTS = {
+    "voice_script": "请深呼吸，吸气4秒，保持4秒，呼气6秒。重复这个过程，让自己平静下来。",
+    "visual_prompt": "一片宁静的森林，阳光透过树叶洒下斑驳的光影",
+    "music_type": "nature_sounds",
+}
+
+SCENARIO_SIMULATION_DEFAULTS = {
+    "preparation_steps": ["深呼吸调整", "明确目标", "积极暗示"],
+    "mindset_guidance": "相信自己的能力，一步步来",
+    "visualization_script": "想象自己成功完成目标的场景",
+}
+
+
+def _build_emergency_guidance_messages(emotion_state: str, intensity: float) -> List[Dict[str, Any]]:
+    """构建急救指导提示词，voice_script 放在最前面，流式输出时可以最先交给 TTS"""
+    return [
+        {
+            "role": "system", 
+            "content": "你是专业的心理危机干预师。请严格按照JSON格式回复，包含voice_script(语音引导词)、visual_prompt(视觉场景描述)、music_type(音乐类型)三个字段。音乐类型只能从nature_sounds、relaxing_piano、meditation_bell中选择。"
+        },
+        {
+            "role": "user", 
+            "content": f"为{emotion_state}情绪(强度{intensity}/10)设计90秒急救方案。请回复JSON格式：{{\"voice_script\": \"温和具体的呼吸和放松引导词\", \"visual_prompt\": \"平静自然场景描述\", \"music_type\": \"适合的音乐类型\"}}"
+        }
+    ]
+
+
+def _finalize_emergency_guidance(data: Dict[str, Any]) -> dict:
+    """校验急救指导字段，缺失或无效的字段使用默认值"""
+    guidance = validate_fields(EmergencyGuidanceOutput, data, EMERGENCY_GUIDANCE_DEFAULTS)
+    return {**guidance.model_dump(), "duration": 90}
+
+
 async def generate_emergency_guidance(emotion_state: str, intensity: float) -> dict:
     """生成90秒情绪急救指导"""
-    if not settings.OPENAI_API_KEY or not client:
-        return {
-            "voice_script": "请深呼吸，吸气4秒，保持4秒，呼气6秒。重复这个过程，让自己平静下来。",
-            "visual_prompt": "一片宁静的森林，阳光透过树叶洒下斑驳的光影",
-            "music_type": "nature_sounds",
-            "duration": 90
-        }
+    if not llm_gateway.is_available():
+        return {**EMERGENCY_GUIDANCE_DEFAULTS, "duration": 90}
     
+    # 相同情绪 + 同一强度区间直接复用缓存的回复；并发未命中时只调用一次大模型
+    cache_key = emergency_guidance_key(emotion_state, intensity)
+    # 提示词使用区间中点，保证同一缓存键下的回复一致
+    _, intensity = quantize_intensity(intensity)
+    return await emergency_guidance_cache.get_or_generate(
+        cache_key, lambda: _request_emergency_guidance(emotion_state, intensity)
+    )
+
+
+async def _request_emergency_guidance(emotion_state: str, intensity: float) -> Tuple[dict, bool]:
+    """调用大模型生成急救指导，返回 (结果, 是否写入缓存)；补过默认值的结果不写入缓存"""
     try:
         print(f"🔥 [DEBUG] 开始调用AI生成急救指导...")
         print(f"🔥 [DEBUG] 情绪状态: {emotion_state}, 强度: {intensity}")
         print(f"🔥 [DEBUG] 使用模型: qwen-plus")
-        print(f"🔥 [DEBUG] API Base URL: {settings.OPENAI_BASE_URL}")
-        print(f"🔥 [DEBUG] API Key前4位: {settings.OPENAI_API_KEY[:4]}****")
         
         # 使用结构化prompt要求AI返回JSON格式
-        response = client.chat.completions.create(
+        content = await llm_gateway.complete_text(
+            priority=Priority.CRITICAL,
             model="qwen-plus",
-            messages=[
-                {
-                    "role": "system", 
-                    "content": "你是专业的心理危机干预师。请严格按照JSON格式回复，包含voice_script(语音引导词)、visual_prompt(视觉场景描述)、music_type(音乐类型)三个字段。音乐类型只能从nature_sounds、relaxing_piano、meditation_bell中选择。"
-                },
-                {
-                    "role": "user", 
-                    "content": f"为{emotion_state}情绪(强度{intensity}/10)设计90秒急救方案。请回复JSON格式：{{\"voice_script\": \"温和具体的呼吸和放松引导词\", \"visual_prompt\": \"平静自然场景描述\", \"music_type\": \"适合的音乐类型\"}}"
-                }
-            ],
+            messages=_build_emergency_guidance_messages(emotion_state, intensity),
             temperature=0.7,
-            max_tokens=400,
-            timeout=30  # 设置30秒超时
+            max_tokens=400
         )
-        
-        print(f"🎉 [DEBUG] AI调用成功! 响应状态: {response}")
-        print(f"🎉 [DEBUG] 响应内容长度: {len(response.choices[0].message.content)}")
-        print(f"🎉 [DEBUG] 响应原文: {response.choices[0].message.content}")
-        
-        # 计算token使用量
-        if hasattr(response, 'usage'):
-            print(f"🎉 [DEBUG] Token使用量: {response.usage}")
-        
-        # 计算请求耗时
-        import time
-        start_time = time.time()
-        print(f"🎉 [DEBUG] 处理响应开始时间: {start_time}")
-        
-        content = response.choices[0].message.content.strip()
         print(f"🔍 [DEBUG] AI回复原文: {content}")  # 调试日志
-        print(f"🔍 [DEBUG] 开始解析JSON响应...")
         
-        # 尝试解析JSON响应
-        import json
-        import re
-        
-        try:
-            # 如果响应包含markdown代码块，提取JSON部分
-            json_match = re.search(r'```(?:json)?\s*({[^}]*})\s*```', content, re.DOTALL)
-            if json_match:
-                json_str = json_match.group(1)
-                print(f"🔍 [DEBUG] 从markdown代码块提取JSON: {json_str}")
-            else:
-                # 查找第一个完整的JSON对象
-                json_match = re.search(r'{[^{}]*"voice_script"[^{}]*}', content, re.DOTALL)
-                if json_match:
-                    json_str = json_match.group(0)
-                    print(f"🔍 [DEBUG] 使用正则提取JSON: {json_str}")
-                else:
-                    json_str = content
-                    print(f"🔍 [DEBUG] 直接使用完整内容作为JSON: {json_str}")
-            
-            ai_data = json.loads(json_str)
-            print(f"✅ [DEBUG] JSON解析成功: {ai_data}")
-            
-            # 验证和规范化数据
-            voice_script = ai_data.get("voice_script", "请深呼吸，让身心放松。专注于当下，感受每一次呼吸带来的平静。")
-            visual_prompt = ai_data.get("visual_prompt", "一片宁静的海滩，海浪轻柔地拍打着岸边")
-            music_type = ai_data.get("music_type", "relaxing_piano")
-            
-            print(f"✅ [DEBUG] 提取字段 - 语音脚本长度: {len(voice_script)}")
-            print(f"✅ [DEBUG] 提取字段 - 视觉提示长度: {len(visual_prompt)}")
-            print(f"✅ [DEBUG] 提取字段 - 音乐类型: {music_type}")
-            
-            # 确保音乐类型在允许范围内
-            valid_music_types = ["nature_sounds", "relaxing_piano", "meditation_bell"]
-            if music_type not in valid_music_types:
-                print(f"⚠️  [DEBUG] 音乐类型不在范围内，使用默认: {music_type} -> nature_sounds")
-                music_type = "nature_sounds"
-            
-            result = {
-                "voice_script": voice_script,
-                "visual_prompt": visual_prompt,
-                "music_type": music_type,
-                "duration": 90
-            }
-            
-            print(f"🎉 [DEBUG] 最终返回结果: {result}")
-            return result
-            
-        except (json.JSONDecodeError, KeyError) as e:
-            print(f"❌ [DEBUG] JSON解析失败: {e}，尝试文本解析")
-            print(f"❌ [DEBUG] 失败的JSON字符串: {json_str}")
-            
-            # 备选：文本解析
-            lines = content.split('\n')
-            voice_script = "请深呼吸，让身心放松。专注于当下这一刻，感受每一次呼吸带来的平静。"
-            visual_prompt = "一片宁静的森林，阳光透过树叶洒下温暖的光芒"
-            music_type = "nature_sounds"
-            
-            print(f"🔄 [DEBUG] 开始文本解析，共{len(lines)}行")
-            
-            for i, line in enumerate(lines):
-                line = line.strip()
-                print(f"🔄 [DEBUG] 解析第{i+1}行: {line}")
-                if "语音" in line or "voice" in line.lower():
-                    if ":" in line:
-                        voice_script = line.split(":", 1)[1].strip().strip('"').strip("'")
-                        print(f"✅ [DEBUG] 找到语音脚本: {voice_script}")
-                elif "视觉" in line or "visual" in line.lower():
-                    if ":" in line:
-                        visual_prompt = line.split(":", 1)[1].strip().strip('"').strip("'")
-                        print(f"✅ [DEBUG] 找到视觉提示: {visual_prompt}")
-                elif "音乐" in line or "music" in line.lower():
-                    if ":" in line:
-                        music_candidate = line.split(":", 1)[1].strip().strip('"').strip("'")
-                        if music_candidate in ["nature_sounds", "relaxing_piano", "meditation_bell"]:
-                            music_type = music_candidate
-                            print(f"✅ [DEBUG] 找到音乐类型: {music_type}")
-            
-            result = {
-                "voice_script": voice_script,
-                "visual_prompt": visual_prompt,
-                "music_type": music_type,
-                "duration": 90
-            }
-            
-            print(f"🔄 [DEBUG] 文本解析结果: {result}")
-            return result
+        data = parse_json_text(content)
+        result = _finalize_emergency_guidance(data)
+        print(f"🎉 [DEBUG] 最终返回结果: {result}")
+        return result, is_complete(EmergencyGuidanceOutput, data)
         
     except Exception as e:
         print(f"💥 [DEBUG] AI调用发生异常: {type(e).__name__}: {str(e)}")
-        print(f"💥 [DEBUG] 异常详情: {repr(e)}")
         
         # 检查是否是超时错误
         if "timeout" in str(e).lower() or "timed out" in str(e).lower():
@@ -268,19 +185,64 @@ async def generate_emergency_guidance(emotion_state: str, intensity: float) -> d
         if "auth" in str(e).lower() or "401" in str(e) or "403" in str(e):
             print(f"🔐 [DEBUG] 可能的认证问题:")
             print(f"   API Key: {settings.OPENAI_API_KEY[:10]}...")
-            print(f"   Base URL: {settings.OPENAI_BASE_URL}")
+            print(f"   Base URL: {settings.OPENAI_API_BASE}")
         
         print(f"Error generating emergency guidance: {e}")
-        return {
-            "voice_script": "请深呼吸，吸气4秒，保持4秒，呼气6秒。重复这个过程，让自己平静下来。",
-            "visual_prompt": "一片宁静的森林，阳光透过树叶洒下斑驳的光影",
-            "music_type": "nature_sounds",
-            "duration": 90
-        }
+        return {**EMERGENCY_GUIDANCE_DEFAULTS, "duration": 90}, False
+
+
+async def stream_emergency_guidance(emotion_state: str, intensity: float) -> AsyncIterator[Dict[str, Any]]:
+    """
+    流式生成90秒情绪急救指导
+
+    依次产出:
+        {"type": "field", "key": str, "value": Any}  每个字段生成并校验完成后立即产出（voice_script 最先）
+        {"type": "result", "data": dict}  补全默认值后的完整结果
+    """
+    def replay(result: dict):
+        for key in EMERGENCY_GUIDANCE_DEFAULTS:
+            yield {"type": "field", "key": key, "value": result[key]}
+        yield {"type": "result", "data": result}
+
+    if not llm_gateway.is_available():
+        for event in replay({**EMERGENCY_GUIDANCE_DEFAULTS, "duration": 90}):
+            yield event
+        return
+
+    cache_key = emergency_guidance_key(emotion_state, intensity)
+    cached = emergency_guidance_cache.get(cache_key)
+    if cached is not None:
+        for event in replay(cached):
+            yield event
+        return
+    _, intensity = quantize_intensity(intensity)
+
+    data: Dict[str, Any] = {}
+    try:
+        deltas = llm_gateway.stream_text(
+            priority=Priority.CRITICAL,
+            model="qwen-plus",
+            messages=_build_emergency_guidance_messages(emotion_state, intensity),
+            temperature=0.7,
+            max_tokens=400
+        )
+        async for key, value in iter_json_fields(deltas):
+            valid, value = validate_field(EmergencyGuidanceOutput, key, value)
+            if valid:
+                data[key] = value
+                yield {"type": "field", "key": key, "value": value}
+    except Exception as e:
+        print(f"流式生成急救指导失败: {type(e).__name__}: {str(e)}")
+
+    result = _finalize_emergency_guidance(data)
+    # 流式请求不与其他请求合并，每次调用最多写入一次；补过默认值的结果不写入缓存
+    if is_complete(EmergencyGuidanceOutput, data):
+        emergency_guidance_cache.put(cache_key, result)
+    yield {"type": "result", "data": result}
 
 async def generate_scenario_simulation(scenario_type: str, user_concerns: str) -> dict:
     """生成场景模拟指导"""
-    if not settings.OPENAI_API_KEY or not client:
+    if not llm_gateway.is_available():
         scenarios = {
             "exam": {
                 "preparation_steps": ["深呼吸3次", "回顾知识要点", "积极心理暗示"],
@@ -303,62 +265,44 @@ async def generate_scenario_simulation(scenario_type: str, user_concerns: str) -
         }
         return scenarios.get(scenario_type, scenarios["study"])
     
+    cache_key = scenario_simulation_key(scenario_type, user_concerns)
+    return await scenario_simulation_cache.get_or_generate(
+        cache_key, lambda: _request_scenario_simulation(scenario_type, user_concerns)
+    )
+
+
+async def _request_scenario_simulation(scenario_type: str, user_concerns: str) -> Tuple[dict, bool]:
+    """调用大模型生成场景模拟指导，返回 (结果, 是否写入缓存)；补过默认值的结果不写入缓存"""
     try:
         print(f"🎭 [DEBUG] 开始调用AI生成场景模拟...")
         print(f"🎭 [DEBUG] 场景类型: {scenario_type}, 用户担忧: {user_concerns}")
         print(f"🎭 [DEBUG] 使用模型: qwen-plus")
         
-        response = client.chat.completions.create(
+        content = await llm_gateway.complete_text(
+            priority=Priority.HIGH,
             model="qwen-plus",
             messages=[
-                {"role": "system", "content": "你是专业的心理教练，擅长帮助学生快速进入最佳状态。请提供具体的准备步骤、心态调整和可视化引导。"},
-                {"role": "user", "content": f"场景类型：{scenario_type}，用户担忧：{user_concerns}。请设计进入状态的方案，包含：1)具体准备步骤 2)心态调整指导 3)可视化引导脚本"}
+                {"role": "system", "content": "你是专业的心理教练，擅长帮助学生快速进入最佳状态。请严格按照JSON格式回复，包含preparation_steps(准备步骤列表)、mindset_guidance(心态调整指导)、visualization_script(可视化引导脚本)三个字段。"},
+                {"role": "user", "content": f"场景类型：{scenario_type}，用户担忧：{user_concerns}。请设计进入状态的方案。请回复JSON格式：{{\"preparation_steps\": [\"具体准备步骤，最多3条\"], \"mindset_guidance\": \"心态调整指导\", \"visualization_script\": \"可视化引导脚本\"}}"}
             ],
             temperature=0.7,
-            max_tokens=400,
-            timeout=30
+            max_tokens=400
         )
         
         print(f"🎉 [DEBUG] 场景模拟AI调用成功!")
-        print(f"🎉 [DEBUG] 响应内容: {response.choices[0].message.content}")
-        
-        content = response.choices[0].message.content
-        
-        # 简单解析响应内容
-        preparation_steps = []
-        mindset_guidance = content
-        visualization_script = "想象成功完成任务的场景"
-        
-        # 尝试从响应中提取结构化信息
-        lines = content.split('\n')
-        current_section = None
-        
-        for line in lines:
-            line = line.strip()
-            if '准备' in line or '步骤' in line:
-                current_section = 'preparation'
-            elif '心态' in line or '指导' in line:
-                current_section = 'mindset'
-            elif '可视化' in line or '想象' in line:
-                current_section = 'visualization'
-            elif line and current_section == 'preparation' and ('1.' in line or '2.' in line or '3.' in line or '-' in line):
-                # 提取准备步骤
-                step = line.replace('1.', '').replace('2.', '').replace('3.', '').replace('-', '').strip()
-                if step:
-                    preparation_steps.append(step)
-        
-        if not preparation_steps:
-            preparation_steps = ["准备第一步", "准备第二步", "准备第三步"]
+        print(f"🎉 [DEBUG] 响应内容: {content}")
         
+        data = parse_json_text(content)
+        simulation = validate_fields(ScenarioSimulationOutput, data, SCENARIO_SIMULATION_DEFAULTS)
         result = {
-            "preparation_steps": preparation_steps[:3],  # 最多3个步骤
-            "mindset_guidance": mindset_guidance,
-            "visualization_script": visualization_script,
+            "preparation_steps": simulation.preparation_steps[:3],  # 最多3个步骤
+            "mindset_guidance": simulation.mindset_guidance,
+            "visualization_script": simulation.visualization_script,
             "duration": 300
         }
         
         print(f"🎭 [DEBUG] 场景模拟最终结果: {result}")
-        return result
+        return result, is_complete(ScenarioSimulationOutput, data)
         
     except Exception as e:
         print(f"💥 [DEBUG] 场景模拟AI调用异常: {type(e).__name__}: {str(e)}")
@@ -369,38 +313,29 @@ async def generate_scenario_simulation(scenario_type: str, user_concerns: str) -
             print(f"⏰ [DEBUG] 场景模拟超时错误")
         
         print(f"Error generating scenario simulation: {e}")
-        return {
-            "preparation_steps": ["深呼吸调整", "明确目标", "积极暗示"],
-            "mindset_guidance": "相信自己的能力，一步步来",
-            "visualization_script": "想象自己成功完成目标的场景",
-            "duration": 300
-        }
+        return {**SCENARIO_SIMULATION_DEFAULTS, "duration": 300}, False
 
 async def get_ai_chat_response(messages: List[AIChatMessage], user_id: str) -> str:
-    if not settings.OPENAI_API_KEY or not client:
+    if not llm_gateway.is_available():
         print("OpenAI API key not set. Returning mock AI chat response.")
         return "抱歉，AI服务暂时不可用，请设置OpenAI API密钥。"
 
-    db = get_database()
-    # Load previous conversation history for context
-    conversation_history = []
-    # In a real app, you might limit the history or summarize it
-    async for conv_msg in db["ai_conversations"].find({"user_id": user_id}).sort("created_at", -1).limit(5):
-        conversation_history.extend(conv_msg["messages"])
+    # 读取最近的历史消息（按 (user_id, created_at) 索引的有界窗口）
+    turns = await load_recent_turns(user_id, settings.CHAT_HISTORY_WINDOW)
 
     full_messages = [
         {"role": "system", "content": "你是一个考研心理健康助手，专注于提供情感支持和学习建议。"}
     ]
-    # Add historical messages, ensuring they are in the correct format
-    for msg in conversation_history:
-        full_messages.append({"role": msg["role"], "content": msg["content"]})
+    # 历史上下文受 token 预算限制：滚动摘要 + 最近轮次原文
+    full_messages.extend(conversation_memory.build_messages(user_id, turns))
     # Add current messages
     for msg in messages:
         full_messages.append({"role": msg.role, "content": msg.content})
 
     try:
         # 使用客户端实例调用API，适应SDK 1.3.5版本
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat_completion(
+            priority=Priority.HIGH,
             model="qwen-plus",
             messages=full_messages,
             temperature=0.7,
@@ -409,49 +344,33 @@ async def get_ai_chat_response(messages: List[AIChatMessage], user_id: str) -> s
         ai_response_content = response.choices[0].message.content
 
         # Save current interaction to conversation history
-        new_conversation = AIConversation(
-            user_id=user_id,
-            messages=[msg.dict() for msg in messages] + [{
+        await append_messages(
+            user_id,
+            [{"role": msg.role, "content": msg.content} for msg in messages] + [{
                 "role": "assistant",
                 "content": ai_response_content
             }]
         )
-        await db["ai_conversations"].insert_one(new_conversation.dict(by_alias=True, exclude_unset=True))
 
         return ai_response_content
     except Exception as e:
         print(f"Error calling OpenAI API for chat: {e}")
         return "抱歉，AI服务暂时不可用，请稍后再试。"
 
+# 修改画作分析提示词或结果结构时递增，使感知哈希缓存中按旧提示词生成的结果失效
+PAINTING_ANALYSIS_PROMPT_VERSION = "3"
+
 async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str, theme: str = None, local_analysis: Dict[str, Any] = None) -> Dict[str, Any]:
     """使用qwen-vl多模态大模型分析绘画内容 - 简化版分析，只获取画面内容描述"""
 
     print("调用函数: analyze_painting_with_qwen_vl")
-    global client
-    
     print(f"开始分析绘画 - 模式: {painting_mode}, 主题: {theme}")
     print(f"图像数据格式检查: {image_data_url[:50]}...")
-    print(f"客户端状态: {'已初始化' if client else '未初始化'}")
+    print(f"LLM网关状态: {'可用' if llm_gateway.is_available() else '未配置API Key'}")
     print(f"本地分析数据: {local_analysis}")
     
-    # 再次检查并尝试重新初始化客户端（如果之前失败）
-    if client is None:
-        print("尝试重新初始化客户端...")
-        try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            api_base = os.getenv("OPENAI_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-            http_client = httpx.Client(timeout=120.0)  # 增加HTTP客户端超时时间到120秒
-            client = OpenAI(
-                api_key=api_key,
-                base_url=api_base,
-                http_client=http_client,
-            )
-            print("客户端重新初始化成功")
-        except Exception as re_init_error:
-            print(f"客户端重新初始化失败: {re_init_error}")
-    
     # 如果客户端仍然未初始化，返回详细的错误信息
-    if client is None:
+    if not llm_gateway.is_available():
         print("客户端仍然未初始化，返回模拟分析结果")
         error_result = {
             "content_description": "系统错误: AI客户端未初始化",
@@ -466,6 +385,9 @@ async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str,
     print("客户端正常")
     
     try:
+        # 压缩图片后再上传，两次视觉模型调用共用同一份结果
+        image_data_url = await image_preprocessor.prepare(image_data_url)
+
         # 根据不同绘画模式生成个性化提示词
         mode_specific_instructions = ""
         if painting_mode == "house_tree_person":
@@ -475,6 +397,25 @@ async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str,
         else:  # free_drawing
             mode_specific_instructions = "这是一幅自由创作画作，请特别关注：用户选择表达的核心元素、自发的表达方式、没有约束下展现的潜意识内容。自由创作能真实反映用户当前的情绪状态和内心世界。"
         
+        # 有本地测量的客观指标时作为事实提供给模型，色彩、构图相关的维度不再单独要求模型分析，
+        # 只让模型在心理解读中引用这些数值
+        if local_analysis:
+            measured_section = f"""本地测量结果（事实，直接引用）：
+{describe_features(local_analysis)}
+"""
+            dimension_instructions = """1. 符号与内容识别：识别画中内容及其特征
+2. 笔触：线条力度、断续与涂改痕迹
+3. 结合测量结果与画面内容，分析心理状态并给出考研针对性建议"""
+        else:
+            measured_section = ""
+            dimension_instructions = """1. 符号与内容识别：详细识别画中内容及其特征
+2. 色彩情感分析：分析冷色调/暖色调比例、主色饱和度与明度
+3. 笔触动力学分析：分析线条的流畅性、力度、是否断续、涂改痕迹
+4. 构图与空间分析：分析图像重心、空间利用情况
+5. 结合你的专业知识，分析用户展现出什么心理状态，对于考研有什么针对性建议"""
+
+        dimension_count = "三" if local_analysis else "五"
+
         # 修改后的提示词，按照要求分析多维度内容并整合成一段描述
         prompt = f"""请对这幅画作进行专业分析，并将结果整合成一段完整的描述。
 
@@ -482,15 +423,11 @@ async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str,
 绘画主题: {theme if theme else '自由创作'}
 
 {mode_specific_instructions}
-
+{measured_section}
 请按照以下维度进行分析：
-1. 符号与内容识别：详细识别画中内容及其特征
-2. 色彩情感分析：分析冷色调/暖色调比例、主色饱和度与明度
-3. 笔触动力学分析：分析线条的流畅性、力度、是否断续、涂改痕迹
-4. 构图与空间分析：分析图像重心、空间利用情况
-5. 结合你的专业知识，分析用户展现出什么心理状态，对于考研有什么针对性建议
+{dimension_instructions}
 
-请将以上五个维度的分析，每一个点形成一个自然段，首字缩进两格，使用自然流畅的语言，全文不超过250字。
+请将以上{dimension_count}个维度的分析，每一个点形成一个自然段，首字缩进两格，使用自然流畅的语言，全文不超过250字。
 
 
 """
@@ -498,7 +435,8 @@ async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str,
         print(f"准备调用API - 模型: qwen-vl-plus, 多维度分析提示词已准备")
 
         # 简化API调用参数
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat_completion(
+            priority=Priority.NORMAL,
             model="qwen-vl-plus",
             messages=[
                 {
@@ -529,19 +467,28 @@ async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str,
         
         print(f"设置内容描述: {content_description[:100]}...")
         
-        # 创建获取额外数据的提示词，确保简洁明了
+        # 创建获取额外数据的提示词，确保简洁明了；本地已测量的数值（色彩比例、多样性、密度、空间利用率、重心）
+        # 不再向模型索取，也不再重复附上测量数据，结果中由 features_to_analysis_data 填入
         data_extraction_prompt = "请基于这幅画作，提取以下具体数据并严格按照指定格式返回：\n\n"
         data_extraction_prompt += "1. 情绪雷达数据：焦虑程度(1-10)、压力水平(1-10)、积极情绪(1-10)、创造力(1-10)、专注度(1-10)、情绪稳定性(1-10)\n"
-        data_extraction_prompt += "2. 色彩情感分析：冷色调比例(%)、暖色调比例(%)、色彩多样性(丰富/适中/单调)、情绪倾向描述\n"
-        data_extraction_prompt += "3. 笔触动力学：线条特征、力度水平、连贯性、情绪稳定性\n"
-        data_extraction_prompt += "4. 构图空间：密度描述、空间利用率(%)、中心位置、元素排列方式\n\n"
-        data_extraction_prompt += "请以JSON格式返回，不要添加任何其他文字！格式如下：\n"
-        data_extraction_prompt += '{"mood_radar":{"焦虑程度":5,"压力水平":5,"积极情绪":5,"创造力":5,"专注度":5,"情绪稳定性":5},"color_analysis":{"emotion_tendency":"描述","cool_color_ratio":"50%","warm_color_ratio":"50%","color_diversity":"适中"},"brush_analysis":{"stroke_characteristics":"流畅稳定","pressure_level":"适中","stroke_consistency":"连贯","emotional_stability":"较高"},"composition_analysis":{"密度":"适中","空间利用率":"50%","中心位置":"居中","元素排列方式":"有序"}}'
+        if local_analysis:
+            data_extraction_prompt += "2. 色彩情绪倾向描述\n"
+            data_extraction_prompt += "3. 笔触动力学：线条特征、力度水平、连贯性、情绪稳定性\n"
+            data_extraction_prompt += "4. 元素排列方式\n\n"
+            data_extraction_prompt += "请以JSON格式返回，不要添加任何其他文字！格式如下：\n"
+            data_extraction_prompt += '{"mood_radar":{"焦虑程度":5,"压力水平":5,"积极情绪":5,"创造力":5,"专注度":5,"情绪稳定性":5},"color_analysis":{"emotion_tendency":"描述"},"brush_analysis":{"stroke_characteristics":"流畅稳定","pressure_level":"适中","stroke_consistency":"连贯","emotional_stability":"较高"},"composition_analysis":{"元素排列方式":"有序"}}'
+        else:
+            data_extraction_prompt += "2. 色彩情感分析：冷色调比例(%)、暖色调比例(%)、色彩多样性(丰富/适中/单调)、情绪倾向描述\n"
+            data_extraction_prompt += "3. 笔触动力学：线条特征、力度水平、连贯性、情绪稳定性\n"
+            data_extraction_prompt += "4. 构图空间：密度描述、空间利用率(%)、中心位置、元素排列方式\n\n"
+            data_extraction_prompt += "请以JSON格式返回，不要添加任何其他文字！格式如下：\n"
+            data_extraction_prompt += '{"mood_radar":{"焦虑程度":5,"压力水平":5,"积极情绪":5,"创造力":5,"专注度":5,"情绪稳定性":5},"color_analysis":{"emotion_tendency":"描述","cool_color_ratio":"50%","warm_color_ratio":"50%","color_diversity":"适中"},"brush_analysis":{"stroke_characteristics":"流畅稳定","pressure_level":"适中","stroke_consistency":"连贯","emotional_stability":"较高"},"composition_analysis":{"密度":"适中","空间利用率":"50%","中心位置":"居中","元素排列方式":"有序"}}'
         
         # 调用API获取数据
         data_response = None
         try:
-            data_response = client.chat.completions.create(
+            data_response = await llm_gateway.chat_completion(
+                priority=Priority.NORMAL,
                 model="qwen-vl-plus",
                 messages=[
                     {
@@ -602,28 +549,23 @@ async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str,
             data_content = data_response.choices[0].message.content.strip()
             print(f"额外数据响应: {data_content[:100]}...")
             
-            # 尝试提取JSON部分
-            try:
-                # 提取花括号之间的内容
-                start_idx = data_content.find('{')
-                end_idx = data_content.rfind('}')
-                if start_idx != -1 and end_idx != -1:
-                    json_str = data_content[start_idx:end_idx+1]
-                    import json
-                    ai_data = json.loads(json_str)
-                    
-                    # 更新数据
-                    if 'mood_radar' in ai_data:
-                        mood_radar_data = ai_data['mood_radar']
-                    if 'color_analysis' in ai_data:
-                        color_emotion_data = ai_data['color_analysis']
-                    if 'brush_analysis' in ai_data:
-                        brush_dynamics_data = ai_data['brush_analysis']
-                    if 'composition_analysis' in ai_data:
-                        composition_data = ai_data['composition_analysis']
-            except Exception as json_error:
-                print(f"JSON解析异常: {json_error}")
-        
+            # 解析JSON，只更新解析出的字段
+            ai_data = parse_json_text(data_content)
+            if 'mood_radar' in ai_data:
+                mood_radar_data = ai_data['mood_radar']
+            if 'color_analysis' in ai_data:
+                color_emotion_data = ai_data['color_analysis']
+            if 'brush_analysis' in ai_data:
+                brush_dynamics_data = ai_data['brush_analysis']
+            if 'composition_analysis' in ai_data:
+                composition_data = ai_data['composition_analysis']
+        
+        # 本地测量的数值覆盖模型给出的同名字段
+        if local_analysis:
+            measured = features_to_analysis_data(local_analysis)
+            color_emotion_data = {**color_emotion_data, **measured["color_analysis"]}
+            composition_data = {**composition_data, **measured["composition_analysis"]}
+
         print(f"最终情绪雷达数据: {mood_radar_data}")
         print(f"最终色彩分析数据: {color_emotion_data}")
 
@@ -647,7 +589,8 @@ async def analyze_painting_with_qwen_vl(image_data_url: str, painting_mode: str,
             "composition_analysis": {
                 "description": "构图与空间分析",
                 "data": composition_data
-            }
+            },
+            "local_features": local_analysis
         }
     except Exception as e:
         print(f"API调用异常: {type(e).__name__}: {str(e)}")
@@ -714,25 +657,8 @@ async def generate_mindfulness_guidance(painting_analysis: Dict[str, Any]) -> Di
     print("调用函数: generate_mindfulness_guidance")
     print(f"分析数据: {painting_analysis}")
     
-    # 再次检查并尝试重新初始化客户端（如果之前失败）
-    global client
-    if client is None:
-        print("尝试重新初始化客户端...")
-        try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            api_base = os.getenv("OPENAI_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-            http_client = httpx.Client(timeout=120.0)  # 增加HTTP客户端超时时间到120秒
-            client = OpenAI(
-                api_key=api_key,
-                base_url=api_base,
-                http_client=http_client,
-            )
-            print("客户端重新初始化成功")
-        except Exception as re_init_error:
-            print(f"客户端重新初始化失败: {re_init_error}")
-    
     # 如果客户端仍然未初始化，返回模拟引导
-    if client is None:
+    if not llm_gateway.is_available():
         print("客户端未初始化，返回模拟引导文本")
         return {
             "guidance_text": "现在，请闭上眼睛，想象一股平静的蓝色能量从笔尖流出，慢慢填满整个画布。感受你的呼吸，让每一次呼吸都成为画笔的一次移动。不要担心画得如何，只关注当下的感受和体验。让你的手自由地表达内心的情感，不需要思考太多，跟随直觉去创作。",
@@ -773,7 +699,8 @@ async def generate_mindfulness_guidance(painting_analysis: Dict[str, Any]) -> Di
         print(f"发送引导生成请求到AI模型")
         
         # 调用AI模型生成引导文本
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat_completion(
+            priority=Priority.NORMAL,
             model="qwen-vl-plus",
             messages=[
                 {"role": "system", "content": "你是一位专业的艺术心理治疗师，擅长通过引导性语言帮助用户进行正念绘画和情绪表达。"},
@@ -824,167 +751,10 @@ async def generate_healing_story(analysis_result: Dict[str, Any], image_data_url
     print("调用函数: generate_healing_story")
     print(f"分析数据摘要: {analysis_result.get('content_description', '')[:100]}...")
     
-    # 再次检查并尝试重新初始化客户端（如果之前失败）
-    global client
-    if client is None:
-        print("尝试重新初始化客户端...")
-        try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            api_base = os.getenv("OPENAI_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-            http_client = httpx.Client(timeout=120.0)  # 增加HTTP客户端超时时间到120秒
-            client = OpenAI(
-                api_key=api_key,
-                base_url=api_base,
-                http_client=http_client,
-            )
-            print("客户端重新初始化成功")
-        except Exception as re_init_error:
-            print(f"客户端重新初始化失败: {re_init_error}")
-    
     # 如果客户端未初始化，返回默认故事
-    if client is None:
+    if not llm_gateway.is_available():
         print("客户端未初始化，返回默认疗愈故事")
         return "在一片绿意盎然的森林中，你发现了一面神奇的镜子。当你望向镜中，看到的不仅是自己，还有无数可能。每一片落叶都代表一个过去的烦恼，每一道阳光都预示着新的希望。深呼吸，感受大自然的治愈力量，你会发现，内心的平静一直都在那里，等待你去发现。"
-
-
-async def generate_mind_mirror(image_data_url: str) -> Dict[str, Any]:
-    """
-    生成心灵镜像：根据用户的画作，生成一幅保持核心元素但色彩更明媚、构图更和谐的"积极版本"
-    
-    Args:
-        image_data_url: 用户画作的base64数据URL
-        
-    Returns:
-        包含积极版本画作描述和引导语的字典
-    """
-    
-    print("调用函数: generate_mind_mirror")
-    print(f"图像数据格式检查: {image_data_url[:50]}...")
-    
-    # 再次检查并尝试重新初始化客户端（如果之前失败）
-    global client
-    if client is None:
-        print("尝试重新初始化客户端...")
-        try:
-            api_key = os.getenv("OPENAI_API_KEY")
-            api_base = os.getenv("OPENAI_API_BASE", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-            http_client = httpx.Client(timeout=120.0)  # 增加HTTP客户端超时时间到120秒
-            client = OpenAI(
-                api_key=api_key,
-                base_url=api_base,
-                http_client=http_client,
-            )
-            print("客户端重新初始化成功")
-        except Exception as re_init_error:
-            print(f"客户端重新初始化失败: {re_init_error}")
-    
-    # 如果客户端仍然未初始化，返回模拟结果
-    if client is None:
-        print("客户端未初始化，返回模拟心灵镜像结果")
-        return {
-            "positive_image_description": "这是一幅充满希望的画面，阳光透过云层洒在大地上，色彩明亮温暖，构图和谐平衡。",
-            "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
-            "is_real_mirror": False,
-            "error_type": "CLIENT_NOT_INITIALIZED"
-        }
-    
-    try:
-        # 构建提示词，让AI分析原图并给出积极版本的描述
-        prompt = f"""
-        请分析这幅画作，然后生成一幅保持核心元素但色彩更明媚、构图更和谐的"积极版本"描述。
-        
-        具体要求：
-        1. 首先识别画作的核心元素和主题
-        2. 然后描述一个积极版本的画面，特点包括：
-           - 色彩更加明亮、温暖、积极
-           - 构图更加平衡和谐
-           - 保持原有的核心元素和主题
-           - 加入一些积极的元素（如阳光、明亮的色彩等）
-        3. 最后提供一句简短的引导语，格式类似："看，如果给这里加一缕阳光，是不是感觉充满了希望？"
-        
-        请以JSON格式返回，包含以下字段：
-        - positive_image_description: 积极版本画面的详细描述
-        - guidance_text: 一句简短的引导语
-        """
-        
-        print(f"发送心灵镜像生成请求到AI模型")
-        
-        # 调用AI模型生成心灵镜像描述
-        response = client.chat.completions.create(
-            model="qwen-vl-plus",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": image_data_url}}
-                    ]
-                }
-            ],
-            temperature=0.7,
-            max_tokens=500
-        )
-        
-        # 解析响应
-        ai_response_content = response.choices[0].message.content.strip()
-        print(f"AI响应: {ai_response_content}")
-        
-        # 尝试提取JSON部分
-        try:
-            # 提取花括号之间的内容
-            start_idx = ai_response_content.find('{')
-            end_idx = ai_response_content.rfind('}')
-            if start_idx != -1 and end_idx != -1:
-                json_str = ai_response_content[start_idx:end_idx+1]
-                import json
-                result_data = json.loads(json_str)
-                
-                # 确保返回的字典包含必要字段
-                if 'positive_image_description' in result_data and 'guidance_text' in result_data:
-                    return {
-                        "positive_image_description": result_data['positive_image_description'],
-                        "guidance_text": result_data['guidance_text'],
-                        "is_real_mirror": True,
-                        "error_type": None
-                    }
-                else:
-                    # 如果JSON格式不完整，使用默认值
-                    return {
-                        "positive_image_description": "这是一幅充满阳光和希望的画面，色彩明亮温暖，构图和谐平衡。",
-                        "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
-                        "is_real_mirror": True,
-                        "error_type": None
-                    }
-            else:
-                # 如果没有找到有效的JSON，使用默认值
-                return {
-                    "positive_image_description": "这是一幅充满阳光和希望的画面，色彩明亮温暖，构图和谐平衡。",
-                    "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
-                    "is_real_mirror": True,
-                    "error_type": None
-                }
-        except Exception as json_error:
-            print(f"JSON解析异常: {json_error}")
-            # JSON解析失败，返回默认值
-            return {
-                "positive_image_description": "这是一幅充满阳光和希望的画面，色彩明亮温暖，构图和谐平衡。",
-                "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
-                "is_real_mirror": True,
-                "error_type": None
-            }
-            
-    except Exception as e:
-        print(f"生成心灵镜像异常: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
-        # 返回默认结果
-        return {
-            "positive_image_description": "这是一幅充满阳光和希望的画面，色彩明亮温暖，构图和谐平衡。",
-            "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
-            "is_real_mirror": False,
-            "error_type": type(e).__name__
-        }
     
     try:
         # 获取分析结果中的关键信息
@@ -1025,6 +795,7 @@ async def generate_mind_mirror(image_data_url: str) -> Dict[str, Any]:
         
         # 根据是否有图片URL构建不同的消息内容
         if image_data_url:
+            image_data_url = await image_preprocessor.prepare(image_data_url)
             # 如果有图片，使用多模态消息
             messages.append({
                 "role": "user",
@@ -1041,7 +812,8 @@ async def generate_mind_mirror(image_data_url: str) -> Dict[str, Any]:
             })
         
         # 调用AI模型生成疗愈故事
-        response = client.chat.completions.create(
+        response = await llm_gateway.chat_completion(
+            priority=Priority.LOW,
             model="qwen-vl-plus",
             messages=messages,
             temperature=0.7,
@@ -1066,3 +838,92 @@ async def generate_mind_mirror(image_data_url: str) -> Dict[str, Any]:
         # 返回默认疗愈故事
         return "在一片绿意盎然的森林中，你发现了一面神奇的镜子。当你望向镜中，看到的不仅是自己，还有无数可能。每一片落叶都代表一个过去的烦恼，每一道阳光都预示着新的希望。深呼吸，感受大自然的治愈力量，你会发现，内心的平静一直都在那里，等待你去发现。"
 
+
+async def generate_mind_mirror(image_data_url: str) -> Dict[str, Any]:
+    """
+    生成心灵镜像：根据用户的画作，生成一幅保持核心元素但色彩更明媚、构图更和谐的"积极版本"
+    
+    Args:
+        image_data_url: 用户画作的base64数据URL
+        
+    Returns:
+        包含积极版本画作描述和引导语的字典
+    """
+    
+    print("调用函数: generate_mind_mirror")
+    print(f"图像数据格式检查: {image_data_url[:50]}...")
+    
+    # 如果客户端仍然未初始化，返回模拟结果
+    if not llm_gateway.is_available():
+        print("客户端未初始化，返回模拟心灵镜像结果")
+        return {
+            "positive_image_description": "这是一幅充满希望的画面，阳光透过云层洒在大地上，色彩明亮温暖，构图和谐平衡。",
+            "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
+            "is_real_mirror": False,
+            "error_type": "CLIENT_NOT_INITIALIZED"
+        }
+    
+    try:
+        # 构建提示词，让AI分析原图并给出积极版本的描述
+        prompt = f"""
+        请分析这幅画作，然后生成一幅保持核心元素但色彩更明媚、构图更和谐的"积极版本"描述。
+        
+        具体要求：
+        1. 首先识别画作的核心元素和主题
+        2. 然后描述一个积极版本的画面，特点包括：
+           - 色彩更加明亮、温暖、积极
+           - 构图更加平衡和谐
+           - 保持原有的核心元素和主题
+           - 加入一些积极的元素（如阳光、明亮的色彩等）
+        3. 最后提供一句简短的引导语，格式类似："看，如果给这里加一缕阳光，是不是感觉充满了希望？"
+        
+        请以JSON格式返回，包含以下字段：
+        - positive_image_description: 积极版本画面的详细描述
+        - guidance_text: 一句简短的引导语
+        """
+        
+        image_data_url = await image_preprocessor.prepare(image_data_url)
+        print(f"发送心灵镜像生成请求到AI模型")
+        
+        # 调用AI模型生成心灵镜像描述
+        response = await llm_gateway.chat_completion(
+            priority=Priority.LOW,
+            model="qwen-vl-plus",
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        {"type": "image_url", "image_url": {"url": image_data_url}}
+                    ]
+                }
+            ],
+            temperature=0.7,
+            max_tokens=500
+        )
+        
+        # 解析响应
+        ai_response_content = response.choices[0].message.content.strip()
+        print(f"AI响应: {ai_response_content}")
+        
+        # 解析JSON，字段不完整时使用默认值
+        result_data = parse_json_text(ai_response_content)
+        return {
+            "positive_image_description": result_data.get('positive_image_description') or "这是一幅充满阳光和希望的画面，色彩明亮温暖，构图和谐平衡。",
+            "guidance_text": result_data.get('guidance_text') or "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
+            "is_real_mirror": True,
+            "error_type": None
+        }
+            
+    except Exception as e:
+        print(f"生成心灵镜像异常: {type(e).__name__}: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        
+        # 返回默认结果
+        return {
+            "positive_image_description": "这是一幅充满阳光和希望的画面，色彩明亮温暖，构图和谐平衡。",
+            "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？",
+            "is_real_mirror": False,
+            "error_type": type(e).__name__
+        }
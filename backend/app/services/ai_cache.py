@@ -0,0 +1,161 @@
+"""
+AI 响应缓存
+情绪急救、场景模拟的输入空间很小（几种情绪 × 0-10 的强度），
+相同输入无需每次点击都等待一次完整的大模型往返
+"""
+
+import copy
+import random
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.llm_singleflight import SingleFlight
+
+
+class ResponseCache:
+    """
+    带 TTL 与 LRU 淘汰的响应缓存
+
+    每个键写入 variants_per_key 次回复之前按未命中处理，让调用方继续请求大模型补充新回复；
+    写满之后从收集到的回复中随机返回一条，保持回复的多样性。
+    相同内容的回复只保留一条，但同样计入写入次数：模型输出固定时键也能写满并开始命中。
+    同一个键并发未命中时只生成一次（见 get_or_generate）
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float, variants_per_key: int):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.variants_per_key = max(1, variants_per_key)
+        # key -> {"variants": [...], "puts": int, "expires_at": float}
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._generating = SingleFlight()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """读取缓存，未命中或仍在收集回复时返回 None"""
+        entry = self._entries.get(key)
+        if entry is not None and entry["expires_at"] <= time.monotonic():
+            del self._entries[key]
+            self.expirations += 1
+            entry = None
+
+        if entry is None or entry["puts"] < self.variants_per_key:
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        # 返回副本，避免调用方修改缓存内容
+        return copy.deepcopy(random.choice(entry["variants"]))
+
+    def put(self, key: Hashable, value: Any):
+        """写入一条回复，与已收集的回复内容相同时只计数、不重复保存"""
+        entry = self._entries.get(key)
+        if entry is None or entry["expires_at"] <= time.monotonic():
+            entry = {"variants": [], "puts": 0, "expires_at": time.monotonic() + self.ttl_seconds}
+            self._entries[key] = entry
+
+        if entry["puts"] < self.variants_per_key:
+            entry["puts"] += 1
+            if value not in entry["variants"]:
+                entry["variants"].append(copy.deepcopy(value))
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_generate(self, key: Hashable, generate: Callable[[], Awaitable[Tuple[Any, bool]]]) -> Any:
+        """
+        读取缓存，未命中时调用 generate 生成回复
+
+        generate 返回 (回复, 是否写入缓存)；同一个键并发未命中时只调用一次 generate，
+        回复只写入一次，所有等待者各自拿到一份副本
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        async def generate_once():
+            value, cacheable = await generate()
+            if cacheable:
+                self.put(key, value)
+            return value
+
+        return copy.deepcopy(await self._generating.do(key, generate_once))
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "variants_per_key": self.variants_per_key,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """规范化文本：去掉空白并统一大小写"""
+    return re.sub(r"\s+", "", text or "").lower()
+
+
+def quantize_intensity(intensity: float, bucket_size: Optional[float] = None) -> Tuple[int, float]:
+    """
+    将 0-10 的情绪强度量化到区间
+
+    返回:
+        (区间编号, 区间中点)，区间中点用于生成提示词，保证同一区间的缓存内容一致
+    """
+    size = bucket_size or settings.EMOTIONAL_AID_INTENSITY_BUCKET
+    clamped = min(10.0, max(0.0, float(intensity)))
+    bucket_count = max(1, int(round(10.0 / size)))
+    bucket = min(int(clamped // size), bucket_count - 1)
+    midpoint = round(min(10.0, bucket * size + size / 2), 1)
+    return bucket, midpoint
+
+
+def emergency_guidance_key(emotion_state: str, intensity: float) -> Tuple[str, int]:
+    """情绪急救缓存键：规范化情绪 + 强度区间"""
+    bucket, _ = quantize_intensity(intensity)
+    return normalize_text(emotion_state), bucket
+
+
+def scenario_simulation_key(scenario_type: str, user_concerns: str) -> Tuple[str, str]:
+    """场景模拟缓存键：规范化场景类型 + 规范化担忧描述"""
+    return normalize_text(scenario_type), normalize_text(user_concerns)
+
+
+emergency_guidance_cache = ResponseCache(
+    name="emergency_guidance",
+    max_entries=settings.EMOTIONAL_AID_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.EMOTIONAL_AID_CACHE_TTL,
+    variants_per_key=settings.EMOTIONAL_AID_CACHE_VARIANTS,
+)
+
+scenario_simulation_cache = ResponseCache(
+    name="scenario_simulation",
+    max_entries=settings.EMOTIONAL_AID_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.EMOTIONAL_AID_CACHE_TTL,
+    variants_per_key=settings.EMOTIONAL_AID_CACHE_VARIANTS,
+)
+
+
+def get_cache_stats() -> List[Dict[str, Any]]:
+    return [emergency_guidance_cache.stats(), scenario_simulation_cache.stats()]
@@ -0,0 +1,450 @@
+"""
+画作AI后台任务队列
+画作分析、疗愈故事、心灵镜像、正念引导都要调用视觉模型，单次可能耗时几十秒，
+提交后立即返回任务ID，由进程内的固定数量 worker 执行：
+- 任务落库到 ai_jobs 表，服务重启时把未完成的任务重新入队；未关联画作的任务图片存入 image_blobs，
+  任务记录只保存哈希
+- 已结束的任务保留 AI_JOB_RETENTION_DAYS 天，启动时和之后每隔 AI_JOB_SWEEP_INTERVAL_SECONDS 秒清理一次，
+  不再被引用的任务图片一并删除
+- 结果写回 PaintingEntryORM.ai_analysis，客户端轮询任务状态或订阅 SSE 事件获取结果
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import delete, select
+
+from app.core.config import settings
+from app.db.sqlite_database import AsyncSessionLocal
+from app.models.sqlite_models import AIJobORM, PaintingEntryORM
+from app.services.ai import (
+    generate_healing_story,
+    generate_mind_mirror,
+    generate_mindfulness_guidance,
+)
+from app.services.image_store import (
+    get_image, load_painting_data_url, parse_data_url, put_image, release_image, to_data_url
+)
+from app.services.llm_telemetry import telemetry_scope
+from app.services.painting_cache import painting_analysis_cache
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+TERMINAL_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# 每轮清理删除的任务数上限，避免一次删除过多行长时间占用写锁
+SWEEP_BATCH_SIZE = 500
+
+# 派生结果写回 ai_analysis 时使用的键，重新分析画作时保留这些键
+RESULT_KEYS = {
+    "story": "healing_story",
+    "mind_mirror": "mind_mirror",
+    "guidance": "mindfulness_guidance",
+}
+JOB_KINDS = ("analyze",) + tuple(RESULT_KEYS)
+
+
+class JobQueueFullError(Exception):
+    """排队任务数超过上限"""
+
+
+class JobError(Exception):
+    """任务参数或画作状态不满足执行条件，不重试"""
+
+
+def job_to_dict(job: AIJobORM) -> Dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "painting_id": job.painting_id,
+        "result": job.result,
+        "error": job.error,
+        "attempts": job.attempts or 0,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+class AIJobQueue:
+    """
+    持久化的进程内任务队列
+
+    用法:
+        job = await ai_job_queue.submit("story", user_id, painting_id=painting_id)
+        async for snapshot in ai_job_queue.subscribe(job["job_id"]):
+            ...  # 每次状态变化产出一次，任务结束后停止
+    """
+
+    def __init__(self, workers: int, max_pending: int, max_attempts: int, retention_days: int, sweep_interval: float):
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.max_attempts = max(1, max_attempts)
+        self.retention_days = retention_days
+        self.sweep_interval = max(60.0, sweep_interval)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._swept = 0
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+        # 写回 ai_analysis 是读-改-写，同一画作的多个任务并发完成时需要串行
+        self._writeback_lock = asyncio.Lock()
+        self._handlers: Dict[str, Callable[[AIJobORM], Awaitable[Dict[str, Any]]]] = {
+            "analyze": self._run_analyze,
+            "story": self._run_story,
+            "mind_mirror": self._run_mind_mirror,
+            "guidance": self._run_guidance,
+        }
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """启动 worker，并把上次退出时未完成的任务重新入队"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        requeued = await self._recover()
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i)))
+        if self.retention_days > 0:
+            self._tasks.append(asyncio.create_task(self._sweeper()))
+        print(f"AI任务队列已启动: {self.workers} 个worker, 恢复 {requeued} 个未完成任务")
+
+    async def stop(self):
+        """停止 worker；执行中的任务保持 running 状态，下次启动时恢复"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def _recover(self) -> int:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(AIJobORM).where(
+                    AIJobORM.status.in_((JOB_QUEUED, JOB_RUNNING))
+                ).order_by(AIJobORM.created_at)
+            )
+            jobs = result.scalars().all()
+            requeued = []
+            for job in jobs:
+                if job.status == JOB_RUNNING and (job.attempts or 0) >= self.max_attempts:
+                    job.status = JOB_FAILED
+                    job.error = "任务执行中服务重启，已达到最大重试次数"
+                    job.finished_at = datetime.utcnow()
+                    continue
+                job.status = JOB_QUEUED
+                requeued.append(job.id)
+            await session.commit()
+
+        for job_id in requeued:
+            self._queue.put_nowait(job_id)
+        return len(requeued)
+
+    async def _sweeper(self):
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[AI JOB] 清理过期任务失败: {type(e).__name__}: {e}")
+            await asyncio.sleep(self.sweep_interval)
+
+    async def sweep(self) -> int:
+        """删除创建时间早于保留期限的已结束任务，并释放不再被引用的任务图片，返回删除的任务数"""
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        deleted = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(AIJobORM.id, AIJobORM.image_hash).where(
+                        AIJobORM.status.in_(TERMINAL_STATUSES),
+                        AIJobORM.created_at < cutoff
+                    ).limit(SWEEP_BATCH_SIZE)
+                )
+                rows = result.all()
+                if not rows:
+                    break
+                await session.execute(delete(AIJobORM).where(AIJobORM.id.in_([row.id for row in rows])))
+                for image_hash in {row.image_hash for row in rows if row.image_hash}:
+                    await release_image(session, image_hash)
+                await session.commit()
+            deleted += len(rows)
+            if len(rows) < SWEEP_BATCH_SIZE:
+                break
+        if deleted:
+            self._swept += deleted
+            print(f"[AI JOB] 已清理 {deleted} 个超过 {self.retention_days} 天的已结束任务")
+        return deleted
+
+    async def submit(
+        self,
+        kind: str,
+        user_id: str,
+        painting_id: Optional[str] = None,
+        payload: Optional[Dict[str, Any]] = None,
+        image_data_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        落库并入队，立即返回任务快照
+
+        image_data_url 为未关联画作时任务使用的图片，与任务记录在同一事务中存入 image_blobs，
+        任务只保存哈希，不把 base64 放进 payload
+        """
+        if kind not in self._handlers:
+            raise JobError(f"不支持的任务类型: {kind}")
+        if self._queue is None:
+            raise JobError("AI任务队列未启动")
+        if self._queue.qsize() >= self.max_pending:
+            raise JobQueueFullError(f"排队任务已达上限({self.max_pending})")
+
+        job = AIJobORM(
+            id=str(uuid.uuid4()),
+            kind=kind,
+            user_id=user_id,
+            painting_id=painting_id,
+            status=JOB_QUEUED,
+            payload=payload or {},
+            attempts=0,
+            created_at=datetime.utcnow()
+        )
+        async with AsyncSessionLocal() as session:
+            if image_data_url:
+                try:
+                    mime, data = parse_data_url(image_data_url)
+                except ValueError as e:
+                    raise JobError(str(e))
+                job.image_hash = await put_image(session, mime, data)
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+            snapshot = job_to_dict(job)
+
+        self._queue.put_nowait(job.id)
+        print(f"[AI JOB] 已提交任务 {job.id} ({kind})，当前排队 {self._queue.qsize()}")
+        return snapshot
+
+    async def get(self, job_id: str) -> Optional[AIJobORM]:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(AIJobORM).where(AIJobORM.id == job_id))
+            return result.scalar_one_or_none()
+
+    async def subscribe(self, job_id: str, poll_interval: float = 15.0) -> AsyncIterator[Dict[str, Any]]:
+        """产出任务当前快照及之后的每次状态变化，任务结束后停止"""
+        events: asyncio.Queue = asyncio.Queue()
+        # 先注册再读库，避免读库与注册之间的状态变化丢失
+        self._subscribers.setdefault(job_id, []).append(events)
+        try:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            snapshot = job_to_dict(job)
+            yield snapshot
+            last_status = snapshot["status"]
+            while last_status not in TERMINAL_STATUSES:
+                try:
+                    snapshot = await asyncio.wait_for(events.get(), timeout=poll_interval)
+                except asyncio.TimeoutError:
+                    # 长时间没有事件时回查数据库，兜底处理丢失的通知
+                    job = await self.get(job_id)
+                    if job is None:
+                        return
+                    snapshot = job_to_dict(job)
+                    if snapshot["status"] == last_status:
+                        continue
+                last_status = snapshot["status"]
+                yield snapshot
+        finally:
+            subscribers = self._subscribers.get(job_id, [])
+            if events in subscribers:
+                subscribers.remove(events)
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def _publish(self, job: AIJobORM):
+        subscribers = self._subscribers.get(job.id)
+        if not subscribers:
+            return
+        snapshot = job_to_dict(job)
+        for events in subscribers:
+            events.put_nowait(snapshot)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "pending": self._queue.qsize() if self._queue else 0,
+            "max_pending": self.max_pending,
+            "retention_days": self.retention_days,
+            "swept": self._swept,
+            "subscribers": sum(len(s) for s in self._subscribers.values()),
+        }
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._execute(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[AI JOB] worker {index} 处理任务 {job_id} 异常: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job_id: str):
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(AIJobORM).where(AIJobORM.id == job_id))
+            job = result.scalar_one_or_none()
+            if job is None or job.status != JOB_QUEUED:
+                return
+            job.status = JOB_RUNNING
+            job.attempts = (job.attempts or 0) + 1
+            job.started_at = datetime.utcnow()
+            await session.commit()
+            await session.refresh(job)
+        self._publish(job)
+
+        status, output, error = JOB_SUCCEEDED, None, None
+        try:
+            with telemetry_scope(endpoint=f"job:{job.kind}", feature="painting"):
+                output = await self._handlers[job.kind](job)
+        except JobError as e:
+            status, error = JOB_FAILED, str(e)
+        except Exception as e:
+            status, error = JOB_FAILED, f"{type(e).__name__}: {e}"
+            import traceback
+            traceback.print_exc()
+
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(AIJobORM).where(AIJobORM.id == job_id))
+            job = result.scalar_one()
+            job.status = status
+            job.result = output
+            job.error = error
+            job.finished_at = datetime.utcnow()
+            await session.commit()
+            await session.refresh(job)
+        print(f"[AI JOB] 任务 {job_id} ({job.kind}) 结束: {status}")
+        self._publish(job)
+
+    async def _load_painting(self, job: AIJobORM) -> PaintingEntryORM:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(PaintingEntryORM).where(
+                    PaintingEntryORM.id == job.painting_id,
+                    PaintingEntryORM.user_id == job.user_id
+                )
+            )
+            painting = result.scalar_one_or_none()
+        if painting is None:
+            raise JobError("画作不存在")
+        return painting
+
+    async def _job_image_data_url(self, job: AIJobORM) -> Optional[str]:
+        """任务自带的图片；旧版本提交的任务仍把 data URL 放在 payload 中"""
+        if job.image_hash:
+            blob = await get_image(job.image_hash)
+            if blob is not None:
+                return to_data_url(blob.mime, blob.data)
+        return (job.payload or {}).get("image_data_url")
+
+    async def _write_back(self, painting_id: str, update: Dict[str, Any], replace: bool = False):
+        """
+        合并写回 ai_analysis
+
+        replace=True 用于重新分析：以新的分析结果为准，只保留已生成的故事 / 镜像 / 引导
+        """
+        async with self._writeback_lock:
+            async with AsyncSessionLocal() as session:
+                result = await session.execute(
+                    select(PaintingEntryORM).where(PaintingEntryORM.id == painting_id)
+                )
+                painting = result.scalar_one_or_none()
+                if painting is None:
+                    return
+                current = dict(painting.ai_analysis or {})
+                if replace:
+                    current = {k: v for k, v in current.items() if k in RESULT_KEYS.values()}
+                # JSON 列需要赋新对象才会被识别为已修改
+                painting.ai_analysis = {**current, **update}
+                await session.commit()
+
+    async def _run_analyze(self, job: AIJobORM) -> Dict[str, Any]:
+        painting = await self._load_painting(job)
+        payload = job.payload or {}
+        image_data_url = await load_painting_data_url(painting)
+        if not image_data_url:
+            raise JobError("画作图片不存在")
+        analysis_result = await painting_analysis_cache.analyze(
+            image_data_url,
+            payload.get("painting_mode", "free_drawing"),
+            payload.get("theme"),
+            painting_id=painting.id,
+            user_id=painting.user_id
+        )
+        analysis_result.setdefault("is_real_analysis", False)
+        analysis_result.setdefault("error_type", None)
+        stored = analysis_result.copy()
+        stored["painting_id"] = painting.id
+        stored["painting_time_seconds"] = painting.painting_time_seconds
+        stored["submitted_at"] = painting.submitted_at.isoformat() if painting.submitted_at else None
+        await self._write_back(painting.id, stored, replace=True)
+        return analysis_result
+
+    async def _run_story(self, job: AIJobORM) -> Dict[str, Any]:
+        payload = job.payload or {}
+        image_data_url = await self._job_image_data_url(job)
+        analysis_result = payload.get("analysis_result")
+        if job.painting_id:
+            painting = await self._load_painting(job)
+            image_data_url = image_data_url or await load_painting_data_url(painting)
+            analysis_result = analysis_result or painting.ai_analysis
+        if not analysis_result:
+            raise JobError("缺少画作分析结果")
+
+        story = await generate_healing_story(analysis_result, image_data_url)
+        if job.painting_id:
+            await self._write_back(job.painting_id, {RESULT_KEYS["story"]: story})
+        return {"story": story}
+
+    async def _run_mind_mirror(self, job: AIJobORM) -> Dict[str, Any]:
+        image_data_url = await self._job_image_data_url(job)
+        if job.painting_id:
+            painting = await self._load_painting(job)
+            image_data_url = image_data_url or await load_painting_data_url(painting)
+        if not image_data_url:
+            raise JobError("缺少必要的图片数据")
+
+        mirror = await generate_mind_mirror(image_data_url)
+        if job.painting_id:
+            await self._write_back(job.painting_id, {RESULT_KEYS["mind_mirror"]: mirror})
+        return mirror
+
+    async def _run_guidance(self, job: AIJobORM) -> Dict[str, Any]:
+        if not job.painting_id:
+            raise JobError("缺少画作ID")
+        painting = await self._load_painting(job)
+        if not painting.ai_analysis:
+            raise JobError("画作尚未分析")
+
+        guidance = await generate_mindfulness_guidance(painting.ai_analysis)
+        await self._write_back(job.painting_id, {RESULT_KEYS["guidance"]: guidance})
+        return guidance
+
+
+# 全局任务队列实例，随应用启动 / 关闭
+ai_job_queue = AIJobQueue(
+    workers=settings.AI_JOB_WORKERS,
+    max_pending=settings.AI_JOB_MAX_PENDING,
+    max_attempts=settings.AI_JOB_MAX_ATTEMPTS,
+    retention_days=settings.AI_JOB_RETENTION_DAYS,
+    sweep_interval=settings.AI_JOB_SWEEP_INTERVAL_SECONDS
+)
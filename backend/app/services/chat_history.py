@@ -0,0 +1,47 @@
+"""
+AI对话历史存储
+消息逐条追加写入 SQLite 的 ai_chat_messages 表，与其他业务数据共用同一个异步引擎；
+读取时按 (user_id, created_at) 索引倒序取最近 N 条，单次索引范围扫描即可完成
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from app.db.sqlite_database import AsyncSessionLocal
+from app.models.ai import AIChatMessageORM
+from app.services.conversation_memory import Turn
+
+
+async def append_messages(user_id: str, messages: List[Dict[str, str]], conversation_id: Optional[str] = None) -> str:
+    """在一个事务内追加一次对话的全部消息，返回会话ID"""
+    conversation_id = conversation_id or str(uuid.uuid4())
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as session:
+        session.add_all([
+            AIChatMessageORM(
+                user_id=user_id,
+                conversation_id=conversation_id,
+                role=msg["role"],
+                content=msg["content"],
+                created_at=now
+            )
+            for msg in messages
+        ])
+        await session.commit()
+    return conversation_id
+
+
+async def load_recent_turns(user_id: str, limit: int) -> List[Turn]:
+    """读取用户最近 limit 条消息，按时间顺序返回（自增ID作为顺序标识）"""
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(AIChatMessageORM.id, AIChatMessageORM.role, AIChatMessageORM.content)
+            .where(AIChatMessageORM.user_id == user_id)
+            .order_by(AIChatMessageORM.created_at.desc(), AIChatMessageORM.id.desc())
+            .limit(limit)
+        )
+        rows = result.all()
+    return [Turn(role=row.role, content=row.content, key=row.id) for row in reversed(rows)]
@@ -0,0 +1,221 @@
+"""
+对话记忆
+/ai/chat 的历史上下文按 token 预算组装：
+- 最近的若干轮对话原文保留，总长度不超过预算中留给原文的部分
+- 更早的轮次折叠进按用户缓存的滚动摘要；摘要在后台以低优先级增量更新，
+  每次只把新滑出原文窗口的轮次合并进旧摘要，不阻塞当前回复
+因此每次对话的 prompt 长度大致恒定，不随用户历史增长
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority, estimate_text_tokens
+from app.services.llm_telemetry import telemetry_scope
+
+# 每条消息的角色、分隔符等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@dataclass
+class Turn:
+    role: str
+    content: str
+    key: Any  # 可比较的时间顺序标识，例如 (created_at, 会话内序号)
+
+
+@dataclass
+class _SummaryState:
+    summary: str
+    covered_key: Any  # 已折叠进摘要的最后一轮
+    updated_at: float
+
+
+def message_tokens(role: str, content: str) -> int:
+    return estimate_text_tokens(content or "") + MESSAGE_OVERHEAD_TOKENS
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """保留开头不超过 max_tokens 的部分"""
+    if estimate_text_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_text_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low]
+
+
+class ConversationMemory:
+    """
+    按用户维护滚动摘要，组装 token 受限的历史上下文
+
+    用法:
+        history = conversation_memory.build_messages(user_id, turns)  # turns 按时间顺序
+        full_messages = [system_message] + history + current_messages
+    """
+
+    def __init__(
+        self,
+        history_budget: int,
+        summary_max_tokens: int,
+        summary_input_budget: int,
+        max_users: int,
+        model: str = "qwen-plus"
+    ):
+        self.history_budget = history_budget
+        self.summary_max_tokens = min(summary_max_tokens, history_budget // 2)
+        # 原文窗口使用摘要之外的剩余预算
+        self.recent_budget = history_budget - self.summary_max_tokens
+        self.summary_input_budget = summary_input_budget
+        self.max_users = max_users
+        self.model = model
+        self._states: "OrderedDict[str, _SummaryState]" = OrderedDict()
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._refreshes = 0
+        self._refresh_failures = 0
+
+    @staticmethod
+    def _tokens(turns: List[Turn]) -> int:
+        return sum(message_tokens(turn.role, turn.content) for turn in turns)
+
+    def split(self, turns: List[Turn]) -> Tuple[List[Turn], List[Turn]]:
+        """从最新一轮往前取原文直到用完原文预算，返回 (较早的轮次, 最近的轮次)"""
+        used = 0
+        start = len(turns)
+        for i in range(len(turns) - 1, -1, -1):
+            cost = message_tokens(turns[i].role, turns[i].content)
+            if used + cost > self.recent_budget:
+                break
+            used += cost
+            start = i
+        return turns[:start], turns[start:]
+
+    def build_messages(self, user_id: str, turns: List[Turn]) -> List[Dict[str, str]]:
+        """
+        组装历史上下文：缓存的摘要（作为一条 system 消息）加最近轮次原文
+
+        尚未折叠进摘要的较早轮次会触发一次后台摘要更新，本次请求使用已有摘要
+        """
+        older, recent = self.split(turns)
+        state = self._states.get(user_id)
+        if state is not None:
+            self._states.move_to_end(user_id)
+
+        pending = [
+            turn for turn in older
+            if state is None or state.covered_key is None or turn.key > state.covered_key
+        ]
+        # 攒够一定长度再合并，避免每轮对话都触发一次摘要调用
+        if pending and (state is None or self._tokens(pending) >= self.recent_budget // 8):
+            self._schedule_refresh(user_id, pending)
+
+        messages: List[Dict[str, str]] = []
+        if state is not None and state.summary:
+            messages.append({"role": "system", "content": f"此前对话摘要：{state.summary}"})
+        messages.extend({"role": turn.role, "content": turn.content} for turn in recent)
+        return messages
+
+    def get_summary(self, user_id: str) -> Optional[str]:
+        state = self._states.get(user_id)
+        return state.summary if state else None
+
+    def forget(self, user_id: str):
+        self._states.pop(user_id, None)
+
+    def _schedule_refresh(self, user_id: str, pending: List[Turn]):
+        # 同一用户同时只做一次摘要更新，剩余轮次由之后的请求继续折叠
+        if user_id in self._refreshing:
+            return
+        self._refreshing.add(user_id)
+        task = asyncio.create_task(self._refresh(user_id, pending))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, user_id: str, pending: List[Turn]):
+        try:
+            previous = self._states.get(user_id)
+            # 一次合并的新增轮次有上限，超出的最早部分直接略过
+            selected: List[Turn] = []
+            used = 0
+            for turn in reversed(pending):
+                cost = message_tokens(turn.role, turn.content)
+                if selected and used + cost > self.summary_input_budget:
+                    break
+                selected.append(turn)
+                used += cost
+            selected.reverse()
+
+            summary = await self._summarize(previous.summary if previous else "", selected)
+            self._states[user_id] = _SummaryState(
+                summary=_truncate_to_tokens(summary, self.summary_max_tokens),
+                covered_key=pending[-1].key,
+                updated_at=time.time()
+            )
+            self._states.move_to_end(user_id)
+            while len(self._states) > self.max_users:
+                self._states.popitem(last=False)
+            self._refreshes += 1
+        except Exception as e:
+            # 摘要失败不影响对话，保留旧摘要，下次请求再尝试
+            self._refresh_failures += 1
+            print(f"[CHAT MEMORY] 用户 {user_id} 摘要更新失败: {type(e).__name__}: {e}")
+        finally:
+            self._refreshing.discard(user_id)
+
+    async def _summarize(self, previous_summary: str, turns: List[Turn]) -> str:
+        dialogue = "\n".join(
+            f"{'用户' if turn.role == 'user' else '助手'}：{_truncate_to_tokens(turn.content, self.summary_input_budget // 2)}"
+            for turn in turns
+        )
+        prompt = f"""已有摘要：
+{previous_summary or "（无）"}
+
+新增对话：
+{dialogue}
+
+请把新增对话合并进已有摘要，保留用户的考研目标、主要压力来源、情绪变化、已给出的建议和用户的反馈，
+删去寒暄与重复内容，不超过{self.summary_max_tokens}字，直接输出摘要正文。"""
+        messages = [
+            {"role": "system", "content": "你负责为考研心理健康助手维护与用户的长期对话摘要。"},
+            {"role": "user", "content": prompt}
+        ]
+        with telemetry_scope(endpoint="memory:summary"):
+            summary = await llm_gateway.complete_text(
+                model=self.model,
+                messages=messages,
+                priority=Priority.LOW,
+                coalesce=False,
+                temperature=0.3,
+                max_tokens=self.summary_max_tokens
+            )
+        return summary.strip()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._states),
+            "refreshing": len(self._refreshing),
+            "refreshes": self._refreshes,
+            "refresh_failures": self._refresh_failures,
+            "history_budget": self.history_budget,
+            "recent_budget": self.recent_budget,
+            "summary_max_tokens": self.summary_max_tokens,
+        }
+
+
+# 全局对话记忆实例，摘要按用户缓存在进程内
+conversation_memory = ConversationMemory(
+    history_budget=settings.CHAT_MEMORY_TOKEN_BUDGET,
+    summary_max_tokens=settings.CHAT_MEMORY_SUMMARY_MAX_TOKENS,
+    summary_input_budget=settings.CHAT_MEMORY_SUMMARY_INPUT_BUDGET,
+    max_users=settings.CHAT_MEMORY_MAX_USERS
+)
@@ -0,0 +1,139 @@
+"""
+daily_user_stats 汇总表的维护
+心情、睡眠、任务、日历备注的每次写入，在同一事务中按受影响的 (用户, 日期) 从原始记录重新汇总这几天
+（只扫描这几天的索引范围），因此更新、删除和重复提交都不会让汇总表与原始数据产生偏差；
+图表和压力处方接口只读 O(天数) 行汇总数据，不再扫描历史记录。
+
+首次上线或发现数据不一致时用 rebuild_daily_stats 按用户重建（python rebuild_daily_stats.py）
+"""
+
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+from app.db.compat import dialect_insert
+from app.models.daily_user_stats import DailyUserStats
+from app.services.stats_queries import ddl_daily_statement, mood_daily_statement, sleep_daily_statement, task_daily_statement
+
+ROLLUP_MOOD = "mood"
+ROLLUP_SLEEP = "sleep"
+ROLLUP_TASK = "task"
+ROLLUP_DDL = "ddl"
+
+UPSERT_BATCH_SIZE = 500
+
+
+def _midnight(day: Optional[date]) -> Optional[datetime]:
+    return datetime.combine(day, datetime.min.time()) if day is not None else None
+
+
+class _RollupSource:
+    """一类原始记录：汇总语句（按日期范围和用户）、汇总行到列值的转换、当天没有记录时的列值"""
+
+    def __init__(self, statement: Callable, to_values: Callable[[Any], Dict[str, Any]], empty: Dict[str, Any]):
+        self.statement = statement
+        self.to_values = to_values
+        self.empty = empty
+        self.columns = list(empty)
+
+
+SOURCES: Dict[str, _RollupSource] = {
+    ROLLUP_MOOD: _RollupSource(
+        lambda start, end, user_id: mood_daily_statement(_midnight(start), _midnight(end), user_id),
+        lambda row: {"mood_count": row.record_count, "stress_level_sum": int(row.stress_total), "top_mood": row.mood},
+        {"mood_count": 0, "stress_level_sum": 0, "top_mood": None},
+    ),
+    ROLLUP_SLEEP: _RollupSource(
+        lambda start, end, user_id: sleep_daily_statement(_midnight(start), _midnight(end), user_id),
+        lambda row: {"sleep_count": row.record_count, "sleep_hours_sum": float(row.hours_total)},
+        {"sleep_count": 0, "sleep_hours_sum": 0.0},
+    ),
+    ROLLUP_TASK: _RollupSource(
+        task_daily_statement,
+        lambda row: {"task_count": row.record_count, "task_completed": row.completed_count},
+        {"task_count": 0, "task_completed": 0},
+    ),
+    ROLLUP_DDL: _RollupSource(
+        ddl_daily_statement,
+        lambda row: {"ddl_stress_score": row.stress_score},
+        {"ddl_stress_score": None},
+    ),
+}
+
+
+async def _upsert_days(db: AsyncSession, user_id: int, values_by_day: Dict[date, Dict[str, Any]], columns: List[str]):
+    """按 (user_id, stat_date) 写入汇总行，已存在时只覆盖 columns 中的列"""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "stat_date": day, "updated_at": now, **values}
+        for day, values in sorted(values_by_day.items())
+    ]
+    for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+        statement = dialect_insert(db, DailyUserStats).values(rows[offset:offset + UPSERT_BATCH_SIZE])
+        statement = statement.on_conflict_do_update(
+            index_elements=["user_id", "stat_date"],
+            set_={column: statement.excluded[column] for column in columns + ["updated_at"]}
+        )
+        await db.execute(statement)
+
+
+async def refresh_daily_stats(db: AsyncSession, user_id: int, days: Iterable[date], source: str):
+    """
+    在调用方的事务中，按原始记录重新计算这些天的一类汇总；写入原始记录之后、提交之前调用
+
+    先 upsert 占住汇总行：PostgreSQL 上 ON CONFLICT DO UPDATE 会锁住这些行，同一用户同一天的并发刷新依次执行，
+    后执行的汇总查询能看到先提交的事务写入的记录；SQLite 的写事务本身是串行的
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    rollup = SOURCES[source]
+    # 会话关闭了 autoflush，先把调用方尚未写出的改动写入，汇总查询才能看到
+    await db.flush()
+    await _upsert_days(db, user_id, {day: {} for day in days}, [])
+    result = await db.execute(rollup.statement(days[0], days[-1] + timedelta(days=1), user_id))
+    computed = {row.day: rollup.to_values(row) for row in result}
+    await _upsert_days(db, user_id, {day: computed.get(day, rollup.empty) for day in days}, rollup.columns)
+
+
+async def load_daily_stats(db: AsyncSession, user_id: int, start: date, end: Optional[date] = None) -> Dict[date, DailyUserStats]:
+    """读取 [start, end) 日期范围内的汇总行，{日期: 行}；没有任何记录的日期不在结果中"""
+    conditions = [DailyUserStats.user_id == user_id, DailyUserStats.stat_date >= start]
+    if end is not None:
+        conditions.append(DailyUserStats.stat_date < end)
+    result = await db.execute(select(DailyUserStats).where(*conditions).order_by(DailyUserStats.stat_date))
+    return {row.stat_date: row for row in result.scalars()}
+
+
+async def rebuild_user_daily_stats(db: AsyncSession, user_id: int) -> int:
+    """删除用户的汇总行并按全部原始记录重建，返回写入的天数；在调用方的事务中执行"""
+    await db.execute(delete(DailyUserStats).where(DailyUserStats.user_id == user_id))
+    days = set()
+    for rollup in SOURCES.values():
+        result = await db.execute(rollup.statement(None, None, user_id))
+        values_by_day = {row.day: rollup.to_values(row) for row in result}
+        await _upsert_days(db, user_id, values_by_day, rollup.columns)
+        days.update(values_by_day)
+    return len(days)
+
+
+async def rebuild_daily_stats(engine: AsyncEngine, user_id: Optional[int] = None) -> int:
+    """重建全部用户（或指定用户）的汇总表，每个用户一个事务，返回写入的总天数"""
+    from app.models.sqlite_user import User
+
+    session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False)
+    async with session_factory() as session:
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            user_ids = (await session.execute(select(User.id).order_by(User.id))).scalars().all()
+
+    total = 0
+    for current_user_id in user_ids:
+        async with session_factory() as session:
+            total += await rebuild_user_daily_stats(session, current_user_id)
+            await session.commit()
+    print(f"daily_user_stats: 重建 {len(user_ids)} 个用户，共 {total} 天")
+    return total
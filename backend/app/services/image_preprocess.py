@@ -0,0 +1,217 @@
+"""
+视觉模型调用前的图片预处理
+前端画布导出的 PNG 往往尺寸大、体积大，直接上传会增加请求体积、视觉 token 数和延迟。
+这里在调用 qwen-vl 之前解码图片，把最长边限制在 IMAGE_PREPROCESS_MAX_SIDE 以内，
+再按配置的格式和质量重新编码；解码/编码在线程池中执行，不阻塞事件循环。
+未安装 Pillow、图片不是 base64 data URL 或处理失败时原样返回。
+同一线程池也用于计算感知哈希（dHash）、画作本地特征和画廊缩略图
+"""
+
+import asyncio
+import io
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.services.image_store import parse_data_url, to_data_url
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+_FORMAT_MIME = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+# 记住最近输出过的图片，已经预处理过的 data URL 再次传入时直接返回，不重复解码编码
+PREPARED_HISTORY_SIZE = 128
+
+
+def flatten_to_rgb(image: "Image.Image") -> "Image.Image":
+    """转成 RGB，透明部分铺白色背景"""
+    if image.mode in ("RGBA", "LA", "P"):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        return background
+    if image.mode != "RGB":
+        return image.convert("RGB")
+    return image
+
+
+def difference_hash(data: bytes, hash_size: int = 8) -> int:
+    """
+    计算图片的 dHash（同步执行，在线程池中调用）
+
+    缩成 (hash_size+1) x hash_size 灰度图，逐行比较相邻像素亮度，得到 hash_size*hash_size 位整数；
+    缩放、轻微涂改、重新编码后的图片哈希只差几位
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        gray = flatten_to_rgb(image).convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+        pixels = list(gray.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (1 if pixels[offset + col] > pixels[offset + col + 1] else 0)
+    return value
+
+
+def downscale_image(data: bytes, max_side: int, image_format: str, quality: int) -> Tuple[bytes, str, Tuple[int, int], Tuple[int, int]]:
+    """
+    缩放并重新编码图片（同步执行，在线程池中调用）
+
+    返回 (编码后的字节, mime, 原始尺寸, 输出尺寸)
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        original_size = image.size
+        if max(image.size) > max_side:
+            image.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        if image_format == "JPEG":
+            # JPEG 不支持透明通道，画布的透明背景铺成白色，避免变成黑底
+            image = flatten_to_rgb(image)
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        output = io.BytesIO()
+        options: Dict[str, Any] = {}
+        if image_format in ("JPEG", "WEBP"):
+            options["quality"] = quality
+        if image_format == "JPEG":
+            options["optimize"] = True
+        image.save(output, format=image_format, **options)
+        return output.getvalue(), _FORMAT_MIME[image_format], original_size, image.size
+
+
+class ImagePreprocessor:
+    """把视觉模型的输入图片压缩到可控尺寸，并统计节省的字节数"""
+
+    def __init__(self, enabled: bool, max_side: int, image_format: str, quality: int, workers: int, thumbnail_size: int):
+        image_format = image_format.upper()
+        self.enabled = enabled and PIL_AVAILABLE
+        self.max_side = max_side
+        self.thumbnail_size = thumbnail_size
+        self.image_format = image_format if image_format in _FORMAT_MIME else "JPEG"
+        self.quality = quality
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="image-preprocess")
+        self._processed = 0
+        self._skipped = 0
+        self._failures = 0
+        self._input_bytes = 0
+        self._output_bytes = 0
+        self._total_seconds = 0.0
+        self._prepared: "OrderedDict[int, None]" = OrderedDict()
+
+    def _remember(self, image_data_url: str):
+        key = hash(image_data_url)
+        self._prepared[key] = None
+        self._prepared.move_to_end(key)
+        while len(self._prepared) > PREPARED_HISTORY_SIZE:
+            self._prepared.popitem(last=False)
+
+    async def prepare(self, image_data_url: Optional[str]) -> Optional[str]:
+        """返回压缩后的 data URL；不需要或无法处理时返回原值"""
+        if not self.enabled or not image_data_url:
+            return image_data_url
+        if hash(image_data_url) in self._prepared:
+            return image_data_url
+        try:
+            _, data = parse_data_url(image_data_url)
+        except ValueError:
+            # 非 data URL（如 http 链接）交给模型服务自行下载
+            self._skipped += 1
+            return image_data_url
+
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            encoded, mime, original_size, output_size = await loop.run_in_executor(
+                self._executor, downscale_image, data, self.max_side, self.image_format, self.quality
+            )
+        except Exception as e:
+            self._failures += 1
+            print(f"[IMAGE PREPROCESS] 图片预处理失败，使用原图: {type(e).__name__}: {e}")
+            return image_data_url
+        elapsed = time.perf_counter() - started
+
+        # 原图已经足够小时重新编码反而可能变大，此时保留原图
+        if len(encoded) >= len(data) and output_size == original_size:
+            self._skipped += 1
+            self._remember(image_data_url)
+            return image_data_url
+
+        self._processed += 1
+        self._input_bytes += len(data)
+        self._output_bytes += len(encoded)
+        self._total_seconds += elapsed
+        print(
+            f"[IMAGE PREPROCESS] {original_size[0]}x{original_size[1]} -> {output_size[0]}x{output_size[1]}, "
+            f"{len(data)} -> {len(encoded)} 字节 (节省 {len(data) - len(encoded)} 字节), 耗时 {elapsed * 1000:.0f}ms"
+        )
+        prepared = to_data_url(mime, encoded)
+        self._remember(prepared)
+        return prepared
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """在图片处理线程池中执行同步函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def thumbnail(self, data: bytes) -> Optional[Tuple[str, bytes]]:
+        """生成画廊缩略图，返回 (mime, 字节)；未安装 Pillow、无法解码或原图已不大于缩略图时返回 None"""
+        if not PIL_AVAILABLE:
+            return None
+        try:
+            encoded, mime, original_size, _ = await self.run(
+                downscale_image, data, self.thumbnail_size, self.image_format, self.quality
+            )
+        except Exception as e:
+            print(f"[IMAGE PREPROCESS] 生成缩略图失败: {type(e).__name__}: {e}")
+            return None
+        if max(original_size) <= self.thumbnail_size and len(encoded) >= len(data):
+            return None
+        return mime, encoded
+
+    async def dhash(self, image_data_url: Optional[str]) -> Optional[int]:
+        """计算图片的 64 位 dHash；未安装 Pillow 或无法解码时返回 None"""
+        if not PIL_AVAILABLE or not image_data_url:
+            return None
+        try:
+            _, data = parse_data_url(image_data_url)
+            return await self.run(difference_hash, data)
+        except Exception as e:
+            print(f"[IMAGE PREPROCESS] 计算图片哈希失败: {type(e).__name__}: {e}")
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        saved = self._input_bytes - self._output_bytes
+        return {
+            "enabled": self.enabled,
+            "pillow_available": PIL_AVAILABLE,
+            "max_side": self.max_side,
+            "format": self.image_format,
+            "quality": self.quality,
+            "processed": self._processed,
+            "skipped": self._skipped,
+            "failures": self._failures,
+            "input_bytes": self._input_bytes,
+            "output_bytes": self._output_bytes,
+            "bytes_saved": saved,
+            "saved_ratio": round(saved / self._input_bytes, 4) if self._input_bytes else 0.0,
+            "avg_ms": round(self._total_seconds / self._processed * 1000, 2) if self._processed else 0.0,
+        }
+
+
+# 全局预处理实例
+image_preprocessor = ImagePreprocessor(
+    enabled=settings.IMAGE_PREPROCESS_ENABLED,
+    max_side=settings.IMAGE_PREPROCESS_MAX_SIDE,
+    image_format=settings.IMAGE_PREPROCESS_FORMAT,
+    quality=settings.IMAGE_PREPROCESS_QUALITY,
+    workers=settings.IMAGE_PREPROCESS_WORKERS,
+    thumbnail_size=settings.PAINTING_THUMBNAIL_SIZE
+)
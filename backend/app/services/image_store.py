@@ -0,0 +1,158 @@
+"""
+画作图片存储
+图片解码后按 sha256 存入 image_blobs 表（相同内容只存一份），画作记录只保存哈希与元数据；
+前端通过 /api/v1/paintings/images/{hash} 获取图片（需登录，只能取自己画作的图片；强 ETag，内容不变可长期缓存），
+画廊列表使用 /api/v1/paintings/images/{hash}/thumbnail 缩略图（首次请求时生成，同样存入 image_blobs），
+需要传给视觉模型时再按哈希还原成 data URL
+"""
+
+import base64
+import binascii
+import hashlib
+import re
+from typing import Any, Optional, Tuple
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.db.compat import dialect_insert
+from app.db.sqlite_database import AsyncSessionLocal
+from app.models.sqlite_models import AIJobORM, ImageBlobORM, PaintingEntryORM
+
+IMAGE_URL_PREFIX = "/api/v1/paintings/images/"
+
+_DATA_URL = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+)?(?P<params>(?:;[^,;]*)*),(?P<data>.*)$", re.DOTALL)
+
+
+def parse_data_url(data_url: str) -> Tuple[str, bytes]:
+    """解析 base64 data URL，返回 (mime, 原始字节)；格式不正确时抛出 ValueError"""
+    match = _DATA_URL.match(data_url.strip()) if data_url else None
+    if not match or ";base64" not in match.group("params"):
+        raise ValueError("图片数据不是 base64 data URL")
+    try:
+        data = base64.b64decode(match.group("data"), validate=False)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"图片 base64 解码失败: {e}")
+    if not data:
+        raise ValueError("图片数据为空")
+    return match.group("mime") or "application/octet-stream", data
+
+
+def to_data_url(mime: str, data: bytes) -> str:
+    return f"data:{mime};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+def image_url(image_hash: Optional[str]) -> Optional[str]:
+    return f"{IMAGE_URL_PREFIX}{image_hash}" if image_hash else None
+
+
+def thumbnail_url(image_hash: Optional[str]) -> Optional[str]:
+    return f"{IMAGE_URL_PREFIX}{image_hash}/thumbnail" if image_hash else None
+
+
+async def put_image(session: AsyncSession, mime: str, data: bytes) -> str:
+    """
+    在调用方的事务中写入图片（已存在则保持原样），返回 sha256
+
+    已存在时用 DO UPDATE 把哈希写回原值而不是 DO NOTHING：PostgreSQL 上这样会锁住已有的 blob 行，
+    并发的 release_image 要等本事务提交后才能判断引用，不会删掉新画作、任务刚引用的图片
+    """
+    image_hash = hashlib.sha256(data).hexdigest()
+    statement = dialect_insert(session, ImageBlobORM).values(hash=image_hash, mime=mime, size=len(data), data=data)
+    await session.execute(
+        statement.on_conflict_do_update(index_elements=["hash"], set_={"hash": statement.excluded.hash})
+    )
+    return image_hash
+
+
+async def store_painting_image(session: AsyncSession, painting: PaintingEntryORM, data_url: str):
+    """把 data URL 存入 blob 表并在画作记录上填好哈希与元数据"""
+    mime, data = parse_data_url(data_url)
+    painting.image_hash = await put_image(session, mime, data)
+    painting.image_mime = mime
+    painting.image_size = len(data)
+    painting.image_data_url = ""
+
+
+async def get_image(image_hash: str) -> Optional[ImageBlobORM]:
+    async with AsyncSessionLocal() as session:
+        return await session.get(ImageBlobORM, image_hash)
+
+
+async def get_thumbnail(image_hash: str) -> Optional[ImageBlobORM]:
+    """
+    取图片的缩略图，尚未生成时生成并存入 image_blobs
+
+    原图不存在时返回 None；无法生成缩略图（未安装 Pillow、解码失败、原图已足够小）时返回原图
+    """
+    from app.services.image_preprocess import image_preprocessor
+
+    async with AsyncSessionLocal() as session:
+        source = await session.get(ImageBlobORM, image_hash)
+        if source is None:
+            return None
+        if source.thumbnail_hash:
+            thumbnail = await session.get(ImageBlobORM, source.thumbnail_hash)
+            if thumbnail is not None:
+                return thumbnail
+
+        thumbnail = await image_preprocessor.thumbnail(source.data)
+        if thumbnail is None:
+            return source
+        mime, data = thumbnail
+        thumbnail_hash = await put_image(session, mime, data)
+        source.thumbnail_hash = thumbnail_hash
+        await session.commit()
+        return await session.get(ImageBlobORM, thumbnail_hash)
+
+
+async def load_painting_data_url(painting: PaintingEntryORM) -> Optional[str]:
+    """取画作图片的 data URL（调用视觉模型用）；尚未迁移的旧记录直接返回原字段"""
+    if painting.image_hash:
+        blob = await get_image(painting.image_hash)
+        if blob is not None:
+            return to_data_url(blob.mime, blob.data)
+    return painting.image_data_url or None
+
+
+async def release_image(session: AsyncSession, image_hash: Optional[str], exclude_painting_id: Optional[str] = None):
+    """
+    画作或任务删除后，若没有其他画作、任务引用同一图片则删除 blob（连同其缩略图）
+
+    引用检查和删除放在同一条 DELETE ... WHERE NOT EXISTS 语句里，不再先计数再删除，
+    避免两步之间有新画作引用同一图片时误删。PostgreSQL 上先锁住原图和缩略图的 blob 行：
+    并发 put_image 的事务持有行锁时在这里等待，之后的 DELETE 是新语句，能看到它提交的引用
+    （DELETE 自己等锁时仍按语句开始时的快照判断 NOT EXISTS）；SQLite 写事务串行，FOR UPDATE 不生效也不需要
+    """
+    if not image_hash:
+        return
+
+    def referenced(hash_column) -> Any:
+        painting_refs = select(PaintingEntryORM.id).where(PaintingEntryORM.image_hash == hash_column)
+        if exclude_painting_id is not None:
+            painting_refs = painting_refs.where(PaintingEntryORM.id != exclude_painting_id)
+        job_refs = select(AIJobORM.id).where(AIJobORM.image_hash == hash_column)
+        return or_(painting_refs.exists(), job_refs.exists())
+
+    source = aliased(ImageBlobORM)
+    other = aliased(ImageBlobORM)
+    thumbnail_hash = select(source.thumbnail_hash).where(source.hash == image_hash).scalar_subquery()
+    await session.execute(
+        select(ImageBlobORM.hash)
+        .where(or_(ImageBlobORM.hash == image_hash, ImageBlobORM.hash == thumbnail_hash))
+        .with_for_update()
+    )
+    # 先删缩略图（要从原图行上取 thumbnail_hash），缩略图本身被画作引用或被其他原图共用时保留
+    await session.execute(
+        delete(ImageBlobORM).where(
+            ImageBlobORM.hash == thumbnail_hash,
+            ImageBlobORM.hash != image_hash,
+            ~referenced(image_hash),
+            ~referenced(ImageBlobORM.hash),
+            ~select(other.hash).where(other.thumbnail_hash == ImageBlobORM.hash, other.hash != image_hash).exists()
+        )
+    )
+    await session.execute(
+        delete(ImageBlobORM).where(ImageBlobORM.hash == image_hash, ~referenced(image_hash))
+    )
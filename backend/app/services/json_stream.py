@@ -0,0 +1,371 @@
+"""
+流式 JSON 提取
+大模型以 token 流输出 JSON 时，逐段喂入 IncrementalJSONExtractor，
+每个顶层字段一解析完成就立即产出（例如 voice_script 可以先交给 TTS，不必等 visual_prompt 生成完）；
+指定为 nested 的对象字段再往下一层，其中每个字段完成时以 "外层.内层" 的形式产出（例如 ai_reply.empathy_text）；
+输出结束后按 pydantic 模型校验字段，对截断、尾逗号等常见问题只做有限次数的修复
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Annotated, Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# 顶层对象内的解析状态
+_EXPECT_KEY = "expect_key"
+_IN_KEY = "in_key"
+_EXPECT_COLON = "expect_colon"
+_EXPECT_VALUE = "expect_value"
+_IN_VALUE = "in_value"      # 字符串 / 对象 / 数组值
+_IN_SCALAR = "in_scalar"    # 数字 / true / false / null
+_IN_NESTED = "in_nested"    # nested 对象值，交给子解析器
+_AFTER_VALUE = "after_value"
+
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+# 字符串末尾未写完的转义：奇数个反斜杠，后面可能跟着不完整的 \uXXXX
+_PARTIAL_ESCAPE = re.compile(r"(\\+)(u[0-9a-fA-F]{0,3})?$")
+
+
+def repair_json(text: str, max_attempts: int = 3) -> Any:
+    """
+    解析可能不完整的 JSON 文本
+
+    依次尝试：原样解析 -> 去掉尾逗号 -> 补全未闭合的字符串与括号，超过 max_attempts 次仍失败时抛出 ValueError
+    """
+    candidates = [
+        lambda t: t,
+        lambda t: _TRAILING_COMMA.sub(r"\1", t),
+        lambda t: _close_open_structures(_TRAILING_COMMA.sub(r"\1", t)),
+    ]
+    last_error: Optional[Exception] = None
+    for fix in candidates[:max_attempts]:
+        try:
+            return json.loads(fix(text))
+        except (json.JSONDecodeError, ValueError) as e:
+            last_error = e
+    raise ValueError(f"JSON修复失败: {last_error}")
+
+
+def _close_open_structures(text: str) -> str:
+    """补全被截断的 JSON：闭合字符串，去掉悬空的键或逗号，再按嵌套顺序补上括号"""
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+
+    if in_string:
+        text += '"'
+    if stack and stack[-1] == "}":
+        # 截断在 "key": 或 "key" 之后时去掉这个悬空的键
+        text = re.sub(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$', r"\1", text)
+    text = text.rstrip().rstrip(",")
+    return text + "".join(reversed(stack))
+
+
+class IncrementalJSONExtractor:
+    """
+    增量解析模型输出中的第一个 JSON 对象
+
+    用法:
+        extractor = IncrementalJSONExtractor(nested=["ai_reply"])
+        async for delta in stream:
+            for key, value in extractor.feed(delta):
+                ...  # 顶层字段或 "ai_reply.xxx" 解析完成；ai_reply 整体完成时再产出一次 ("ai_reply", dict)
+        data = extractor.finish()  # 全部已解析的顶层字段（含修复截断字段的结果）
+
+    对象之前的说明文字、```json 代码块标记会被跳过
+    """
+
+    def __init__(self, nested: Iterable[str] = ()):
+        self.fields: Dict[str, Any] = {}
+        self._nested = set(nested)
+        self._child: Optional["IncrementalJSONExtractor"] = None
+        self._child_start = 0
+        self.errors: List[str] = []
+        self._text = ""
+        self._pos = 0
+        self._started = False
+        self.done = False
+        self._state = _EXPECT_KEY
+        self._key: Optional[str] = None
+        self._token_start = 0
+        self._nest = 0
+        self._in_string = False
+        self._escape = False
+
+    @property
+    def started(self) -> bool:
+        """是否已读到 JSON 对象的起始位置"""
+        return self._started
+
+    def feed(self, chunk: str) -> List[Tuple[str, Any]]:
+        """喂入一段输出，返回本次新解析完成的顶层字段"""
+        if self.done or not chunk:
+            return []
+        self._text += chunk
+        completed: List[Tuple[str, Any]] = []
+        text = self._text
+
+        while self._pos < len(text) and not self.done:
+            if self._state == _IN_NESTED:
+                # 子解析器从对象的 { 开始读取，完成后从它结束的位置继续
+                for sub_key, value in self._child.feed(text[self._pos:]):
+                    completed.append((f"{self._key}.{sub_key}", value))
+                if not self._child.done:
+                    self._pos = len(text)
+                    break
+                self._pos = self._child_start + self._child._pos
+                self._complete_nested(completed)
+                self._state = _AFTER_VALUE
+                continue
+
+            ch = text[self._pos]
+
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._state = _EXPECT_KEY
+                self._pos += 1
+                continue
+
+            state = self._state
+            if state == _EXPECT_KEY:
+                if ch == '"':
+                    self._state = _IN_KEY
+                    self._token_start = self._pos
+                    self._escape = False
+                elif ch == "}":
+                    self.done = True
+            elif state == _IN_KEY:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._key = json.loads(text[self._token_start:self._pos + 1])
+                    self._state = _EXPECT_COLON
+            elif state == _EXPECT_COLON:
+                if ch == ":":
+                    self._state = _EXPECT_VALUE
+            elif state == _EXPECT_VALUE:
+                if not ch.isspace():
+                    self._token_start = self._pos
+                    self._escape = False
+                    if ch == '"':
+                        self._state = _IN_VALUE
+                        self._in_string = True
+                        self._nest = 0
+                    elif ch == "{" and self._key in self._nested:
+                        self._state = _IN_NESTED
+                        self._child = IncrementalJSONExtractor()
+                        self._child_start = self._pos
+                        continue
+                    elif ch in "{[":
+                        self._state = _IN_VALUE
+                        self._in_string = False
+                        self._nest = 1
+                    else:
+                        self._state = _IN_SCALAR
+            elif state == _IN_VALUE:
+                if self._in_string:
+                    if self._escape:
+                        self._escape = False
+                    elif ch == "\\":
+                        self._escape = True
+                    elif ch == '"':
+                        self._in_string = False
+                        if self._nest == 0:
+                            self._complete(text[self._token_start:self._pos + 1], completed)
+                            self._state = _AFTER_VALUE
+                elif ch == '"':
+                    self._in_string = True
+                elif ch in "{[":
+                    self._nest += 1
+                elif ch in "}]":
+                    self._nest -= 1
+                    if self._nest == 0:
+                        self._complete(text[self._token_start:self._pos + 1], completed)
+                        self._state = _AFTER_VALUE
+            elif state == _IN_SCALAR:
+                if ch in ",}" or ch.isspace():
+                    self._complete(text[self._token_start:self._pos], completed)
+                    if ch == "}":
+                        self.done = True
+                    else:
+                        self._state = _EXPECT_KEY if ch == "," else _AFTER_VALUE
+            elif state == _AFTER_VALUE:
+                if ch == ",":
+                    self._state = _EXPECT_KEY
+                elif ch == "}":
+                    self.done = True
+
+            self._pos += 1
+
+        return completed
+
+    def _complete(self, raw: str, completed: List[Tuple[str, Any]]):
+        key = self._key
+        self._key = None
+        if key is None:
+            return
+        try:
+            value = repair_json(raw, max_attempts=2)
+        except ValueError as e:
+            self.errors.append(f"{key}: {e}")
+            return
+        self.fields[key] = value
+        completed.append((key, value))
+
+    def partial_string(self) -> Optional[Tuple[str, str]]:
+        """
+        正在生成中的字符串字段：返回 (字段名, 已生成部分解码后的文本)，nested 对象内的字段名为 "外层.内层"；
+        当前不在字符串值中时返回 None。用于把字符串内容随生成进度逐段交给下游（例如流式显示回复正文）
+        """
+        if self._state == _IN_NESTED:
+            partial = self._child.partial_string()
+            return (f"{self._key}.{partial[0]}", partial[1]) if partial is not None else None
+        if self._state != _IN_VALUE or not self._in_string or self._nest != 0 or self._key is None:
+            return None
+        return self._key, _decode_partial_string(self._text[self._token_start + 1:self._pos])
+
+    def _complete_nested(self, completed: List[Tuple[str, Any]]):
+        key = self._key
+        self._key = None
+        self.errors.extend(f"{key}.{error}" for error in self._child.errors)
+        self.fields[key] = self._child.fields
+        completed.append((key, self._child.fields))
+
+    def finish(self) -> Dict[str, Any]:
+        """
+        输出结束：尝试修复被截断的最后一个字段，返回全部已解析的顶层字段
+
+        返回值中只包含解析成功的字段，缺失字段由调用方的校验步骤补默认值
+        """
+        if self._started and not self.done and self._key is not None:
+            if self._state == _IN_NESTED:
+                self._child.finish()
+                self.errors.extend(f"{self._key}.{error}" for error in self._child.errors)
+                self.fields[self._key] = self._child.fields
+            elif self._state in (_IN_VALUE, _IN_SCALAR):
+                raw = self._text[self._token_start:]
+                try:
+                    self.fields[self._key] = repair_json(raw)
+                except ValueError as e:
+                    self.errors.append(f"{self._key}: {e}")
+        self.done = True
+        return self.fields
+
+
+def _decode_partial_string(raw: str) -> str:
+    """解码未闭合的 JSON 字符串内容，去掉末尾尚未写完的转义和代理对的前半个字符"""
+    match = _PARTIAL_ESCAPE.search(raw)
+    if match and len(match.group(1)) % 2 == 1:
+        raw = raw[:match.end(1) - 1]
+    try:
+        text = json.loads(f'"{raw}"', strict=False)
+    except json.JSONDecodeError:
+        return ""
+    if text and "\ud800" <= text[-1] <= "\udbff":
+        text = text[:-1]
+    return text
+
+
+def parse_json_text(text: str) -> Dict[str, Any]:
+    """从一段完整的模型输出中解析第一个 JSON 对象的顶层字段，找不到对象时返回空字典"""
+    extractor = IncrementalJSONExtractor()
+    extractor.feed(text)
+    return extractor.finish()
+
+
+async def iter_json_fields(
+    deltas: AsyncIterator[str],
+    extractor: Optional[IncrementalJSONExtractor] = None
+) -> AsyncIterator[Tuple[str, Any]]:
+    """消费文本流，按完成顺序产出 (字段名, 值)；结束时补充修复出的截断字段"""
+    extractor = extractor or IncrementalJSONExtractor()
+    async for delta in deltas:
+        for item in extractor.feed(delta):
+            yield item
+    emitted = set(extractor.fields)
+    for key, value in extractor.finish().items():
+        if key not in emitted:
+            yield key, value
+
+
+@lru_cache(maxsize=256)
+def _field_adapter(model: Type[BaseModel], key: str) -> Optional[TypeAdapter]:
+    """字段类型连同 min_length 等约束（FieldInfo.metadata）一起构造校验器；构造开销较大，按 (模型, 字段) 缓存"""
+    field = model.model_fields.get(key)
+    if field is None:
+        return None
+    if field.metadata:
+        return TypeAdapter(Annotated[(field.annotation, *field.metadata)])
+    return TypeAdapter(field.annotation)
+
+
+def validate_field(model: Type[BaseModel], key: str, value: Any) -> Tuple[bool, Any]:
+    """
+    按模型中对应字段的类型和约束校验单个字段，返回 (是否有效, 规范化后的值)；模型中没有的字段视为无效
+
+    与 validate_fields 对整个模型的校验结果一致，流式提前发送的字段不会在最终结果里被替换成默认值
+    """
+    adapter = _field_adapter(model, key)
+    if adapter is None:
+        return False, value
+    try:
+        return True, adapter.validate_python(value)
+    except ValidationError:
+        return False, value
+
+
+def validate_fields(
+    model: Type[BaseModel],
+    data: Dict[str, Any],
+    defaults: Optional[Dict[str, Any]] = None
+) -> BaseModel:
+    """
+    按模型校验解析结果
+
+    缺失字段使用 defaults；校验失败的字段替换为 defaults 中的值（没有默认值时丢弃，交给模型自身的默认值），
+    只重试一次，仍失败时抛出 ValidationError
+    """
+    defaults = defaults or {}
+    merged = {**defaults, **{k: v for k, v in data.items() if k in model.model_fields}}
+    try:
+        return model.model_validate(merged)
+    except ValidationError as e:
+        for error in e.errors():
+            if not error.get("loc"):
+                continue
+            key = error["loc"][0]
+            if key in defaults:
+                merged[key] = defaults[key]
+            else:
+                merged.pop(key, None)
+        return model.model_validate(merged)
+
+
+def is_complete(model: Type[BaseModel], data: Dict[str, Any]) -> bool:
+    """解析结果是否包含模型的全部字段且全部校验通过（不需要补任何默认值）"""
+    if any(key not in data for key in model.model_fields):
+        return False
+    try:
+        model.model_validate({key: data[key] for key in model.model_fields})
+        return True
+    except ValidationError:
+        return False
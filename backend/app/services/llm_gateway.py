@@ -0,0 +1,251 @@
+"""
+LLM 网关
+所有大模型调用统一经过这里：
+- 通义千问（DashScope 兼容模式）：共享一个带连接池、keep-alive、HTTP/2 的 AsyncOpenAI 客户端，按模型设置超时
+- DeepSeek：应用生命周期内复用的 httpx.AsyncClient，避免每次请求都重新握手
+每次上游调用都先经过 llm_scheduler 按优先级获取执行名额，并由 llm_telemetry 记录耗时与 token 用量
+客户端在 FastAPI 启动时创建、关闭时释放，避免同步客户端阻塞事件循环
+"""
+
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from app.core.config import settings
+from app.services.llm_singleflight import SingleFlight, make_request_key
+from app.services.llm_scheduler import Priority, estimate_tokens, llm_scheduler
+from app.services.llm_telemetry import llm_telemetry
+
+try:
+    import h2  # noqa: F401  HTTP/2 依赖 httpx[http2]
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+def build_pooled_http_client(
+    max_connections: int,
+    max_keepalive_connections: int,
+    keepalive_expiry: float,
+    connect_retries: int,
+    timeout: float,
+    **kwargs
+) -> httpx.AsyncClient:
+    """
+    创建带连接池的 HTTP 客户端
+
+    连接失败（握手阶段）时由 transport 自动重试，已发出的请求不会重放
+    """
+    transport = httpx.AsyncHTTPTransport(
+        http2=settings.LLM_HTTP2 and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        retries=connect_retries,
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(timeout, connect=10.0),
+        **kwargs
+    )
+
+
+class LLMGateway:
+    """共享的异步大模型客户端"""
+
+    def __init__(self):
+        # 在 startup() 中创建；未经过启动钩子（如脚本中直接调用）时首次使用再创建
+        self._client: Optional[AsyncOpenAI] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._deepseek_client: Optional[httpx.AsyncClient] = None
+        self.single_flight = SingleFlight()
+
+    def is_available(self) -> bool:
+        """是否配置了 API Key"""
+        return bool(settings.OPENAI_API_KEY)
+
+    def timeout_for(self, model: str) -> float:
+        """获取指定模型的请求超时（秒）"""
+        return settings.LLM_MODEL_TIMEOUTS.get(model, settings.LLM_DEFAULT_TIMEOUT)
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """创建 DashScope 使用的 HTTP 客户端"""
+        return build_pooled_http_client(
+            max_connections=settings.LLM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            connect_retries=settings.LLM_CONNECT_RETRIES,
+            timeout=settings.LLM_DEFAULT_TIMEOUT,
+        )
+
+    def _build_deepseek_client(self) -> httpx.AsyncClient:
+        """创建 DeepSeek 使用的 HTTP 客户端"""
+        return build_pooled_http_client(
+            max_connections=settings.DEEPSEEK_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.DEEPSEEK_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.DEEPSEEK_KEEPALIVE_EXPIRY,
+            connect_retries=settings.DEEPSEEK_CONNECT_RETRIES,
+            timeout=60.0,
+            base_url=settings.DEEPSEEK_BASE_URL,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}"
+            },
+        )
+
+    def get_client(self) -> AsyncOpenAI:
+        """获取共享的 AsyncOpenAI 客户端"""
+        if self._client is None:
+            self._http_client = self._build_http_client()
+            self._client = AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_API_BASE,
+                http_client=self._http_client,
+                max_retries=settings.LLM_MAX_RETRIES,
+            )
+            print(f"LLM网关初始化成功 - 端点: {settings.OPENAI_API_BASE}, HTTP/2: {settings.LLM_HTTP2 and HTTP2_AVAILABLE}")
+        return self._client
+
+    def get_deepseek_client(self) -> httpx.AsyncClient:
+        """获取共享的 DeepSeek HTTP 客户端（base_url 与鉴权头已设置）"""
+        if self._deepseek_client is None:
+            self._deepseek_client = self._build_deepseek_client()
+            print(f"DeepSeek客户端初始化成功 - 端点: {settings.DEEPSEEK_BASE_URL}")
+        return self._deepseek_client
+
+    async def chat_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        priority: Priority = Priority.NORMAL,
+        coalesce: bool = True,
+        **kwargs
+    ):
+        """
+        调用 chat.completions 接口
+
+        参数:
+            model: 模型名称
+            messages: 消息列表（支持多模态 content）
+            priority: 调度优先级
+            coalesce: 是否与进行中的相同请求合并（流式请求不合并）
+            kwargs: 透传给 OpenAI SDK 的其他参数，未指定 timeout 时使用模型默认超时
+
+        返回:
+            ChatCompletion（stream=True 时为 AsyncStream，名额只覆盖建立连接阶段）
+        """
+        kwargs.setdefault("timeout", self.timeout_for(model))
+
+        async def call():
+            tokens = estimate_tokens(messages, kwargs.get("max_tokens"))
+            async with llm_scheduler.slot("dashscope", priority, tokens) as usage:
+                async with llm_telemetry.track("dashscope", model, messages) as record:
+                    response = await self.get_client().chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        **kwargs
+                    )
+                    if getattr(response, "usage", None) is not None:
+                        usage["tokens"] = response.usage.total_tokens
+                        record.set_usage(response.usage)
+                return response
+
+        if not coalesce or kwargs.get("stream"):
+            return await call()
+        key = make_request_key(model, messages, dict(kwargs, _priority=int(priority)))
+        return await self.single_flight.do(key, call)
+
+    async def complete_text(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        priority: Priority = Priority.NORMAL,
+        coalesce: bool = True,
+        **kwargs
+    ) -> str:
+        """
+        调用模型并返回完整回复文本
+
+        stream=True 时以流式请求上游并拼接全部片段（整个读取过程占用名额）；相同请求同样会被合并
+        """
+        kwargs.setdefault("timeout", self.timeout_for(model))
+
+        async def call() -> str:
+            tokens = estimate_tokens(messages, kwargs.get("max_tokens"))
+            async with llm_scheduler.slot("dashscope", priority, tokens) as usage:
+                async with llm_telemetry.track("dashscope", model, messages) as record:
+                    response = await self.get_client().chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        **kwargs
+                    )
+                    if not kwargs.get("stream"):
+                        if getattr(response, "usage", None) is not None:
+                            usage["tokens"] = response.usage.total_tokens
+                            record.set_usage(response.usage)
+                        return response.choices[0].message.content or ""
+                    text = ""
+                    async for chunk in response:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            record.add_text(chunk.choices[0].delta.content)
+                            text += chunk.choices[0].delta.content
+                    return text
+
+        if not coalesce:
+            return await call()
+        key = make_request_key(model, messages, dict(kwargs, _text=True, _priority=int(priority)))
+        return await self.single_flight.do(key, call)
+
+    async def stream_text(
+        self,
+        model: str,
+        messages: List[Dict[str, Any]],
+        priority: Priority = Priority.NORMAL,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """
+        流式调用模型，逐段产出回复文本
+
+        整个读取过程占用名额；调用方提前结束迭代（如客户端断开）时关闭上游连接并归还名额
+        """
+        kwargs.setdefault("timeout", self.timeout_for(model))
+        kwargs["stream"] = True
+        tokens = estimate_tokens(messages, kwargs.get("max_tokens"))
+        async with llm_scheduler.slot("dashscope", priority, tokens):
+            async with llm_telemetry.track("dashscope", model, messages) as record:
+                response = await self.get_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    **kwargs
+                )
+                try:
+                    async for chunk in response:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            record.add_text(chunk.choices[0].delta.content)
+                            yield chunk.choices[0].delta.content
+                finally:
+                    await response.response.aclose()
+
+    async def startup(self):
+        """应用启动时创建连接池"""
+        if self.is_available():
+            self.get_client()
+        if settings.DEEPSEEK_API_KEY:
+            self.get_deepseek_client()
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+        if self._deepseek_client is not None:
+            await self._deepseek_client.aclose()
+        self._http_client = None
+        self._client = None
+        self._deepseek_client = None
+
+
+# 全局网关实例
+llm_gateway = LLMGateway()
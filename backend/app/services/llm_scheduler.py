@@ -0,0 +1,259 @@
+"""
+大模型并发调度
+按优先级排队，并对每个上游服务限制并发数与每分钟 token 预算：
+- 危机相关调用（情绪急救、消息情绪分析）优先出队，且不受 token 预算限制
+- 批量创作类调用（疗愈故事、心灵镜像、备考计划）在接近上游限流时延后，等待过久则直接放弃（降级到默认结果）
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+
+
+class Priority(IntEnum):
+    """调用优先级，数值越小越先出队"""
+    CRITICAL = 0  # 危机相关：情绪急救、消息情绪分析
+    HIGH = 1      # 用户同步等待的对话类调用
+    NORMAL = 2
+    LOW = 3       # 批量创作类调用
+
+
+class LLMOverloadedError(Exception):
+    """上游接近限流，低优先级请求被放弃"""
+
+
+# 图片内容按固定 token 数估算
+IMAGE_TOKEN_ESTIMATE = 800
+
+
+def estimate_text_tokens(text: str) -> int:
+    """粗略估算一段文本的 token 数：中文按每字 1 token，其他字符按每 4 字符 1 token"""
+    cjk = sum(1 for ch in text if "一" <= ch <= "鿿")
+    return cjk + (len(text) - cjk) // 4
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> int:
+    """粗略估算一次调用的 token 数：各消息文本 token 数之和，再加上最大输出长度"""
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += estimate_text_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if isinstance(part, dict) and part.get("type") == "text":
+                    total += estimate_text_tokens(str(part.get("text", "")))
+                else:
+                    total += IMAGE_TOKEN_ESTIMATE
+    return total + (max_tokens or 0)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "future", "enqueued_at", "removed")
+
+    def __init__(self, priority: Priority, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.tokens = tokens
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.removed = False
+
+
+class _Ticket:
+    """已获得的执行名额，对应预算窗口中的一条记录"""
+    __slots__ = ("record",)
+
+    def __init__(self, record: List[float]):
+        self.record = record
+
+
+class ProviderScheduler:
+    """单个上游服务的调度器：并发上限 + 滑动窗口 token 预算 + 优先级队列"""
+
+    WINDOW_SECONDS = 60.0
+
+    def __init__(self, name: str, max_concurrency: int, tokens_per_minute: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.tokens_per_minute = tokens_per_minute
+        self._active = 0
+        self._heap: List[Any] = []
+        self._seq = itertools.count()
+        # 滑动窗口内已放行的调用：[放行时间, token 数]
+        self._window: Deque[List[float]] = deque()
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._wait_stats = {p: {"count": 0, "total": 0.0, "max": 0.0} for p in Priority}
+        self.shed = 0
+        self.deferred = 0
+
+    # ---------- 预算 ----------
+
+    def _trim_window(self, now: float):
+        while self._window and now - self._window[0][0] >= self.WINDOW_SECONDS:
+            self._window.popleft()
+
+    def budget_used(self) -> int:
+        self._trim_window(time.monotonic())
+        return int(sum(record[1] for record in self._window))
+
+    def utilization(self) -> float:
+        if self.tokens_per_minute <= 0:
+            return 0.0
+        return self.budget_used() / self.tokens_per_minute
+
+    def _budget_allows(self, waiter: _Waiter) -> bool:
+        if waiter.priority == Priority.CRITICAL or self.tokens_per_minute <= 0:
+            return True
+        used = self.budget_used()
+        limit = self.tokens_per_minute
+        # 低优先级只能使用预算的一部分，为危机与交互类调用预留余量
+        if waiter.priority == Priority.LOW:
+            limit = int(limit * settings.LLM_LOW_PRIORITY_BUDGET_RATIO)
+        # 单次调用超过整个预算时，在窗口清空后放行，避免永久阻塞
+        return used + waiter.tokens <= limit or used == 0
+
+    # ---------- 排队与放行 ----------
+
+    def _schedule_wakeup(self):
+        """预算不足时，在窗口中最早的记录过期后重新尝试放行"""
+        if self._wakeup is not None or not self._window:
+            return
+        delay = max(0.05, self.WINDOW_SECONDS - (time.monotonic() - self._window[0][0]))
+        loop = asyncio.get_running_loop()
+        self._wakeup = loop.call_later(delay, self._on_wakeup)
+
+    def _on_wakeup(self):
+        self._wakeup = None
+        self._dispatch()
+
+    def _dispatch(self):
+        while self._heap and self._active < self.max_concurrency:
+            waiter: _Waiter = self._heap[0][2]
+            if waiter.removed or waiter.future.done():
+                heapq.heappop(self._heap)
+                continue
+            if not self._budget_allows(waiter):
+                self.deferred += 1
+                self._schedule_wakeup()
+                return
+            heapq.heappop(self._heap)
+            self._grant(waiter)
+
+    def _grant(self, waiter: _Waiter):
+        self._active += 1
+        record = [time.monotonic(), float(waiter.tokens)]
+        self._window.append(record)
+        wait = time.monotonic() - waiter.enqueued_at
+        stats = self._wait_stats[waiter.priority]
+        stats["count"] += 1
+        stats["total"] += wait
+        stats["max"] = max(stats["max"], wait)
+        waiter.future.set_result(_Ticket(record))
+
+    async def acquire(self, priority: Priority, tokens: int) -> _Ticket:
+        """排队获取执行名额，低优先级在接近限流时可能抛出 LLMOverloadedError"""
+        if priority == Priority.LOW and self.utilization() >= settings.LLM_SHED_THRESHOLD:
+            self.shed += 1
+            raise LLMOverloadedError(f"{self.name} 接近限流，已放弃低优先级请求")
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, tokens, loop.create_future())
+        heapq.heappush(self._heap, (int(priority), next(self._seq), waiter))
+        self._dispatch()
+
+        timeout = settings.LLM_LOW_PRIORITY_MAX_WAIT if priority == Priority.LOW else None
+        try:
+            return await asyncio.wait_for(asyncio.shield(waiter.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            waiter.removed = True
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(waiter.future.result())
+            self.shed += 1
+            raise LLMOverloadedError(f"{self.name} 排队超时，已放弃低优先级请求")
+        except asyncio.CancelledError:
+            waiter.removed = True
+            if waiter.future.done() and not waiter.future.cancelled():
+                self.release(waiter.future.result())
+            raise
+
+    def release(self, ticket: _Ticket, actual_tokens: Optional[int] = None):
+        """归还执行名额；拿到真实 token 用量时修正预算记录"""
+        if actual_tokens is not None:
+            ticket.record[1] = float(actual_tokens)
+        self._active = max(0, self._active - 1)
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        depth = {p.name: 0 for p in Priority}
+        for _, _, waiter in self._heap:
+            if not waiter.removed and not waiter.future.done():
+                depth[waiter.priority.name] += 1
+        wait_times = {}
+        for p, s in self._wait_stats.items():
+            wait_times[p.name] = {
+                "count": s["count"],
+                "avg_seconds": round(s["total"] / s["count"], 4) if s["count"] else 0.0,
+                "max_seconds": round(s["max"], 4),
+            }
+        return {
+            "provider": self.name,
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": depth,
+            "tokens_used_last_minute": self.budget_used(),
+            "tokens_per_minute": self.tokens_per_minute,
+            "utilization": round(self.utilization(), 4),
+            "wait_times": wait_times,
+            "shed": self.shed,
+            "deferred": self.deferred,
+        }
+
+
+class LLMScheduler:
+    """按上游服务划分的调度器集合"""
+
+    def __init__(self):
+        self.providers: Dict[str, ProviderScheduler] = {
+            "dashscope": ProviderScheduler(
+                "dashscope",
+                max_concurrency=settings.LLM_DASHSCOPE_MAX_CONCURRENCY,
+                tokens_per_minute=settings.LLM_DASHSCOPE_TOKENS_PER_MINUTE,
+            ),
+            "deepseek": ProviderScheduler(
+                "deepseek",
+                max_concurrency=settings.DEEPSEEK_MAX_CONCURRENCY,
+                tokens_per_minute=settings.DEEPSEEK_TOKENS_PER_MINUTE,
+            ),
+        }
+
+    @asynccontextmanager
+    async def slot(self, provider: str, priority: Priority, tokens: int):
+        """
+        在名额内执行一次调用
+
+        用法:
+            async with llm_scheduler.slot("dashscope", Priority.HIGH, tokens) as usage:
+                ...
+                usage["tokens"] = response.usage.total_tokens  # 可选，修正预算
+        """
+        scheduler = self.providers[provider]
+        ticket = await scheduler.acquire(priority, tokens)
+        usage: Dict[str, Optional[int]] = {"tokens": None}
+        try:
+            yield usage
+        finally:
+            scheduler.release(ticket, usage["tokens"])
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [scheduler.stats() for scheduler in self.providers.values()]
+
+
+# 全局调度器实例
+llm_scheduler = LLMScheduler()
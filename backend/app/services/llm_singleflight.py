@@ -0,0 +1,78 @@
+"""
+相同请求合并（single-flight）
+并发的、提示词/模型/参数完全相同的大模型请求只向上游发送一次，
+其余调用方等待同一个结果，降低高峰期的上游 QPS 与配额消耗
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+def _normalize_content(content: Any) -> Any:
+    """规范化消息内容：合并多余空白，多模态内容逐段处理"""
+    if isinstance(content, str):
+        return " ".join(content.split())
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, dict) and part.get("type") == "text":
+                parts.append({"type": "text", "text": " ".join(str(part.get("text", "")).split())})
+            else:
+                parts.append(part)
+        return parts
+    return content
+
+
+def make_request_key(model: str, messages: List[Dict[str, Any]], params: Dict[str, Any]) -> str:
+    """根据规范化后的提示词、模型与生成参数计算请求指纹"""
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": m.get("role"), "content": _normalize_content(m.get("content"))}
+            for m in messages
+        ],
+        # timeout 只影响等待方式，不影响生成结果
+        "params": {k: v for k, v in params.items() if k != "timeout"},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """按请求指纹合并进行中的协程"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行 fn 并返回结果；已有相同 key 的请求在进行中时直接等待它
+
+        上游请求运行在独立的 Task 中，某个调用方断开（被取消）不会影响其他等待者
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # 所有等待者都已取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": len(self._inflight),
+            "upstream_requests": self.leaders,
+            "coalesced_requests": self.coalesced,
+        }
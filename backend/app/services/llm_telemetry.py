@@ -0,0 +1,348 @@
+"""
+大模型调用遥测
+在网关与 DeepSeek 调用路径上记录每次上游调用的首字延迟、总耗时、prompt/completion token 数、错误与估算费用，
+按 provider / model / 调用接口 / 功能模块 聚合为直方图与计数器：
+- /api/v1/ai/telemetry 以 JSON 返回进程内统计
+- /api/v1/ai/metrics 以 Prometheus 文本格式导出
+调用接口由 TelemetryContextMiddleware 写入上下文变量，后台任务可用 telemetry_scope 自行指定
+"""
+
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.llm_scheduler import estimate_tokens
+
+_endpoint_var: ContextVar[Optional[str]] = ContextVar("llm_endpoint", default=None)
+_feature_var: ContextVar[Optional[str]] = ContextVar("llm_feature", default=None)
+
+# 按接口前缀划分功能模块
+FEATURE_PREFIXES: List[Tuple[str, str]] = [
+    ("/api/v1/paintings", "painting"),
+    ("/api/v1/messengers", "messenger"),
+    ("/api/v1/stress-prescription", "prescription"),
+    ("/api/v1/emotional-aid", "emotional_aid"),
+    ("/api/v1/ai", "ai_assistant"),
+    ("/api/v1/moods", "mood"),
+]
+
+SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (50, 100, 200, 500, 1000, 2000, 4000, 8000)
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F]{24,64}|[0-9a-fA-F-]{36})$")
+
+
+def normalize_endpoint(path: str) -> str:
+    """把路径中的 ID 段替换为 {id}，避免标签基数无限增长"""
+    return "/".join("{id}" if _ID_SEGMENT.match(segment) else segment for segment in path.split("/"))
+
+
+def feature_for_endpoint(endpoint: Optional[str]) -> str:
+    if not endpoint:
+        return "background"
+    for prefix, feature in FEATURE_PREFIXES:
+        if endpoint.startswith(prefix):
+            return feature
+    return "other"
+
+
+@contextmanager
+def telemetry_scope(endpoint: Optional[str] = None, feature: Optional[str] = None):
+    """为不经过 HTTP 请求的调用（如后台任务）指定接口 / 功能标签"""
+    tokens = []
+    if endpoint is not None:
+        tokens.append((_endpoint_var, _endpoint_var.set(endpoint)))
+    if feature is not None:
+        tokens.append((_feature_var, _feature_var.set(feature)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class TelemetryContextMiddleware:
+    """ASGI 中间件：把当前请求路径写入上下文，供大模型调用打标签（流式响应的生成器同样能读到）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _endpoint_var.set(normalize_endpoint(scope.get("path", "")))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _endpoint_var.reset(token)
+
+
+class Histogram:
+    """固定分桶直方图"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """按分桶上界估算分位数"""
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for i, bound in enumerate(self.buckets):
+            cumulative += self.counts[i]
+            if cumulative >= target:
+                return bound
+        return float("inf")
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+class SeriesStats:
+    """同一组标签下的累计统计"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors: Dict[str, int] = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_token_requests = 0
+        self.cost = 0.0
+        self.ttft = Histogram(SECONDS_BUCKETS)
+        self.latency = Histogram(SECONDS_BUCKETS)
+        self.completion_tokens_hist = Histogram(TOKEN_BUCKETS)
+
+
+class CallRecord:
+    """一次上游调用，调用方在流式读取时标记首字时间并累计输出文本"""
+
+    def __init__(self, provider: str, model: str, messages: Optional[List[Dict[str, Any]]]):
+        self.provider = provider
+        self.model = model
+        self.messages = messages or []
+        self.endpoint = _endpoint_var.get()
+        self.feature = _feature_var.get() or feature_for_endpoint(self.endpoint)
+        self.started_at = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.error: Optional[str] = None
+        self._completion_text: List[str] = []
+
+    def first_token(self):
+        if self.ttft is None:
+            self.ttft = time.perf_counter() - self.started_at
+
+    def add_text(self, text: str):
+        """流式片段：首个片段记为首字时间，文本用于在缺少 usage 时估算 completion token"""
+        if text:
+            self.first_token()
+            self._completion_text.append(text)
+
+    def set_usage(self, usage: Any):
+        """记录上游返回的 usage（OpenAI SDK 对象或 dict）"""
+        if usage is None:
+            return
+        get = usage.get if isinstance(usage, dict) else (lambda k: getattr(usage, k, None))
+        self.prompt_tokens = get("prompt_tokens")
+        self.completion_tokens = get("completion_tokens")
+
+    def fail(self, error_type: str):
+        """标记非异常形式的失败（如 HTTP 状态码错误）"""
+        self.error = error_type
+
+    def resolve_tokens(self) -> Tuple[int, int, bool]:
+        """返回 (prompt, completion, 是否为估算值)"""
+        estimated = False
+        prompt = self.prompt_tokens
+        completion = self.completion_tokens
+        if prompt is None:
+            prompt = estimate_tokens(self.messages)
+            estimated = True
+        if completion is None:
+            completion = estimate_tokens([{"content": "".join(self._completion_text)}])
+            estimated = True
+        return prompt, completion, estimated
+
+
+class LLMTelemetry:
+    """按 (provider, model, endpoint, feature) 聚合的调用统计"""
+
+    def __init__(self):
+        self._series: Dict[Tuple[str, str, str, str], SeriesStats] = {}
+        self.started_at = time.time()
+
+    @asynccontextmanager
+    async def track(self, provider: str, model: str, messages: Optional[List[Dict[str, Any]]] = None):
+        """
+        记录一次上游调用
+
+        用法:
+            async with llm_telemetry.track("dashscope", model, messages) as record:
+                response = await ...
+                record.set_usage(response.usage)
+        """
+        record = CallRecord(provider, model, messages)
+        try:
+            yield record
+        except (asyncio.CancelledError, GeneratorExit):
+            record.error = record.error or "cancelled"
+            raise
+        except Exception as e:
+            record.error = record.error or type(e).__name__
+            raise
+        finally:
+            self._finish(record)
+
+    def _finish(self, record: CallRecord):
+        latency = time.perf_counter() - record.started_at
+        key = (record.provider, record.model, record.endpoint or "", record.feature)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = SeriesStats()
+
+        series.requests += 1
+        series.latency.observe(latency)
+        if record.ttft is not None:
+            series.ttft.observe(record.ttft)
+        if record.error:
+            series.errors[record.error] = series.errors.get(record.error, 0) + 1
+
+        prompt, completion, estimated = record.resolve_tokens()
+        series.prompt_tokens += prompt
+        series.completion_tokens += completion
+        series.completion_tokens_hist.observe(completion)
+        if estimated:
+            series.estimated_token_requests += 1
+        prompt_price, completion_price = settings.LLM_MODEL_PRICES.get(record.model, (0.0, 0.0))
+        series.cost += prompt / 1000 * prompt_price + completion / 1000 * completion_price
+
+    def reset(self):
+        self._series.clear()
+        self.started_at = time.time()
+
+    # ---------- 导出 ----------
+
+    def stats(self) -> Dict[str, Any]:
+        """进程内 JSON 统计：明细序列 + 按功能模块汇总"""
+        series_list = []
+        by_feature: Dict[str, Dict[str, Any]] = {}
+        for (provider, model, endpoint, feature), s in sorted(self._series.items()):
+            errors = sum(s.errors.values())
+            series_list.append({
+                "provider": provider,
+                "model": model,
+                "endpoint": endpoint,
+                "feature": feature,
+                "requests": s.requests,
+                "errors": dict(s.errors),
+                "error_rate": round(errors / s.requests, 4) if s.requests else 0.0,
+                "prompt_tokens": s.prompt_tokens,
+                "completion_tokens": s.completion_tokens,
+                "estimated_token_requests": s.estimated_token_requests,
+                "cost": round(s.cost, 6),
+                "ttft_seconds": s.ttft.summary(),
+                "latency_seconds": s.latency.summary(),
+            })
+            total = by_feature.setdefault(feature, {
+                "requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                "cost": 0.0, "latency_seconds_total": 0.0,
+            })
+            total["requests"] += s.requests
+            total["errors"] += errors
+            total["prompt_tokens"] += s.prompt_tokens
+            total["completion_tokens"] += s.completion_tokens
+            total["cost"] = round(total["cost"] + s.cost, 6)
+            total["latency_seconds_total"] = round(total["latency_seconds_total"] + s.latency.sum, 3)
+
+        return {
+            "since": self.started_at,
+            "currency": settings.LLM_PRICE_CURRENCY,
+            "by_feature": by_feature,
+            "series": series_list,
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines: List[str] = []
+
+        def labels(key: Tuple[str, str, str, str], **extra) -> str:
+            names = ("provider", "model", "endpoint", "feature")
+            pairs = list(zip(names, key)) + list(extra.items())
+            return "{" + ",".join(f'{k}="{_escape_label(str(v))}"' for k, v in pairs) + "}"
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        items = sorted(self._series.items())
+
+        counters = [
+            ("llm_requests_total", "Upstream LLM calls", lambda s: s.requests),
+            ("llm_prompt_tokens_total", "Prompt tokens (estimated when usage is missing)", lambda s: s.prompt_tokens),
+            ("llm_completion_tokens_total", "Completion tokens (estimated when usage is missing)", lambda s: s.completion_tokens),
+            ("llm_cost_total", f"Estimated cost in {settings.LLM_PRICE_CURRENCY}", lambda s: round(s.cost, 6)),
+        ]
+        for name, help_text, getter in counters:
+            header(name, "counter", help_text)
+            for key, s in items:
+                lines.append(f"{name}{labels(key)} {getter(s)}")
+
+        header("llm_errors_total", "counter", "Failed upstream LLM calls by error type")
+        for key, s in items:
+            for error_type, count in sorted(s.errors.items()):
+                lines.append(f"llm_errors_total{labels(key, error_type=error_type)} {count}")
+
+        histograms = [
+            ("llm_time_to_first_token_seconds", "Time to first streamed token", lambda s: s.ttft),
+            ("llm_request_duration_seconds", "Total upstream call duration", lambda s: s.latency),
+            ("llm_completion_tokens_per_request", "Completion tokens per call", lambda s: s.completion_tokens_hist),
+        ]
+        for name, help_text, getter in histograms:
+            header(name, "histogram", help_text)
+            for key, s in items:
+                hist = getter(s)
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{labels(key, le=_format_bound(bound))} {cumulative}")
+                lines.append(f"{name}_bucket{labels(key, le='+Inf')} {hist.count}")
+                lines.append(f"{name}_sum{labels(key)} {round(hist.sum, 6)}")
+                lines.append(f"{name}_count{labels(key)} {hist.count}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return str(int(bound)) if float(bound).is_integer() else str(bound)
+
+
+# 全局遥测实例
+llm_telemetry = LLMTelemetry()
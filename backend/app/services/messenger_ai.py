@@ -2,35 +2,76 @@ import os
 import json
 import base64
 import asyncio
-from typing import Dict, Any, List, Optional
-from openai import AsyncOpenAI
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
 from app.models.messenger import EmotionReport, AIReply
 from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority
+from app.services.json_stream import IncrementalJSONExtractor, parse_json_text, validate_field, validate_fields
+
+# 解析结果缺失或无效字段时使用的默认值
+EMOTION_REPORT_DEFAULTS = {
+    'stress_index': 50,
+    'main_emotions': ['未知'],
+    'possible_causes': ['需要更多信息'],
+    'explanation': '基于文本内容的初步分析',
+    'risk_level': 'green',
+    'risk_keywords': []
+}
+
+AI_REPLY_DEFAULTS = {
+    'empathy_text': '我理解你现在的感受。',
+    'cognitive_guidance': '让我们换个角度来看待这个问题。',
+    'practical_tips': ['深呼吸练习', '适当休息'],
+    'follow_up_tasks': ['今天给自己10分钟放松时间'],
+    'resource_links': []
+}
+
+# 流式发送给客户端的回复正文：这两个字段的字符串值，按顺序以空行分隔（与 generate_video_reply 的排版一致）
+REPLY_TEXT_FIELDS = ('empathy_text', 'cognitive_guidance')
+
+
+class _ReplyTextStream:
+    """
+    把模型输出的回复 JSON 转成纯文本片段：只取 REPLY_TEXT_FIELDS 中字符串值解码后的内容，
+    不把键名、引号、括号等 JSON 语法发给客户端
+    """
+
+    def __init__(self, prefix: str = ''):
+        self._paths = [prefix + field for field in REPLY_TEXT_FIELDS]
+        self._texts: Dict[str, str] = {}
+        self._sent: Dict[str, str] = {}
+
+    def update(self, extractor: IncrementalJSONExtractor, completed: List[Tuple[str, Any]], ready: bool = True) -> str:
+        """
+        读取本次 feed 之后的解析状态，返回新增的正文；ready=False 时只记录进度不输出，
+        之后 ready 时一并补发
+        """
+        for path, value in completed:
+            if path in self._paths and isinstance(value, str):
+                self._texts[path] = value
+        partial = extractor.partial_string()
+        if partial is not None and partial[0] in self._paths:
+            self._texts[partial[0]] = partial[1]
+        if not ready:
+            return ''
+
+        pieces = []
+        for path, text in self._texts.items():
+            sent = self._sent.get(path, '')
+            if len(text) <= len(sent) or not text.startswith(sent):
+                continue
+            if path not in self._sent and self._sent:
+                pieces.append('\n\n')
+            pieces.append(text[len(sent):])
+            self._sent[path] = text
+        return ''.join(pieces)
+
 
 class MessengerAIService:
     def __init__(self):
-        # 延迟初始化客户端，避免启动时错误
-        self.client = None
         self.model_name = "qwen3-omni-flash"  # 使用指定的模型
         
-    def _get_client(self):
-        """延迟初始化 OpenAI 客户端"""
-        if self.client is None:
-            try:
-                # 尝试使用最小参数集合初始化
-                self.client = AsyncOpenAI(
-                    api_key=os.getenv("OPENAI_API_KEY", "sk-ac5ae6e934f54368b1a0339a79ec24cf"),
-                    base_url=os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
-                )
-            except Exception as e:
-                # 如果还是失败，使用默认设置
-                print(f"OpenAI 客户端初始化失败: {e}")
-                print("使用默认API设置...")
-                self.client = AsyncOpenAI(
-                    api_key=os.getenv("OPENAI_API_KEY", "sk-ac5ae6e934f54368b1a0339a79ec24cf")
-                )
-        return self.client
-        
     async def analyze_emotion(self, text_content: str, audio_features: Optional[Dict] = None, 
                             image_analysis: Optional[Dict] = None) -> EmotionReport:
         """多模态情绪分析"""
@@ -52,7 +93,9 @@ class MessengerAIService:
                 })
             
             # 如果 modalities 参数不支持，可以先注释掉进行测试
-            response = await self._get_client().chat.completions.create(
+            # 流式请求并拼接完整文本，相同的并发请求经网关合并为一次上游调用
+            analysis_text = await llm_gateway.complete_text(
+                priority=Priority.CRITICAL,  # 危机评估依赖情绪分析结果，最先出队
                 model=self.model_name,
                 messages=messages,
                 # modalities=["text", "audio"] if audio_features else ["text"],
@@ -63,12 +106,6 @@ class MessengerAIService:
                 # stream_options={"include_usage": True}
             )
             
-            # 解析流式响应
-            analysis_text = ""
-            async for chunk in response:
-                if chunk.choices[0].delta.content:
-                    analysis_text += chunk.choices[0].delta.content
-            
             return self._parse_emotion_analysis(analysis_text, text_content)
             
         except Exception as e:
@@ -78,8 +115,23 @@ class MessengerAIService:
     def _build_emotion_analysis_prompt(self, text: str, audio_features: Optional[Dict], 
                                      image_analysis: Optional[Dict]) -> str:
         """构建情绪分析提示"""
-        prompt = f"""请分析以下考研学生的情绪状态：
+        prompt = "请分析以下考研学生的情绪状态：\n" + self._build_user_context(text, audio_features, image_analysis)
+        prompt += """
+请从以下维度分析：
+1. 压力指数（0-100分）
+2. 主要情绪（如：焦虑、疲惫、兴奋、沮丧等）
+3. 可能原因分析
+4. 风险评估（绿色=正常，黄色=需关注，红色=高风险）
+5. 简短解释
+
+请以JSON格式回复，包含：stress_index, main_emotions, possible_causes, risk_level, explanation, risk_keywords
+"""
+        return prompt
 
+    def _build_user_context(self, text: str, audio_features: Optional[Dict],
+                            image_analysis: Optional[Dict]) -> str:
+        """构建用户输入描述（文本、语音特征、图像分析）"""
+        prompt = f"""
 文本内容：{text}
 """
         
@@ -96,41 +148,24 @@ class MessengerAIService:
 图像分析：{image_analysis.get('description', '无特殊内容')}
 """
         
-        prompt += """
-请从以下维度分析：
-1. 压力指数（0-100分）
-2. 主要情绪（如：焦虑、疲惫、兴奋、沮丧等）
-3. 可能原因分析
-4. 风险评估（绿色=正常，黄色=需关注，红色=高风险）
-5. 简短解释
-
-请以JSON格式回复，包含：stress_index, main_emotions, possible_causes, risk_level, explanation, risk_keywords
-"""
         return prompt
     
     def _parse_emotion_analysis(self, analysis_text: str, original_text: str) -> EmotionReport:
         """解析AI情绪分析结果"""
         try:
-            # 尝试提取JSON部分
-            start = analysis_text.find('{')
-            end = analysis_text.rfind('}') + 1
-            if start >= 0 and end > start:
-                json_str = analysis_text[start:end]
-                analysis_data = json.loads(json_str)
-            else:
+            analysis_data = parse_json_text(analysis_text)
+            if not analysis_data:
                 # 如果无法解析JSON，使用默认分析
                 analysis_data = self._analyze_text_keywords(original_text)
             
-            return EmotionReport(
-                stress_index=analysis_data.get('stress_index', 50),
-                main_emotions=analysis_data.get('main_emotions', ['未知']),
-                possible_causes=analysis_data.get('possible_causes', ['需要更多信息']),
-                explanation=analysis_data.get('explanation', '基于文本内容的初步分析'),
-                risk_keywords=analysis_data.get('risk_keywords', [])
-            )
+            return self._emotion_report_from_data(analysis_data)
         except Exception as e:
             print(f"解析情绪分析失败: {e}")
             return self._get_default_emotion_report()
+
+    def _emotion_report_from_data(self, analysis_data: Dict[str, Any]) -> EmotionReport:
+        """由解析出的字典构建情绪报告，缺失字段使用默认值"""
+        return validate_fields(EmotionReport, analysis_data, EMOTION_REPORT_DEFAULTS)
     
     def _analyze_text_keywords(self, text: str) -> Dict[str, Any]:
         """基于关键词的简单情绪分析"""
@@ -168,10 +203,187 @@ class MessengerAIService:
             'risk_keywords': found_risk_keywords
         }
     
-    async def generate_ai_reply(self, emotion_report: EmotionReport, user_message: str) -> AIReply:
-        """生成AI回复"""
+    async def analyze_and_reply(self, text_content: str, audio_features: Optional[Dict] = None,
+                                image_analysis: Optional[Dict] = None,
+                                combined: Optional[bool] = None) -> Tuple[EmotionReport, AIReply]:
+        """
+        情绪分析并生成AI回复
+
+        参数:
+            combined: 是否使用合并模式（一次调用同时生成情绪报告与回复），None 时使用配置 MESSENGER_COMBINED_MODE
+
+        合并模式下情绪报告解析失败时退回两次调用；只有回复部分缺失时单独补一次回复生成
+        """
+        if combined is None:
+            combined = settings.MESSENGER_COMBINED_MODE
+
+        if combined:
+            try:
+                result_text = await llm_gateway.complete_text(
+                    priority=Priority.CRITICAL,  # 结果中包含危机评估所需的情绪分析
+                    model=self.model_name,
+                    messages=self._build_combined_messages(text_content, audio_features, image_analysis),
+                    temperature=0.7,
+                    max_tokens=2000,
+                    stream=True
+                )
+                parsed = self._parse_combined_result(result_text)
+                if parsed is not None:
+                    emotion_report, ai_reply = parsed
+                    if ai_reply is None:
+                        ai_reply = await self.generate_ai_reply(emotion_report, text_content)
+                    return emotion_report, ai_reply
+                print("合并模式结果解析失败，退回分步调用")
+            except Exception as e:
+                print(f"合并模式调用失败，退回分步调用: {e}")
+
+        emotion_report = await self.analyze_emotion(text_content, audio_features, image_analysis)
+        ai_reply = await self.generate_ai_reply(emotion_report, text_content)
+        return emotion_report, ai_reply
+
+    def _build_combined_messages(self, text: str, audio_features: Optional[Dict],
+                                 image_analysis: Optional[Dict]) -> List[Dict[str, Any]]:
+        """构建合并模式的对话消息：一次生成情绪报告与回复"""
+        prompt = "请分析以下考研学生的情绪状态，并直接给出回复：\n" + self._build_user_context(text, audio_features, image_analysis)
+        prompt += """
+第一步，从以下维度分析情绪：
+1. 压力指数（0-100分）
+2. 主要情绪（如：焦虑、疲惫、兴奋、沮丧等）
+3. 可能原因分析
+4. 风险评估（green=正常，yellow=需关注，red=高风险）
+5. 简短解释
+
+第二步，基于分析结果，作为一位温暖、专业的心理健康助手给出回复：
+1. 共情表达（理解和认同用户感受）
+2. 认知行为引导（帮助重新看待问题）
+3. 实用建议（2-3个具体的减压或学习技巧）
+4. 跟进任务（简单易行的小任务）
+
+请只输出一个JSON对象，先输出 emotion_report 再输出 ai_reply：
+{"emotion_report": {"stress_index": 0, "main_emotions": [], "possible_causes": [], "risk_level": "green", "explanation": "", "risk_keywords": []},
+ "ai_reply": {"empathy_text": "", "cognitive_guidance": "", "practical_tips": [], "follow_up_tasks": [], "resource_links": []}}
+"""
+        messages = [
+            {"role": "system", "content": "你是一位专业、温暖的心理健康AI助手，专门帮助考研学生进行情绪分析，并提供情感支持和学习指导。"},
+            {"role": "user", "content": [{"type": "text", "text": prompt}]}
+        ]
+        if image_analysis and image_analysis.get("image_url"):
+            messages[1]["content"].append({
+                "type": "image_url",
+                "image_url": {"url": image_analysis["image_url"]}
+            })
+        return messages
+
+    def _parse_combined_result(self, result_text: str) -> Optional[Tuple[EmotionReport, Optional[AIReply]]]:
+        """解析合并模式结果，情绪报告无法解析时返回 None"""
+        data = parse_json_text(result_text)
+        emotion_report = self._combined_emotion_report(data.get('emotion_report'))
+        if emotion_report is None:
+            return None
+        return emotion_report, self._combined_ai_reply(data.get('ai_reply'))
+
+    def _combined_emotion_report(self, report_data: Any) -> Optional[EmotionReport]:
+        """合并模式中的情绪报告部分，无法使用时返回 None"""
+        if not isinstance(report_data, dict):
+            return None
         try:
-            reply_prompt = f"""用户消息：{user_message}
+            return self._emotion_report_from_data(report_data)
+        except Exception as e:
+            print(f"解析合并模式情绪报告失败: {e}")
+            return None
+
+    def _combined_ai_reply(self, reply_data: Any) -> Optional[AIReply]:
+        """合并模式中的回复部分，缺失或没有共情内容时返回 None"""
+        if not isinstance(reply_data, dict) or not reply_data.get('empathy_text'):
+            return None
+        try:
+            return self._ai_reply_from_data(reply_data)
+        except Exception as e:
+            print(f"解析合并模式回复失败: {e}")
+            return None
+
+    async def stream_analyze_and_reply(self, text_content: str, audio_features: Optional[Dict] = None,
+                                       image_analysis: Optional[Dict] = None,
+                                       combined: Optional[bool] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式完成情绪分析与回复生成
+
+        依次产出:
+            {"type": "emotion_report", "report": EmotionReport}  情绪报告解析完成后立即产出
+            {"type": "delta", "content": str}  回复正文（共情表达、认知引导）的纯文本片段，随生成进度产出
+            {"type": "reply_field", "key": str, "value": Any}  回复的单个字段生成并校验完成后立即产出
+            {"type": "reset"}  之前产出的 delta / reply_field 作废（合并调用中途失败、退回单独生成回复时）
+            {"type": "reply", "reply": AIReply}  完整回复
+
+        合并模式下 emotion_report 字段一生成完就产出，不等待回复部分；ai_reply 按内层字段逐个产出，不等整个回复生成完；
+        情绪报告无法解析时退回两次调用，只缺回复部分时单独流式生成回复
+        """
+        if combined is None:
+            combined = settings.MESSENGER_COMBINED_MODE
+
+        emotion_report: Optional[EmotionReport] = None
+        ai_reply: Optional[AIReply] = None
+        # 是否已经发出过回复正文或字段；退回单独生成回复前需要让客户端丢弃这部分内容
+        streamed = False
+        if combined:
+            extractor = IncrementalJSONExtractor(nested=['ai_reply'])
+            reply_text = _ReplyTextStream(prefix='ai_reply.')
+            try:
+                async for delta in llm_gateway.stream_text(
+                    priority=Priority.CRITICAL,
+                    model=self.model_name,
+                    messages=self._build_combined_messages(text_content, audio_features, image_analysis),
+                    temperature=0.7,
+                    max_tokens=2000
+                ):
+                    completed = extractor.feed(delta)
+                    for key, value in completed:
+                        if key == 'emotion_report' and emotion_report is None:
+                            emotion_report = self._combined_emotion_report(value)
+                            if emotion_report is not None:
+                                yield {"type": "emotion_report", "report": emotion_report}
+                        elif key.startswith('ai_reply.') and emotion_report is not None:
+                            event = self._reply_field_event(key[len('ai_reply.'):], value)
+                            if event is not None:
+                                streamed = True
+                                yield event
+                    # 情绪报告解析出来之前不发正文：报告解析失败会退回分步调用，重新生成回复
+                    text = reply_text.update(extractor, completed, ready=emotion_report is not None)
+                    if text:
+                        streamed = True
+                        yield {"type": "delta", "content": text}
+                data = extractor.finish()
+                if emotion_report is None:
+                    emotion_report = self._combined_emotion_report(data.get('emotion_report'))
+                    if emotion_report is not None:
+                        yield {"type": "emotion_report", "report": emotion_report}
+                if emotion_report is not None:
+                    ai_reply = self._combined_ai_reply(data.get('ai_reply'))
+            except Exception as e:
+                print(f"合并模式流式调用失败，退回分步调用: {e}")
+
+        if emotion_report is None:
+            emotion_report = await self.analyze_emotion(text_content, audio_features, image_analysis)
+            yield {"type": "emotion_report", "report": emotion_report}
+
+        if ai_reply is not None:
+            yield {"type": "reply", "reply": ai_reply}
+            return
+        if streamed:
+            yield {"type": "reset"}
+        async for event in self.stream_ai_reply(emotion_report, text_content):
+            yield event
+
+    def _reply_field_event(self, key: str, value: Any) -> Optional[Dict[str, Any]]:
+        """回复的单个字段按 AIReply 校验通过时构造 reply_field 事件"""
+        valid, value = validate_field(AIReply, key, value)
+        if not valid:
+            return None
+        return {"type": "reply_field", "key": key, "value": value}
+
+    def _build_reply_messages(self, emotion_report: EmotionReport, user_message: str) -> List[Dict[str, Any]]:
+        """构建AI回复的对话消息"""
+        reply_prompt = f"""用户消息：{user_message}
 
 情绪分析结果：
 - 压力指数：{emotion_report.stress_index}
@@ -186,53 +398,95 @@ class MessengerAIService:
 
 请以JSON格式回复，包含：empathy_text, cognitive_guidance, practical_tips, follow_up_tasks, resource_links
 """
-            
-            response = await self._get_client().chat.completions.create(
+        return [
+            {"role": "system", "content": "你是一位专业、温暖的心理健康AI助手，专门为考研学生提供情感支持和学习指导。"},
+            {"role": "user", "content": reply_prompt}
+        ]
+
+    async def generate_ai_reply(self, emotion_report: EmotionReport, user_message: str) -> AIReply:
+        """生成AI回复"""
+        try:
+            reply_text = await llm_gateway.complete_text(
+                priority=Priority.HIGH,
                 model=self.model_name,
-                messages=[
-                    {"role": "system", "content": "你是一位专业、温暖的心理健康AI助手，专门为考研学生提供情感支持和学习指导。"},
-                    {"role": "user", "content": reply_prompt}
-                ],
+                messages=self._build_reply_messages(emotion_report, user_message),
                 # modalities=["text"],
                 temperature=0.8,
                 max_tokens=1500,
                 stream=True
                 # stream_options={"include_usage": True}
             )
-            
-            # 解析流式响应
-            reply_text = ""
-            async for chunk in response:
-                if chunk.choices[0].delta.content:
-                    reply_text += chunk.choices[0].delta.content
             return self._parse_ai_reply(reply_text, emotion_report)
             
         except Exception as e:
             print(f"生成AI回复失败: {e}")
             return self._get_default_ai_reply(emotion_report)
+
+    async def stream_ai_reply(self, emotion_report: EmotionReport,
+                              user_message: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        流式生成AI回复
+
+        依次产出:
+            {"type": "delta", "content": str}  回复正文（共情表达、认知引导）的纯文本片段
+            {"type": "reply_field", "key": str, "value": Any}  回复的单个字段生成并校验完成后立即产出
+            {"type": "reset"}  生成中途失败时产出，之前的 delta / reply_field 作废
+            {"type": "reply", "reply": AIReply}  由解析出的字段构建的完整回复（失败时为默认回复）
+        """
+        extractor = IncrementalJSONExtractor()
+        reply_text = _ReplyTextStream()
+        streamed = False
+        try:
+            async for delta in llm_gateway.stream_text(
+                priority=Priority.HIGH,
+                model=self.model_name,
+                messages=self._build_reply_messages(emotion_report, user_message),
+                temperature=0.8,
+                max_tokens=1500
+            ):
+                completed = extractor.feed(delta)
+                for key, value in completed:
+                    event = self._reply_field_event(key, value)
+                    if event is not None:
+                        streamed = True
+                        yield event
+                text = reply_text.update(extractor, completed)
+                if text:
+                    streamed = True
+                    yield {"type": "delta", "content": text}
+        except Exception as e:
+            print(f"流式生成AI回复失败: {e}")
+            if streamed:
+                yield {"type": "reset"}
+            # 默认回复同样以正文和字段事件发出，客户端拼接的正文始终与最终回复一致
+            default_reply = self._get_default_ai_reply(emotion_report)
+            yield {"type": "delta", "content": "\n\n".join(getattr(default_reply, field) for field in REPLY_TEXT_FIELDS)}
+            for key, value in default_reply.dict().items():
+                yield {"type": "reply_field", "key": key, "value": value}
+            yield {"type": "reply", "reply": default_reply}
+            return
+
+        yield {"type": "reply", "reply": self._ai_reply_from_parsed(extractor.finish(), emotion_report)}
     
     def _parse_ai_reply(self, reply_text: str, emotion_report: EmotionReport) -> AIReply:
         """解析AI回复"""
+        return self._ai_reply_from_parsed(parse_json_text(reply_text), emotion_report)
+
+    def _ai_reply_from_parsed(self, reply_data: Dict[str, Any], emotion_report: EmotionReport) -> AIReply:
+        """由解析出的回复字段构建AI回复，没有解析出任何字段时使用按压力生成的默认回复"""
         try:
-            start = reply_text.find('{')
-            end = reply_text.rfind('}') + 1
-            if start >= 0 and end > start:
-                json_str = reply_text[start:end]
-                reply_data = json.loads(json_str)
-            else:
+            if not reply_data:
                 # 如果无法解析JSON，使用默认回复
                 reply_data = self._generate_default_reply_data(emotion_report)
             
-            return AIReply(
-                empathy_text=reply_data.get('empathy_text', '我理解你现在的感受。'),
-                cognitive_guidance=reply_data.get('cognitive_guidance', '让我们换个角度来看待这个问题。'),
-                practical_tips=reply_data.get('practical_tips', ['深呼吸练习', '适当休息']),
-                follow_up_tasks=reply_data.get('follow_up_tasks', ['今天给自己10分钟放松时间']),
-                resource_links=reply_data.get('resource_links', [])
-            )
+            return self._ai_reply_from_data(reply_data)
         except Exception as e:
             print(f"解析AI回复失败: {e}")
             return self._get_default_ai_reply(emotion_report)
+
+    def _ai_reply_from_data(self, reply_data: Dict[str, Any]) -> AIReply:
+        """由解析出的字典构建AI回复，缺失字段使用默认值"""
+        return validate_fields(AIReply, reply_data, AI_REPLY_DEFAULTS)
     
     def _generate_default_reply_data(self, emotion_report: EmotionReport) -> Dict[str, Any]:
         """生成默认回复数据"""
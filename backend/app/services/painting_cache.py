@@ -0,0 +1,183 @@
+"""
+画作分析感知哈希缓存
+学生经常重复提交相同或几乎相同的画作，这里按 dHash 查找已分析过的近似画作并复用结果
+（同时负责计算本地图像特征，作为 local_analysis 传给视觉模型）：
+- 缓存键由用户、绘画模式、主题和分析提示词版本组成，任一变化都不会命中旧结果。
+  复用只在同一用户内进行：分析文本是对某个学生画作的心理解读，不能出现在其他用户的结果里，
+  而且跨用户的“近似”多半只是构图简单，并非同一幅画；没有用户 ID 的调用不查也不写缓存
+- 空白或几乎空白的画布（dHash 为 0，或墨迹覆盖率低于 PAINTING_ANALYSIS_CACHE_MIN_INK）彼此哈希都相近，
+  不查也不写缓存，否则所有空白画作都会拿到同一份分析
+- 64 位 dHash 拆成 4 段分别建索引，按任一段相等做索引查找，再过滤汉明距离，
+  数据量增长到几十万条时每次查找仍只扫描少量候选
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Dict, Optional
+
+from sqlalchemy import and_, or_, select, update
+
+from app.core.config import settings
+from app.db.sqlite_database import AsyncSessionLocal
+from app.models.sqlite_models import PaintingAnalysisCacheORM
+from app.services.ai import PAINTING_ANALYSIS_PROMPT_VERSION, analyze_painting_with_qwen_vl
+from app.services.image_preprocess import image_preprocessor
+from app.services.painting_features import compute_painting_features, save_painting_features
+
+BANDS = 4
+BAND_BITS = 16
+# 分段索引只能保证找回距离不超过 BANDS - 1 的哈希
+MAX_INDEXED_DISTANCE = BANDS - 1
+
+
+def analysis_cache_key(user_id: str, painting_mode: str, theme: Optional[str]) -> str:
+    raw = f"{user_id}|{painting_mode}|{(theme or '').strip()}|{PAINTING_ANALYSIS_PROMPT_VERSION}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def split_bands(value: int) -> list:
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (BAND_BITS * i)) & mask for i in range(BANDS)]
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class PaintingAnalysisCache:
+    """按感知哈希复用画作分析结果"""
+
+    def __init__(self, enabled: bool, max_distance: int, min_ink_coverage: float):
+        self.enabled = enabled
+        self.min_ink_coverage = min_ink_coverage
+        if max_distance > MAX_INDEXED_DISTANCE:
+            print(f"画作分析缓存距离阈值 {max_distance} 超过分段索引可保证的 {MAX_INDEXED_DISTANCE}，已按 {MAX_INDEXED_DISTANCE} 处理")
+        self.max_distance = max(0, min(max_distance, MAX_INDEXED_DISTANCE))
+        self._hits = 0
+        self._misses = 0
+        self._stored = 0
+        self._unhashable = 0
+        self._skipped = 0
+
+    async def lookup(self, cache_key: str, image_hash: int) -> Optional[Dict[str, Any]]:
+        """返回距离最近且不超过阈值的缓存结果（附带 cache_distance），没有时返回 None"""
+        bands = split_bands(image_hash)
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(
+                select(
+                    PaintingAnalysisCacheORM.id,
+                    PaintingAnalysisCacheORM.dhash,
+                    PaintingAnalysisCacheORM.analysis
+                ).where(
+                    # 每个分支都带上 cache_key，SQLite 才会对 4 个 (cache_key, bandN) 索引分别查找后合并
+                    or_(*[
+                        and_(
+                            PaintingAnalysisCacheORM.cache_key == cache_key,
+                            getattr(PaintingAnalysisCacheORM, f"band{i}") == band
+                        )
+                        for i, band in enumerate(bands)
+                    ])
+                )
+            )
+            best = None
+            for row in result.all():
+                distance = hamming_distance(image_hash, int(row.dhash, 16))
+                if distance <= self.max_distance and (best is None or distance < best[0]):
+                    best = (distance, row)
+            if best is None:
+                return None
+
+            distance, row = best
+            await session.execute(
+                update(PaintingAnalysisCacheORM)
+                .where(PaintingAnalysisCacheORM.id == row.id)
+                .values(hit_count=PaintingAnalysisCacheORM.hit_count + 1)
+            )
+            await session.commit()
+        return {**row.analysis, "cache_distance": distance}
+
+    async def store(self, cache_key: str, image_hash: int, analysis: Dict[str, Any], painting_id: Optional[str] = None):
+        bands = split_bands(image_hash)
+        async with AsyncSessionLocal() as session:
+            session.add(PaintingAnalysisCacheORM(
+                cache_key=cache_key,
+                dhash=f"{image_hash:016x}",
+                band0=bands[0],
+                band1=bands[1],
+                band2=bands[2],
+                band3=bands[3],
+                painting_id=painting_id,
+                analysis=analysis,
+                hit_count=0
+            ))
+            await session.commit()
+        self._stored += 1
+
+    async def analyze(
+        self,
+        image_data_url: str,
+        painting_mode: str,
+        theme: Optional[str] = None,
+        painting_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        model_image_data_url: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        分析画作：本地计算图像特征（指定画作时落库），先查近似画作的缓存结果，
+        未命中时带着本地特征调用视觉模型并缓存真实分析结果
+
+        特征和感知哈希始终按原图 image_data_url 计算；调用方已压缩过图片时通过 model_image_data_url
+        传入压缩后的副本，只用于发给视觉模型
+        没有用户 ID 或画布几乎空白时不使用缓存；命中时返回的结果带 cache_hit=True 和 cache_distance
+        """
+        model_image_data_url = model_image_data_url or image_data_url
+        hash_task = image_preprocessor.dhash(image_data_url) if self.enabled else asyncio.sleep(0)
+        image_hash, features = await asyncio.gather(hash_task, compute_painting_features(image_data_url))
+        if features and painting_id and user_id:
+            await save_painting_features(painting_id, user_id, features)
+
+        if image_hash is None:
+            if self.enabled:
+                self._unhashable += 1
+            return await analyze_painting_with_qwen_vl(model_image_data_url, painting_mode, theme, local_analysis=features)
+        if not user_id or image_hash == 0 or (features and features["ink_coverage"] < self.min_ink_coverage):
+            self._skipped += 1
+            return await analyze_painting_with_qwen_vl(model_image_data_url, painting_mode, theme, local_analysis=features)
+
+        cache_key = analysis_cache_key(user_id, painting_mode, theme)
+        cached = await self.lookup(cache_key, image_hash)
+        if cached is not None:
+            self._hits += 1
+            print(f"[PAINTING CACHE] 命中近似画作分析结果，汉明距离 {cached['cache_distance']}")
+            # 缓存的分析文本和色彩/构图数值都来自来源画作，local_features 也保留来源画作的测量值，
+            # 三者保持一致；本次画作自己的特征已在上面写入 painting_features
+            return {**cached, "cache_hit": True}
+
+        self._misses += 1
+        analysis_result = await analyze_painting_with_qwen_vl(model_image_data_url, painting_mode, theme, local_analysis=features)
+        # 只缓存真实的模型分析结果，降级结果不缓存
+        if analysis_result.get("is_real_analysis"):
+            await self.store(cache_key, image_hash, analysis_result, painting_id)
+        return analysis_result
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits + self._misses
+        return {
+            "enabled": self.enabled,
+            "max_distance": self.max_distance,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "stored": self._stored,
+            "unhashable": self._unhashable,
+            "skipped": self._skipped,
+            "min_ink_coverage": self.min_ink_coverage,
+        }
+
+
+# 全局画作分析缓存实例
+painting_analysis_cache = PaintingAnalysisCache(
+    enabled=settings.PAINTING_ANALYSIS_CACHE_ENABLED,
+    max_distance=settings.PAINTING_ANALYSIS_CACHE_MAX_DISTANCE,
+    min_ink_coverage=settings.PAINTING_ANALYSIS_CACHE_MIN_INK
+)
@@ -0,0 +1,182 @@
+"""
+画作本地特征提取
+用 NumPy 向量化计算画作的客观指标（冷暖色比例、平均 HSV、边缘密度、墨迹覆盖率、重心位置、色彩多样性），
+毫秒级完成；结果作为事实写进视觉模型提示词，模型不必再从像素估计这些数值，
+同时存入 painting_features 表，便于按数值查询和统计
+"""
+
+import io
+from typing import Any, Dict, Optional
+
+from app.db.compat import dialect_insert
+from app.db.sqlite_database import AsyncSessionLocal
+from app.models.sqlite_models import PaintingFeaturesORM
+from app.services.image_preprocess import PIL_AVAILABLE, image_preprocessor
+from app.services.image_store import parse_data_url
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+if PIL_AVAILABLE:
+    from PIL import Image
+
+# 计算前把图片缩到最长边不超过该值，指标是比例和均值，缩放对结果影响很小
+ANALYSIS_MAX_SIDE = 256
+# 接近白色且几乎不透明的像素视为画布背景
+BACKGROUND_VALUE = 0.94
+BACKGROUND_SATURATION = 0.08
+# 饱和度低于该值的墨迹视为黑白灰，不参与冷暖统计
+CHROMATIC_SATURATION = 0.15
+EDGE_THRESHOLD = 0.12
+HUE_BINS = 12
+HUE_BIN_MIN_SHARE = 0.02
+
+
+def _rgb_to_hsv(rgb: "np.ndarray"):
+    """rgb 为 0~1 的 (..., 3) 数组，返回 h(0~360), s, v"""
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    maxc = rgb.max(axis=-1)
+    minc = rgb.min(axis=-1)
+    delta = maxc - minc
+    safe = np.where(delta == 0, 1.0, delta)
+    hue = np.where(
+        maxc == r, ((g - b) / safe) % 6,
+        np.where(maxc == g, (b - r) / safe + 2, (r - g) / safe + 4)
+    ) * 60.0
+    hue = np.where(delta == 0, 0.0, hue)
+    saturation = np.where(maxc == 0, 0.0, delta / np.where(maxc == 0, 1.0, maxc))
+    return hue, saturation, maxc
+
+
+def _center_label(x: float, y: float) -> str:
+    horizontal = "偏左" if x < 0.4 else ("偏右" if x > 0.6 else "")
+    vertical = "偏上" if y < 0.4 else ("偏下" if y > 0.6 else "")
+    return (vertical + horizontal) or "居中"
+
+
+def extract_features(data: bytes) -> Dict[str, Any]:
+    """从图片字节计算特征（同步执行，在线程池中调用）"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        width, height = image.size
+        image = image.convert("RGBA")
+        image.thumbnail((ANALYSIS_MAX_SIDE, ANALYSIS_MAX_SIDE))
+        pixels = np.asarray(image, dtype=np.float32) / 255.0
+
+    alpha = pixels[..., 3]
+    # 透明部分按白色画布处理
+    rgb = pixels[..., :3] * alpha[..., None] + (1.0 - alpha[..., None])
+    hue, saturation, value = _rgb_to_hsv(rgb)
+
+    ink = (alpha > 0.1) & ~((value >= BACKGROUND_VALUE) & (saturation <= BACKGROUND_SATURATION))
+    ink_pixels = int(ink.sum())
+    total_pixels = ink.size
+
+    features: Dict[str, Any] = {
+        "width": width,
+        "height": height,
+        "ink_coverage": ink_pixels / total_pixels,
+        "warm_ratio": 0.0,
+        "cool_ratio": 0.0,
+        "achromatic_ratio": 0.0,
+        "mean_hue": 0.0,
+        "mean_saturation": 0.0,
+        "mean_value": 1.0,
+        "color_diversity": 0,
+        "center_x": 0.5,
+        "center_y": 0.5,
+    }
+
+    # 边缘密度：灰度梯度超过阈值的像素占比，反映线条的多少与碎片程度
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    grad_x = np.abs(np.diff(gray, axis=1))[:-1, :]
+    grad_y = np.abs(np.diff(gray, axis=0))[:, :-1]
+    edges = np.maximum(grad_x, grad_y) > EDGE_THRESHOLD
+    features["edge_density"] = float(edges.mean()) if edges.size else 0.0
+    # 笔触连贯度：边缘像素相对墨迹像素越少，线条越连贯、色块越完整
+    features["stroke_continuity"] = 1.0 - min(1.0, float(edges.sum()) / ink_pixels) if ink_pixels else 0.0
+
+    if ink_pixels:
+        ink_hue = hue[ink]
+        ink_saturation = saturation[ink]
+        features["mean_saturation"] = float(ink_saturation.mean())
+        features["mean_value"] = float(value[ink].mean())
+
+        chromatic = ink_saturation >= CHROMATIC_SATURATION
+        chromatic_pixels = int(chromatic.sum())
+        features["achromatic_ratio"] = 1.0 - chromatic_pixels / ink_pixels
+        if chromatic_pixels:
+            chromatic_hue = ink_hue[chromatic]
+            warm = (chromatic_hue < 75) | (chromatic_hue >= 330)
+            features["warm_ratio"] = float(warm.mean())
+            features["cool_ratio"] = 1.0 - features["warm_ratio"]
+            # 色相是角度，按单位向量求平均
+            radians = np.deg2rad(chromatic_hue)
+            features["mean_hue"] = float(np.rad2deg(np.arctan2(np.sin(radians).mean(), np.cos(radians).mean())) % 360)
+            histogram, _ = np.histogram(chromatic_hue, bins=HUE_BINS, range=(0, 360))
+            features["color_diversity"] = int((histogram / chromatic_pixels >= HUE_BIN_MIN_SHARE).sum())
+
+        rows, cols = np.nonzero(ink)
+        features["center_x"] = float(cols.mean() / max(1, ink.shape[1] - 1))
+        features["center_y"] = float(rows.mean() / max(1, ink.shape[0] - 1))
+
+    return {key: round(value, 4) if isinstance(value, float) else value for key, value in features.items()}
+
+
+def describe_features(features: Dict[str, Any]) -> str:
+    """把特征整理成提示词中的事实描述"""
+    diversity = features["color_diversity"]
+    diversity_label = "丰富" if diversity >= 6 else ("适中" if diversity >= 3 else "单调")
+    return "\n".join([
+        f"- 墨迹覆盖率（空间利用率）: {features['ink_coverage'] * 100:.0f}%",
+        f"- 暖色调比例: {features['warm_ratio'] * 100:.0f}%，冷色调比例: {features['cool_ratio'] * 100:.0f}%，"
+        f"黑白灰占墨迹的 {features['achromatic_ratio'] * 100:.0f}%",
+        f"- 墨迹平均色相 {features['mean_hue']:.0f}°，平均饱和度 {features['mean_saturation']:.2f}，平均明度 {features['mean_value']:.2f}",
+        f"- 色彩多样性: {diversity_label}（占比超过2%的色相区间 {diversity}/{HUE_BINS} 个）",
+        f"- 边缘密度: {features['edge_density']:.3f}，笔触连贯度: {features['stroke_continuity']:.2f}（0~1，越高越连贯）",
+        f"- 画面重心: x={features['center_x']:.2f}, y={features['center_y']:.2f}（{_center_label(features['center_x'], features['center_y'])}）",
+    ])
+
+
+def features_to_analysis_data(features: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """把可以直接由本地指标给出的展示字段转成分析结果中使用的格式"""
+    diversity = features["color_diversity"]
+    coverage = features["ink_coverage"]
+    return {
+        "color_analysis": {
+            "cool_color_ratio": f"{features['cool_ratio'] * 100:.0f}%",
+            "warm_color_ratio": f"{features['warm_ratio'] * 100:.0f}%",
+            "color_diversity": "丰富" if diversity >= 6 else ("适中" if diversity >= 3 else "单调"),
+        },
+        "composition_analysis": {
+            "密度": "密集" if coverage > 0.5 else ("适中" if coverage > 0.15 else "稀疏"),
+            "空间利用率": f"{coverage * 100:.0f}%",
+            "中心位置": _center_label(features["center_x"], features["center_y"]),
+        },
+    }
+
+
+async def compute_painting_features(image_data_url: Optional[str]) -> Optional[Dict[str, Any]]:
+    """在线程池中计算特征；缺少依赖或图片无法解码时返回 None"""
+    if not (PIL_AVAILABLE and NUMPY_AVAILABLE) or not image_data_url:
+        return None
+    try:
+        _, data = parse_data_url(image_data_url)
+        return await image_preprocessor.run(extract_features, data)
+    except Exception as e:
+        print(f"[PAINTING FEATURES] 本地特征计算失败: {type(e).__name__}: {e}")
+        return None
+
+
+async def save_painting_features(painting_id: str, user_id: str, features: Dict[str, Any]):
+    """写入或覆盖画作的特征记录"""
+    columns = {column.name for column in PaintingFeaturesORM.__table__.columns}
+    values = {key: value for key, value in features.items() if key in columns}
+    async with AsyncSessionLocal() as session:
+        statement = dialect_insert(session, PaintingFeaturesORM).values(painting_id=painting_id, user_id=user_id, **values)
+        statement = statement.on_conflict_do_update(index_elements=["painting_id"], set_=values)
+        await session.execute(statement)
+        await session.commit()
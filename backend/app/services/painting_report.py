@@ -0,0 +1,152 @@
+"""
+完整画作报告
+前端原先依次调用 /analyze、/generate-guidance-direct、/generate-story-direct、/generate-mind-mirror，
+每次都重新上传同一张图片，总耗时是各步之和。这里图片只接收和预处理一次（本地特征和感知哈希仍按原图计算，
+压缩后的副本只发给视觉模型），然后并发执行各分支：
+- analysis（画作分析）与 mind_mirror（心灵镜像）互不依赖，同时开始
+- healing_story 与 mindfulness_guidance 依赖分析结果，分析完成后立即并发开始
+每个分支有独立超时，完成一个就推送一个；全部结束后把结果合并写入画作的 ai_analysis，
+总耗时约为最慢的那条依赖链
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Dict, Optional
+
+from app.core.config import settings
+from app.db.sqlite_database import AsyncSessionLocal
+from app.models.sqlite_models import PaintingEntryORM
+from app.services.ai import generate_healing_story, generate_mind_mirror, generate_mindfulness_guidance
+from app.services.ai_jobs import RESULT_KEYS
+from app.services.image_preprocess import image_preprocessor
+from app.services.llm_gateway import llm_gateway
+from app.services.painting_cache import painting_analysis_cache
+
+SECTION_ANALYSIS = "analysis"
+SECTION_MIND_MIRROR = RESULT_KEYS["mind_mirror"]
+SECTION_STORY = RESULT_KEYS["story"]
+SECTION_GUIDANCE = RESULT_KEYS["guidance"]
+REPORT_SECTIONS = (SECTION_ANALYSIS, SECTION_MIND_MIRROR, SECTION_STORY, SECTION_GUIDANCE)
+
+DEFAULT_SECTION_TIMEOUT = 60.0
+# 画作分析依次调用两次视觉模型（多维度描述、结构化数据），分支预算不能少于两次调用的超时之和
+ANALYSIS_VISION_CALLS = 2
+ANALYSIS_VISION_MODEL = "qwen-vl-plus"
+# 本地特征计算、缓存查找和写库的余量
+ANALYSIS_OVERHEAD_SECONDS = 10.0
+
+
+def section_timeout(section: str) -> float:
+    timeout = settings.PAINTING_REPORT_TIMEOUTS.get(section, DEFAULT_SECTION_TIMEOUT)
+    if section == SECTION_ANALYSIS:
+        vision_timeout = llm_gateway.timeout_for(ANALYSIS_VISION_MODEL)
+        timeout = max(timeout, ANALYSIS_VISION_CALLS * vision_timeout + ANALYSIS_OVERHEAD_SECONDS)
+    return timeout
+
+
+async def _timed(section: str, awaitable: Awaitable[Any]) -> Any:
+    return await asyncio.wait_for(awaitable, timeout=section_timeout(section))
+
+
+async def build_full_report(
+    painting_id: str,
+    user_id: str,
+    image_data_url: str,
+    painting_mode: str,
+    theme: Optional[str],
+    painting_time_seconds: int,
+    submitted_at: datetime
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    并发生成画作报告，按完成顺序产出事件：
+
+    - {"type": "section", "section": 名称, "data": 结果, "elapsed_ms": 毫秒}
+    - {"type": "section", "section": 名称, "error": "timeout" / 异常信息 / "analysis_unavailable"}
+    - 最后 {"type": "report", "painting_id": ..., "sections": {...}, "elapsed_ms": 毫秒}
+
+    画作记录需已由调用方创建；生成器被中途关闭（客户端断开）时取消未完成的分支，不写库
+    """
+    started = time.perf_counter()
+    model_image_data_url = await image_preprocessor.prepare(image_data_url)
+
+    tasks: Dict[asyncio.Task, str] = {}
+
+    def spawn(section: str, awaitable: Awaitable[Any]):
+        tasks[asyncio.create_task(_timed(section, awaitable))] = section
+
+    spawn(SECTION_ANALYSIS, painting_analysis_cache.analyze(
+        image_data_url,
+        painting_mode,
+        theme,
+        painting_id=painting_id,
+        user_id=user_id,
+        model_image_data_url=model_image_data_url
+    ))
+    spawn(SECTION_MIND_MIRROR, generate_mind_mirror(model_image_data_url))
+
+    results: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    try:
+        while tasks:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                section = tasks.pop(task)
+                elapsed_ms = round((time.perf_counter() - started) * 1000)
+                try:
+                    results[section] = task.result()
+                except asyncio.TimeoutError:
+                    errors[section] = "timeout"
+                except Exception as e:
+                    errors[section] = f"{type(e).__name__}: {e}"
+
+                if section in errors:
+                    print(f"[PAINTING REPORT] 分支 {section} 失败: {errors[section]}")
+                    yield {"type": "section", "section": section, "error": errors[section], "elapsed_ms": elapsed_ms}
+                else:
+                    yield {"type": "section", "section": section, "data": results[section], "elapsed_ms": elapsed_ms}
+
+                if section != SECTION_ANALYSIS:
+                    continue
+                analysis_result = results.get(SECTION_ANALYSIS)
+                if analysis_result is None:
+                    for dependent in (SECTION_STORY, SECTION_GUIDANCE):
+                        errors[dependent] = "analysis_unavailable"
+                        yield {"type": "section", "section": dependent, "error": errors[dependent], "elapsed_ms": elapsed_ms}
+                    continue
+                analysis_result.setdefault("is_real_analysis", False)
+                analysis_result.setdefault("error_type", None)
+                spawn(SECTION_STORY, generate_healing_story(analysis_result, model_image_data_url))
+                spawn(SECTION_GUIDANCE, generate_mindfulness_guidance(analysis_result))
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    await _save_report(painting_id, results, painting_time_seconds, submitted_at)
+    print(f"[PAINTING REPORT] 画作 {painting_id} 报告完成，耗时 {(time.perf_counter() - started) * 1000:.0f}ms，失败分支: {sorted(errors) or '无'}")
+    yield {
+        "type": "report",
+        "painting_id": painting_id,
+        "sections": {section: section in results for section in REPORT_SECTIONS},
+        "elapsed_ms": round((time.perf_counter() - started) * 1000)
+    }
+
+
+async def _save_report(painting_id: str, results: Dict[str, Any], painting_time_seconds: int, submitted_at: datetime):
+    """把分析结果和派生内容合并成一个 ai_analysis 写回画作（键与任务队列写回时一致）"""
+    analysis: Dict[str, Any] = dict(results.get(SECTION_ANALYSIS) or {})
+    if analysis:
+        analysis["painting_id"] = painting_id
+        analysis["painting_time_seconds"] = painting_time_seconds
+        analysis["submitted_at"] = submitted_at.isoformat()
+    for section in (SECTION_MIND_MIRROR, SECTION_STORY, SECTION_GUIDANCE):
+        if section in results:
+            analysis[section] = results[section]
+    if not analysis:
+        return
+
+    async with AsyncSessionLocal() as session:
+        painting = await session.get(PaintingEntryORM, painting_id)
+        if painting is not None:
+            painting.ai_analysis = analysis
+            await session.commit()
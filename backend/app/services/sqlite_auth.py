@@ -1,10 +1,11 @@
+import secrets
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
 from jwt import PyJWTError
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer, OAuth2PasswordBearer
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
@@ -15,6 +16,7 @@ from app.schemas.user import UserCreate
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
+ops_token_scheme = HTTPBearer(auto_error=False)
 
 async def get_user_by_email(email: str, db: AsyncSession) -> Optional[User]:
     """通过邮箱查找用户"""
@@ -96,4 +98,19 @@ async def register_new_user(user_create: UserCreate, db: AsyncSession) -> Option
     await db.commit()
     await db.refresh(new_user)
     
-    return new_user
\ No newline at end of file
+    return new_user
+
+async def require_ops_token(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(ops_token_scheme)
+) -> None:
+    """运维接口的访问校验：Bearer 令牌需等于配置的 OPS_API_TOKEN，Prometheus 可用 bearer_token 抓取"""
+    if not settings.OPS_API_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="运维接口未启用，请配置 OPS_API_TOKEN")
+    if credentials is None or not secrets.compare_digest(
+        credentials.credentials.encode("utf-8"), settings.OPS_API_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="运维令牌无效",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
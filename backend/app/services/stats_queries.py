@@ -0,0 +1,149 @@
+"""
+按天聚合的统计查询
+图表接口原先把窗口内的全部记录读成 ORM 对象，再在 Python 里分组求平均、用 list.count 求众数（O(n²)）。
+这里把分组、AVG、COUNT 和众数都交给数据库：每个用户每天一行，Python 只处理 O(天数) 的结果。
+日期按 UTC 划分，与记录写入时使用的 utcnow 一致。
+
+这些语句是 daily_user_stats 汇总表的数据来源（app/services/daily_rollup.py）：写入时按受影响的日期刷新，
+重建时不限日期、不限用户全量汇总；接口读取汇总表，窗口可以是 7 / 30 / 90 / 365 天
+"""
+
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import Float, Integer, case, cast, func, select
+
+from app.db.compat import day_bucket
+from app.models.mood import MoodEntry
+from app.models.sleep import SleepEntry
+from app.models.task import TaskEntry
+from app.models.calendar_note import CalendarNote
+
+DEFAULT_WINDOW_DAYS = 7
+MAX_WINDOW_DAYS = 365
+
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+
+def window_days(days: int, today: Optional[date] = None) -> List[date]:
+    """最近 days 天的日期（含今天），从早到晚"""
+    today = today or datetime.utcnow().date()
+    return [today - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+
+
+def window_start(days: int, today: Optional[date] = None) -> datetime:
+    """窗口第一天的 0 点（UTC）"""
+    return datetime.combine(window_days(days, today)[0], datetime.min.time())
+
+
+def weekday_name(day: date) -> str:
+    return WEEKDAY_NAMES[day.weekday()]
+
+
+def _range_conditions(column, start, end, user_column, user_id) -> list:
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    if user_id is not None:
+        conditions.append(user_column == user_id)
+    return conditions
+
+
+def mood_daily_statement(start: Optional[datetime] = None, end: Optional[datetime] = None, user_id: Optional[int] = None):
+    """
+    每个用户每天一行：record_count、stress_total、avg_stress、mood（当天出现次数最多的心情，次数相同取最近记录的）
+
+    先按 (用户, 天, 心情) 计数，再用窗口函数在每天内排名并汇总当天的记录数和压力总和，
+    只需扫描一次 (user_id, created_at) 索引范围
+    """
+    conditions = _range_conditions(MoodEntry.created_at, start, end, MoodEntry.user_id, user_id)
+    day = day_bucket(MoodEntry.created_at).label("day")
+    per_mood = (
+        select(
+            MoodEntry.user_id,
+            day,
+            MoodEntry.mood,
+            func.count().label("mood_count"),
+            func.sum(MoodEntry.stress_level).label("stress_sum"),
+            func.max(MoodEntry.created_at).label("last_at"),
+        )
+        .where(*conditions)
+        .group_by(MoodEntry.user_id, day, MoodEntry.mood)
+        .subquery()
+    )
+    per_day = (per_mood.c.user_id, per_mood.c.day)
+    ranked = select(
+        per_mood.c.user_id,
+        per_mood.c.day,
+        per_mood.c.mood,
+        func.row_number().over(
+            partition_by=per_day,
+            order_by=(per_mood.c.mood_count.desc(), per_mood.c.last_at.desc())
+        ).label("mood_rank"),
+        # PostgreSQL 上 SUM(bigint) 的结果是 numeric，统一转换类型
+        cast(func.sum(per_mood.c.mood_count).over(partition_by=per_day), Integer).label("record_count"),
+        cast(func.sum(per_mood.c.stress_sum).over(partition_by=per_day), Float).label("stress_total"),
+    ).subquery()
+    return (
+        select(
+            ranked.c.user_id,
+            ranked.c.day,
+            ranked.c.record_count,
+            ranked.c.stress_total,
+            (ranked.c.stress_total / ranked.c.record_count).label("avg_stress"),
+            ranked.c.mood,
+        )
+        .where(ranked.c.mood_rank == 1)
+        .order_by(ranked.c.user_id, ranked.c.day)
+    )
+
+
+def sleep_daily_statement(start: Optional[datetime] = None, end: Optional[datetime] = None, user_id: Optional[int] = None):
+    """每个用户每个睡眠日期一行：record_count、hours_total、avg_hours（sleep_date 是被记录的那一晚的日期）"""
+    conditions = _range_conditions(SleepEntry.sleep_date, start, end, SleepEntry.user_id, user_id)
+    day = day_bucket(SleepEntry.sleep_date).label("day")
+    return (
+        select(
+            SleepEntry.user_id,
+            day,
+            func.count().label("record_count"),
+            func.sum(SleepEntry.sleep_hours).label("hours_total"),
+            func.avg(SleepEntry.sleep_hours).label("avg_hours"),
+        )
+        .where(*conditions)
+        .group_by(SleepEntry.user_id, day)
+        .order_by(SleepEntry.user_id, day)
+    )
+
+
+def task_daily_statement(start: Optional[date] = None, end: Optional[date] = None, user_id: Optional[int] = None):
+    """每个用户每个任务日期一行：record_count、completed_count"""
+    conditions = _range_conditions(TaskEntry.task_date, start, end, TaskEntry.user_id, user_id)
+    return (
+        select(
+            TaskEntry.user_id,
+            TaskEntry.task_date.label("day"),
+            func.count().label("record_count"),
+            cast(func.sum(case((TaskEntry.completed, 1), else_=0)), Integer).label("completed_count"),
+        )
+        .where(*conditions)
+        .group_by(TaskEntry.user_id, TaskEntry.task_date)
+        .order_by(TaskEntry.user_id, TaskEntry.task_date)
+    )
+
+
+def ddl_daily_statement(start: Optional[date] = None, end: Optional[date] = None, user_id: Optional[int] = None):
+    """每个用户每个备注日期一行：stress_score（每天最多一条备注，取最大值只为兼容迁移前的重复数据）"""
+    conditions = _range_conditions(CalendarNote.note_date, start, end, CalendarNote.user_id, user_id)
+    return (
+        select(
+            CalendarNote.user_id,
+            CalendarNote.note_date.label("day"),
+            func.max(CalendarNote.stress_score).label("stress_score"),
+        )
+        .where(*conditions)
+        .group_by(CalendarNote.user_id, CalendarNote.note_date)
+        .order_by(CalendarNote.user_id, CalendarNote.note_date)
+    )
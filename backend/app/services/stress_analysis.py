@@ -5,8 +5,10 @@
 
 from typing import Dict, List, Optional, Any
 from datetime import date, datetime
-import httpx
 from app.core.config import settings
+from app.services.llm_gateway import llm_gateway
+from app.services.llm_scheduler import Priority, estimate_tokens, llm_scheduler
+from app.services.llm_telemetry import llm_telemetry
 
 
 async def analyze_stress_sources(
@@ -167,13 +169,13 @@ async def generate_stress_prescription_with_deepseek(
 请生成压力处方："""
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        client = llm_gateway.get_deepseek_client()
+        tokens = estimate_tokens([{"role": "user", "content": prompt}], 500)
+        async with llm_scheduler.slot("deepseek", Priority.NORMAL, tokens) as usage, \
+                llm_telemetry.track("deepseek", "deepseek-chat", [{"role": "user", "content": prompt}]) as record:
             response = await client.post(
-                f"{settings.DEEPSEEK_BASE_URL}/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}"
-                },
+                "/v1/chat/completions",
+                timeout=30.0,
                 json={
                     "model": "deepseek-chat",
                     "messages": [
@@ -191,13 +193,16 @@ async def generate_stress_prescription_with_deepseek(
                     "stream": False
                 }
             )
-            
+        
             if response.status_code == 200:
                 result = response.json()
+                usage["tokens"] = result.get('usage', {}).get('total_tokens')
+                record.set_usage(result.get('usage'))
                 return result['choices'][0]['message']['content']
             else:
+                record.fail(f"http_{response.status_code}")
                 return f"DeepSeek API 调用失败: {response.status_code}"
-                
+            
     except Exception as e:
         print(f"DeepSeek API 错误: {e}")
         return f"生成压力处方失败: {str(e)}"
@@ -256,14 +261,15 @@ async def generate_stress_prescription_stream(
 请生成压力处方："""
     
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
+        client = llm_gateway.get_deepseek_client()
+        tokens = estimate_tokens([{"role": "user", "content": prompt}], 500)
+        # 名额覆盖整个流式读取过程
+        async with llm_scheduler.slot("deepseek", Priority.NORMAL, tokens), \
+                llm_telemetry.track("deepseek", "deepseek-chat", [{"role": "user", "content": prompt}]) as record:
             async with client.stream(
                 "POST",
-                f"{settings.DEEPSEEK_BASE_URL}/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {settings.DEEPSEEK_API_KEY}"
-                },
+                "/v1/chat/completions",
+                timeout=60.0,
                 json={
                     "model": "deepseek-chat",
                     "messages": [
@@ -282,9 +288,10 @@ async def generate_stress_prescription_stream(
                 }
             ) as response:
                 if response.status_code != 200:
+                    record.fail(f"http_{response.status_code}")
                     yield f"DeepSeek API 调用失败: {response.status_code}"
                     return
-                
+            
                 import json
                 async for line in response.aiter_lines():
                     if line.startswith("data: "):
@@ -297,10 +304,11 @@ async def generate_stress_prescription_stream(
                                 delta = data['choices'][0].get('delta', {})
                                 content = delta.get('content', '')
                                 if content:
+                                    record.add_text(content)
                                     yield content
                         except json.JSONDecodeError:
                             continue
-                            
+                        
     except Exception as e:
         print(f"DeepSeek API 流式错误: {e}")
         yield f"\n\n生成压力处方时出错: {str(e)}"
@@ -0,0 +1,226 @@
+"""
+SQLite 引擎配置档压测脚本
+对比改造前的引擎（echo=True、默认连接池、不设置 PRAGMA）与 dev / prod / bench 配置档
+在读写混合负载下的吞吐量和延迟。负载按接口实际执行的查询构造：
+- 读：画廊列表分页（/paintings/list）、聊天历史（/ai/chat 读取最近消息）、画作详情（/paintings/{id}）
+- 写：保存聊天消息（/ai/chat）、创建画作记录（/paintings/）
+
+用法: python bench_sqlite_profiles.py [--workers 16] [--ops 300] [--write-ratio 0.3]
+每个配置档使用独立的临时数据库，互不影响
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import load_only
+
+from app.db.sqlite_database import Base, DB_PROFILES, create_sqlite_engine
+# 导入全部模型，保证 create_all 建出完整的表和索引
+from app.models.sqlite_user import User
+from app.models.calendar_note import CalendarNote
+from app.models.sleep import SleepEntry
+from app.models.mood import MoodEntry
+from app.models.task import TaskEntry
+from app.models.messenger import MessengerEntry
+from app.models.sqlite_models import PaintingEntryORM
+from app.models.ai import AIChatMessageORM
+
+USERS = 50
+SEED_PAINTINGS_PER_USER = 40
+SEED_MESSAGES_PER_USER = 100
+PAGE_SIZE = 20
+
+# echo=True 的引擎在创建时绑定当时的 sys.stdout，压测期间把 SQL 日志写到这里
+_DEVNULL = open(os.devnull, "w")
+
+
+def build_baseline_engine(database_url: str):
+    """改造前的引擎配置；SQL 日志写到 /dev/null，只计入格式化开销，不计终端输出"""
+    with contextlib.redirect_stdout(_DEVNULL):
+        return create_async_engine(database_url, echo=True, connect_args={"check_same_thread": False})
+
+
+async def seed(session_factory):
+    base = datetime(2026, 1, 1)
+    async with session_factory() as session:
+        for u in range(USERS):
+            user_id = f"user-{u}"
+            for i in range(SEED_PAINTINGS_PER_USER):
+                session.add(PaintingEntryORM(
+                    id=str(uuid.uuid4()),
+                    user_id=user_id,
+                    image_hash=f"{u:032x}{i:032x}",
+                    image_size=100000,
+                    ai_analysis={"content_description": "x" * 2000},
+                    created_at=base + timedelta(hours=i),
+                    submitted_at=base + timedelta(hours=i)
+                ))
+            for i in range(SEED_MESSAGES_PER_USER):
+                session.add(AIChatMessageORM(
+                    user_id=user_id,
+                    conversation_id="bench",
+                    role="user" if i % 2 == 0 else "assistant",
+                    content="消息内容" * 20,
+                    created_at=base + timedelta(minutes=i)
+                ))
+        await session.commit()
+
+
+async def list_paintings(session_factory, user_id: str):
+    async with session_factory() as session:
+        result = await session.execute(
+            select(PaintingEntryORM).where(PaintingEntryORM.user_id == user_id).options(
+                load_only(
+                    PaintingEntryORM.id,
+                    PaintingEntryORM.image_hash,
+                    PaintingEntryORM.image_size,
+                    PaintingEntryORM.painting_time_seconds,
+                    PaintingEntryORM.created_at,
+                    PaintingEntryORM.submitted_at
+                )
+            ).order_by(PaintingEntryORM.created_at.desc(), PaintingEntryORM.id.desc()).limit(PAGE_SIZE + 1)
+        )
+        return result.scalars().all()
+
+
+async def load_chat_history(session_factory, user_id: str):
+    async with session_factory() as session:
+        result = await session.execute(
+            select(AIChatMessageORM).where(AIChatMessageORM.user_id == user_id)
+            .order_by(AIChatMessageORM.created_at.desc(), AIChatMessageORM.id.desc()).limit(60)
+        )
+        return result.scalars().all()
+
+
+async def get_painting(session_factory, user_id: str):
+    async with session_factory() as session:
+        result = await session.execute(
+            select(PaintingEntryORM).where(PaintingEntryORM.user_id == user_id).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+
+async def append_chat(session_factory, user_id: str):
+    now = datetime.utcnow()
+    async with session_factory() as session:
+        session.add_all([
+            AIChatMessageORM(user_id=user_id, conversation_id="bench", role="user", content="最近复习压力很大", created_at=now),
+            AIChatMessageORM(user_id=user_id, conversation_id="bench", role="assistant", content="先深呼吸，我们一起看看" * 10, created_at=now)
+        ])
+        await session.commit()
+
+
+async def create_painting(session_factory, user_id: str):
+    now = datetime.utcnow()
+    async with session_factory() as session:
+        session.add(PaintingEntryORM(
+            id=str(uuid.uuid4()),
+            user_id=user_id,
+            image_hash=uuid.uuid4().hex * 2,
+            image_size=120000,
+            created_at=now,
+            submitted_at=now
+        ))
+        await session.commit()
+
+
+READS = (list_paintings, load_chat_history, get_painting)
+WRITES = (append_chat, create_painting)
+
+
+async def run_workload(session_factory, workers: int, ops: int, write_ratio: float):
+    latencies = {"read": [], "write": []}
+    errors = 0
+
+    async def worker(seed_value: int):
+        nonlocal errors
+        rng = random.Random(seed_value)
+        for _ in range(ops):
+            kind = "write" if rng.random() < write_ratio else "read"
+            operation = rng.choice(WRITES if kind == "write" else READS)
+            user_id = f"user-{rng.randrange(USERS)}"
+            started = time.perf_counter()
+            try:
+                await operation(session_factory, user_id)
+            except Exception as e:
+                errors += 1
+                print(f"  操作失败 {operation.__name__}: {type(e).__name__}: {e}", file=sys.stderr)
+                continue
+            latencies[kind].append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(workers)))
+    return time.perf_counter() - started, latencies, errors
+
+
+def _p95(values):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=20)[-1] * 1000 if len(values) >= 20 else max(values) * 1000
+
+
+async def bench_profile(name: str, workers: int, ops: int, write_ratio: float):
+    with tempfile.TemporaryDirectory() as directory:
+        database_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'bench.db')}"
+        if name == "baseline":
+            engine = build_baseline_engine(database_url)
+        else:
+            with contextlib.redirect_stdout(_DEVNULL):
+                engine = create_sqlite_engine(database_url, name)
+        session_factory = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            await seed(session_factory)
+            elapsed, latencies, errors = await run_workload(session_factory, workers, ops, write_ratio)
+        finally:
+            await engine.dispose()
+
+    total = len(latencies["read"]) + len(latencies["write"])
+    return {
+        "profile": name,
+        "ops_per_sec": total / elapsed if elapsed else 0.0,
+        "read_p95_ms": _p95(latencies["read"]),
+        "write_p95_ms": _p95(latencies["write"]),
+        "errors": errors,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="SQLite 引擎配置档读写混合压测")
+    parser.add_argument("--workers", type=int, default=16, help="并发协程数")
+    parser.add_argument("--ops", type=int, default=300, help="每个协程执行的操作数")
+    parser.add_argument("--write-ratio", type=float, default=0.3, help="写操作比例")
+    parser.add_argument("--profiles", default="baseline," + ",".join(DB_PROFILES), help="逗号分隔的配置档")
+    args = parser.parse_args()
+
+    print(f"并发 {args.workers}，每协程 {args.ops} 次操作，写比例 {args.write_ratio:.0%}")
+    results = []
+    for name in args.profiles.split(","):
+        result = await bench_profile(name.strip(), args.workers, args.ops, args.write_ratio)
+        results.append(result)
+        print(
+            f"{result['profile']:>8}: {result['ops_per_sec']:8.1f} ops/s  "
+            f"读 p95 {result['read_p95_ms']:7.2f}ms  写 p95 {result['write_p95_ms']:7.2f}ms  失败 {result['errors']}"
+        )
+
+    baseline = next((r for r in results if r["profile"] == "baseline"), None)
+    if baseline and baseline["ops_per_sec"]:
+        for result in results:
+            if result is not baseline:
+                print(f"{result['profile']} 相对改造前吞吐量: {result['ops_per_sec'] / baseline['ops_per_sec']:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,479 @@
+"""
+数据库后端兼容性检查
+分别在 SQLite 和 PostgreSQL 上执行全部迁移，再通过 HTTP 调用各路由中读写数据库的接口，
+确认两种后端的行为一致（JSON 列、upsert、游标分页、日期时间列等）。
+
+PostgreSQL 的来源（按顺序）：
+- --postgres-url 指定的数据库（例如本地容器: docker run -e POSTGRES_PASSWORD=pw -p 5432:5432 postgres:16，
+  然后 --postgres-url postgresql+asyncpg://postgres:pw@localhost:5432/postgres）
+- 已安装 pgserver 时自动启动一个临时的嵌入式 PostgreSQL（pip install pgserver）
+都没有时只检查 SQLite，并提示 PostgreSQL 未检查
+
+调用大模型的接口（分析、故事、聊天等）不在检查范围内，只检查它们落库用到的服务函数。
+
+用法: python check_db_backends.py [--postgres-url URL] [--skip-postgres]
+有接口失败时以非零状态退出
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _png_data_url() -> str:
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (320, 240), (200, 120, 80)).save(buffer, format="PNG")
+    return "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+class Checker:
+    def __init__(self):
+        self.failures = 0
+
+    def expect(self, name: str, response, status_code: int = 200):
+        ok = response.status_code == status_code
+        detail = "" if ok else f" -> {response.status_code} {response.text[:200]}"
+        print(f"  {'OK  ' if ok else 'FAIL'} {name}{detail}")
+        self.failures += not ok
+        return response
+
+    def assert_true(self, name: str, condition: bool, detail: str = ""):
+        print(f"  {'OK  ' if condition else 'FAIL'} {name}{'' if condition else ' -> ' + detail}")
+        self.failures += not condition
+
+
+async def exercise_routers(client, checker: Checker):
+    email = f"compat-{uuid.uuid4().hex[:8]}@example.com"
+    response = checker.expect("POST /auth/register", await client.post(
+        "/api/v1/auth/register", json={"email": email, "username": "compat", "password": "secret123"}))
+    token = response.json().get("access_token")
+    checker.expect("POST /auth/login", await client.post(
+        "/api/v1/auth/login", data={"username": email, "password": "secret123"}))
+    client.headers["Authorization"] = f"Bearer {token}"
+    user_id = int(checker.expect("GET /auth/me", await client.get("/api/v1/auth/me")).json()["id"])
+    checker.expect("PUT /users/me", await client.put(
+        "/api/v1/users/me", json={"selected_subjects": ["数学", "英语"], "ai_companion_style": "gentle"}))
+
+    # 心情
+    mood = checker.expect("POST /moods/", await client.post(
+        "/api/v1/moods/", json={"mood": "anxious", "stress_level": 7, "notes": "模拟考"})).json()
+    checker.expect("GET /moods/", await client.get("/api/v1/moods/"))
+    checker.expect("GET /moods/latest", await client.get("/api/v1/moods/latest"))
+    checker.expect("GET /moods/weekly-scores", await client.get("/api/v1/moods/weekly-scores"))
+    checker.expect("GET /moods/weekly-stats", await client.get("/api/v1/moods/weekly-stats"))
+    stats = checker.expect("GET /moods/weekly-stats?days=90", await client.get(
+        "/api/v1/moods/weekly-stats", params={"days": 90})).json()
+    checker.assert_true("按天聚合心情统计", len(stats.get("weekly_data", [])) == 90 and stats.get("total_records") == 1
+                        and stats["weekly_data"][-1]["mood"] == "anxious", str(stats)[:200])
+    checker.expect("GET /moods/{id}", await client.get(f"/api/v1/moods/{mood['id']}"))
+    checker.expect("DELETE /moods/{id}", await client.delete(f"/api/v1/moods/{mood['id']}"), 204)
+
+    # 任务
+    task = checker.expect("POST /tasks/", await client.post("/api/v1/tasks/", json={"text": "背单词"})).json()
+    checker.expect("GET /tasks/today", await client.get("/api/v1/tasks/today"))
+    checker.expect("PUT /tasks/{id}", await client.put(f"/api/v1/tasks/{task['id']}", json={"completed": True}))
+    # 删除任务接口尚未实现，固定返回 501
+    checker.expect("DELETE /tasks/{id}", await client.delete(f"/api/v1/tasks/{task['id']}"), 501)
+
+    # 睡眠
+    checker.expect("POST /sleeps/", await client.post("/api/v1/sleeps/", json={"sleep_hours": 6.5}))
+    checker.expect("GET /sleeps/today", await client.get("/api/v1/sleeps/today"))
+    checker.expect("GET /sleeps/weekly-data", await client.get("/api/v1/sleeps/weekly-data"))
+    sleep_days = checker.expect("GET /sleeps/weekly-data?days=30", await client.get(
+        "/api/v1/sleeps/weekly-data", params={"days": 30})).json()
+    checker.assert_true("按天聚合睡眠数据", [day["sleep_hours"] for day in sleep_days.get("data", []) if day["has_data"]] == [6.5],
+                        str(sleep_days)[:200])
+    checker.expect("GET /sleeps/", await client.get("/api/v1/sleeps/"))
+
+    # 日历备注：同一天提交两次应更新同一条记录
+    today = date.today()
+    note_body = {"note_date": today.isoformat(), "note_text": "政治", "progress": 20,
+                 "ddl_date": (today + timedelta(days=3)).isoformat()}
+    first = checker.expect("POST /calendar-notes/", await client.post("/api/v1/calendar-notes/", json=note_body), 201).json()
+    second = checker.expect("POST /calendar-notes/ (upsert)", await client.post(
+        "/api/v1/calendar-notes/", json={**note_body, "note_text": "政治+英语"}), 201).json()
+    checker.assert_true("calendar upsert 保留同一条记录", first.get("id") == second.get("id")
+                        and second.get("note_text") == "政治+英语", f"{first} / {second}")
+    checker.expect("GET /calendar-notes/", await client.get("/api/v1/calendar-notes/"))
+    checker.expect("GET /calendar-notes/date/{date}", await client.get(f"/api/v1/calendar-notes/date/{today}"))
+    checker.expect("PUT /calendar-notes/{id}", await client.put(
+        f"/api/v1/calendar-notes/{second['id']}", json={"progress": 60}))
+    checker.expect("GET /calendar-notes/stress-scores/range", await client.get(
+        "/api/v1/calendar-notes/stress-scores/range",
+        params={"start_date": (today - timedelta(days=7)).isoformat(), "end_date": today.isoformat()}))
+    checker.expect("POST /calendar-notes/recalculate-all-stress", await client.post(
+        "/api/v1/calendar-notes/recalculate-all-stress"))
+    checker.expect("DELETE /calendar-notes/date/{date}", await client.delete(f"/api/v1/calendar-notes/date/{today}"), 204)
+    checker.expect("POST /calendar-notes/ (明天)", await client.post("/api/v1/calendar-notes/", json={
+        **note_body, "note_date": (today + timedelta(days=1)).isoformat()}), 201)
+    await check_daily_rollup(checker, user_id)
+
+    # 画作：相同图片只存一份，JSON 列、游标分页、图片与缩略图
+    data_url = _png_data_url()
+    painting_ids = []
+    for seconds in (30, 60, 90):
+        painting = checker.expect("POST /paintings/", await client.post(
+            "/api/v1/paintings/", json={"image_data_url": data_url, "painting_time_seconds": seconds})).json()
+        painting_ids.append(painting.get("id"))
+    image_hash = painting.get("image_hash")
+    checker.expect("GET /paintings/", await client.get("/api/v1/paintings/"))
+    page = checker.expect("GET /paintings/list", await client.get("/api/v1/paintings/list", params={"limit": 2})).json()
+    next_page = checker.expect("GET /paintings/list?cursor", await client.get(
+        "/api/v1/paintings/list", params={"limit": 2, "cursor": page.get("next_cursor")})).json()
+    listed = [item["id"] for item in page.get("items", []) + next_page.get("items", [])]
+    checker.assert_true("画廊分页覆盖全部画作且不重复", sorted(listed) == sorted(painting_ids), str(listed))
+    checker.expect("GET /paintings/{id}", await client.get(f"/api/v1/paintings/{painting_ids[0]}"))
+    checker.expect("GET /paintings/images/{hash}", await client.get(f"/api/v1/paintings/images/{image_hash}"))
+    checker.expect("GET /paintings/images/{hash}/thumbnail", await client.get(
+        f"/api/v1/paintings/images/{image_hash}/thumbnail"))
+    checker.expect("GET /paintings/images/{hash} 未登录", await client.get(
+        f"/api/v1/paintings/images/{image_hash}", headers={"Authorization": ""}), 401)
+    checker.expect("GET /paintings/images/{hash} 非本人画作", await client.get(
+        f"/api/v1/paintings/images/{'0' * 64}"), 404)
+
+    await exercise_services(client, checker, painting_ids[0], data_url)
+
+    checker.expect("DELETE /paintings/{id}", await client.delete(f"/api/v1/paintings/{painting_ids[0]}"), 204)
+    checker.assert_true("删除画作时一并删除特征和分析缓存", await _painting_derived_rows(painting_ids[0]) == 0)
+    checker.assert_true("仍被引用的图片保留", await _blob_hashes(image_hash) == {"image": True, "thumbnail": True})
+    for painting_id in painting_ids[1:]:
+        checker.expect("DELETE /paintings/{id} (共用图片)", await client.delete(f"/api/v1/paintings/{painting_id}"), 204)
+    checker.assert_true("最后一个引用删除后图片和缩略图一并删除",
+                        await _blob_hashes(image_hash) == {"image": False, "thumbnail": False})
+
+    # 心语信使：消息由大模型接口写入，这里直接落库后检查读取接口
+    message_id = await _insert_message()
+    checker.expect("GET /messengers/history", await client.get("/api/v1/messengers/history"))
+    checker.expect("GET /messengers/message/{id}", await client.get(f"/api/v1/messengers/message/{message_id}"))
+    checker.expect("GET /messengers/emotion-stats", await client.get("/api/v1/messengers/emotion-stats"))
+    checker.expect("DELETE /messengers/message/{id}", await client.delete(f"/api/v1/messengers/message/{message_id}"), 204)
+
+
+async def check_daily_rollup(checker: Checker, user_id: int):
+    """写入时增量刷新的汇总行应与按原始记录重建的结果一致"""
+    from sqlalchemy import select
+    from app.db.sqlite_database import AsyncSessionLocal
+    from app.models.daily_user_stats import DailyUserStats
+    from app.services.daily_rollup import rebuild_user_daily_stats
+
+    columns = [column for column in DailyUserStats.__table__.columns if column.name not in ("id", "updated_at")]
+
+    async def snapshot():
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(*columns).where(
+                DailyUserStats.user_id == user_id,
+                # 删除记录后留下的全零行不影响读取，重建时不会生成
+                (DailyUserStats.mood_count + DailyUserStats.sleep_count + DailyUserStats.task_count > 0)
+                | DailyUserStats.ddl_stress_score.isnot(None)
+            ).order_by(DailyUserStats.stat_date))
+            return [tuple(row) for row in result]
+
+    incremental = await snapshot()
+    async with AsyncSessionLocal() as session:
+        await rebuild_user_daily_stats(session, user_id)
+        await session.commit()
+    rebuilt = await snapshot()
+    checker.assert_true("每日汇总增量刷新与重建一致", incremental == rebuilt and len(rebuilt) >= 3,
+                        f"{incremental} != {rebuilt}")
+
+
+async def exercise_services(client, checker: Checker, painting_id: str, data_url: str):
+    """大模型接口背后读写数据库的部分：分析缓存、特征 upsert、任务记录与过期清理、聊天历史（缓存和特征随后由删除画作清理）"""
+    from app.db.sqlite_database import AsyncSessionLocal
+    from app.models.sqlite_models import AIJobORM, ImageBlobORM, PaintingFeaturesORM
+    from app.services.ai_jobs import ai_job_queue
+    from app.services.image_store import put_image
+    from app.services.chat_history import append_messages, load_recent_turns
+    from app.services.painting_cache import painting_analysis_cache
+    from app.services.painting_features import compute_painting_features, save_painting_features
+
+    analysis = {"content_description": "暖色调的小屋", "emotions": ["平静"], "score": 0.8}
+    await painting_analysis_cache.store("compat", 0x0F0F0F0F0F0F0F0F, analysis, painting_id=painting_id)
+    cached = await painting_analysis_cache.lookup("compat", 0x0F0F0F0F0F0F0F0E)
+    cached = {key: value for key, value in (cached or {}).items() if key != "cache_distance"}
+    checker.assert_true("分析缓存 JSON 读写一致", cached == analysis, str(cached))
+
+    features = await compute_painting_features(data_url)
+    await save_painting_features(painting_id, "1", features)
+    await save_painting_features(painting_id, "1", {**features, "ink_coverage": 0.5})
+    async with AsyncSessionLocal() as session:
+        saved = await session.get(PaintingFeaturesORM, painting_id)
+        checker.assert_true("画作特征 upsert 覆盖旧值", saved is not None and saved.ink_coverage == 0.5,
+                            str(saved and saved.ink_coverage))
+
+        job_id = str(uuid.uuid4())
+        session.add(AIJobORM(
+            id=job_id, kind="story", user_id="1", painting_id=painting_id, status="succeeded",
+            payload={"painting_id": painting_id}, result={"healing_story": "小屋里的灯亮着"},
+            attempts=1, created_at=datetime.utcnow(), finished_at=datetime.utcnow()
+        ))
+        await session.commit()
+    job = checker.expect("GET /paintings/jobs/{id}", await client.get(f"/api/v1/paintings/jobs/{job_id}")).json()
+    checker.assert_true("任务结果 JSON 读写一致", job.get("result") == {"healing_story": "小屋里的灯亮着"}, str(job))
+
+    # 过期任务清理：只删除超过保留期的已结束任务，不再被引用的任务图片一并删除
+    async with AsyncSessionLocal() as session:
+        old_job_id = str(uuid.uuid4())
+        image_hash = await put_image(session, "image/png", b"compat-job-image")
+        session.add(AIJobORM(
+            id=old_job_id, kind="mind_mirror", user_id="1", status="failed", payload={}, image_hash=image_hash,
+            attempts=1, created_at=datetime.utcnow() - timedelta(days=ai_job_queue.retention_days + 1)
+        ))
+        await session.commit()
+    swept = await ai_job_queue.sweep()
+    async with AsyncSessionLocal() as session:
+        remaining = [await session.get(AIJobORM, old_job_id), await session.get(AIJobORM, job_id),
+                     await session.get(ImageBlobORM, image_hash)]
+    checker.assert_true("清理过期任务及其图片", swept == 1 and remaining[0] is None and remaining[1] is not None
+                        and remaining[2] is None, f"{swept} {remaining}")
+
+    await check_concurrent_release(checker)
+
+    await append_messages("1", [{"role": "user", "content": "好累"}, {"role": "assistant", "content": "先休息一下"}])
+    turns = await load_recent_turns("1", 10)
+    checker.assert_true("聊天历史读写", len(turns) >= 2, str(turns))
+
+
+async def check_concurrent_release(checker: Checker):
+    """
+    一个事务重新上传同一图片并在新任务中引用，提交前另一个事务删除旧任务并释放图片：
+    释放方要等上传方提交后再判断引用，图片不能被删掉
+    """
+    from sqlalchemy import delete
+    from app.db.sqlite_database import AsyncSessionLocal
+    from app.models.sqlite_models import AIJobORM, ImageBlobORM
+    from app.services.image_store import put_image, release_image
+
+    data = b"compat-shared-image"
+    old_job_id, new_job_id = str(uuid.uuid4()), str(uuid.uuid4())
+    async with AsyncSessionLocal() as session:
+        image_hash = await put_image(session, "image/png", data)
+        session.add(AIJobORM(id=old_job_id, kind="mind_mirror", user_id="1", status="succeeded", payload={},
+                             image_hash=image_hash, attempts=1))
+        await session.commit()
+
+    async def release_old_job():
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(AIJobORM).where(AIJobORM.id == old_job_id))
+            await release_image(session, image_hash)
+            await session.commit()
+
+    async with AsyncSessionLocal() as session:
+        await put_image(session, "image/png", data)
+        session.add(AIJobORM(id=new_job_id, kind="mind_mirror", user_id="1", status="queued", payload={},
+                             image_hash=image_hash, attempts=0))
+        await session.flush()
+        releasing = asyncio.create_task(release_old_job())
+        await asyncio.sleep(0.5)
+        await session.commit()
+    await releasing
+
+    async with AsyncSessionLocal() as session:
+        blob = await session.get(ImageBlobORM, image_hash)
+        await session.execute(delete(AIJobORM).where(AIJobORM.id == new_job_id))
+        await release_image(session, image_hash)
+        await session.commit()
+    checker.assert_true("并发释放不删除新任务刚引用的图片", blob is not None)
+
+
+async def _painting_derived_rows(painting_id: str) -> int:
+    from sqlalchemy import func, select
+    from app.db.sqlite_database import AsyncSessionLocal
+    from app.models.sqlite_models import PaintingAnalysisCacheORM, PaintingFeaturesORM
+
+    async with AsyncSessionLocal() as session:
+        features = await session.scalar(
+            select(func.count()).select_from(PaintingFeaturesORM).where(PaintingFeaturesORM.painting_id == painting_id))
+        cached = await session.scalar(
+            select(func.count()).select_from(PaintingAnalysisCacheORM).where(PaintingAnalysisCacheORM.painting_id == painting_id))
+        return features + cached
+
+
+_thumbnail_hashes = {}
+
+
+async def _blob_hashes(image_hash: str) -> dict:
+    """返回原图和缩略图 blob 是否存在（缩略图哈希在第一次调用时记下）"""
+    from app.db.sqlite_database import AsyncSessionLocal
+    from app.models.sqlite_models import ImageBlobORM
+
+    async with AsyncSessionLocal() as session:
+        source = await session.get(ImageBlobORM, image_hash)
+        if source is not None and source.thumbnail_hash:
+            _thumbnail_hashes[image_hash] = source.thumbnail_hash
+        thumbnail_hash = _thumbnail_hashes.get(image_hash)
+        thumbnail = await session.get(ImageBlobORM, thumbnail_hash) if thumbnail_hash else None
+        return {"image": source is not None, "thumbnail": thumbnail is not None}
+
+
+async def _insert_message() -> int:
+    from app.db.sqlite_database import AsyncSessionLocal
+    from app.models.messenger import MessengerEntry
+
+    async with AsyncSessionLocal() as session:
+        entry = MessengerEntry(
+            user_id="1", message_type="text", text_content="最近总是失眠", sender="user",
+            emotion_report={"stress_index": 72, "main_emotions": ["焦虑", "疲惫"], "risk_level": "yellow"},
+            risk_level="yellow", ai_reply_text="我们一起看看作息", created_at=datetime.utcnow()
+        )
+        session.add(entry)
+        await session.flush()
+        message_id = entry.id
+        await session.commit()
+        return message_id
+
+
+def build_app():
+    """只挂载读写数据库的路由；不启动大模型连接池和后台任务 worker"""
+    from fastapi import FastAPI
+    from app.models.sqlite_user import User
+    from app.models.mood import MoodEntry
+    from app.models.task import TaskEntry
+    from app.models.calendar_note import CalendarNote
+    from app.models.sleep import SleepEntry
+    from app.routers import sqlite_auth as auth, users, moods, tasks, paintings, messengers, calendar_notes, sleeps
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/v1/auth")
+    app.include_router(users.router, prefix="/api/v1/users")
+    app.include_router(moods.router, prefix="/api/v1/moods")
+    app.include_router(tasks.router, prefix="/api/v1/tasks")
+    app.include_router(paintings.router, prefix="/api/v1/paintings")
+    app.include_router(messengers.router, prefix="/api/v1/messengers")
+    app.include_router(calendar_notes.router, prefix="/api/v1/calendar-notes")
+    app.include_router(sleeps.router, prefix="/api/v1/sleeps")
+    return app
+
+
+async def check_schema_matches_models(checker: Checker, engine):
+    """迁移建出的表结构（表、列、可空性、索引）与当前 ORM 模型一致：迁移步骤不引用模型，靠这里发现遗漏"""
+    from sqlalchemy import inspect
+    from app.db.sqlite_database import Base
+    # 导入全部模型，保证 Base.metadata 完整
+    from app.models.sqlite_user import User
+    from app.models.messenger import MessengerEntry
+    from app.models.mood import MoodEntry
+    from app.models.task import TaskEntry
+    from app.models.calendar_note import CalendarNote
+    from app.models.sleep import SleepEntry
+    from app.models.sqlite_models import PaintingEntryORM, ImageBlobORM, AIJobORM, PaintingAnalysisCacheORM, PaintingFeaturesORM
+    from app.models.ai import AIChatMessageORM
+    from app.models.daily_user_stats import DailyUserStats
+
+    def _compare(sync_conn) -> list:
+        inspector = inspect(sync_conn)
+        problems = []
+        existing_tables = set(inspector.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                problems.append(f"缺少表 {table.name}")
+                continue
+            columns = {column["name"]: column for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    problems.append(f"{table.name} 缺少列 {column.name}")
+                elif not column.primary_key and columns[column.name]["nullable"] != column.nullable:
+                    problems.append(f"{table.name}.{column.name} 可空性不一致")
+            extra = set(columns) - {column.name for column in table.columns}
+            if extra:
+                problems.append(f"{table.name} 多出列 {', '.join(sorted(extra))}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            missing = {index.name for index in table.indexes} - indexes
+            if missing:
+                problems.append(f"{table.name} 缺少索引 {', '.join(sorted(missing))}")
+        return problems
+
+    async with engine.connect() as conn:
+        problems = await conn.run_sync(_compare)
+    checker.assert_true("迁移建出的表结构与模型一致", not problems, "; ".join(problems))
+
+
+async def run_backend() -> int:
+    """在子进程中执行：DATABASE_URL 已由父进程设置"""
+    import httpx
+    from app.db.migrations import LATEST_VERSION, get_schema_version
+    from app.db.sqlite_database import create_tables, engine
+
+    checker = Checker()
+    try:
+        await create_tables()
+        version = await get_schema_version(engine)
+        checker.assert_true("迁移到最新版本", version == LATEST_VERSION, f"{version} != {LATEST_VERSION}")
+        await check_schema_matches_models(checker, engine)
+        # 第二次启动应直接跳过
+        await create_tables()
+        async with httpx.AsyncClient(app=build_app(), base_url="http://compat") as client:
+            await exercise_routers(client, checker)
+    finally:
+        await engine.dispose()
+    return checker.failures
+
+
+def check_in_subprocess(label: str, database_url: str) -> int:
+    """每个后端单独一个进程：引擎和会话工厂在导入时按 DATABASE_URL 创建"""
+    print(f"[{label}]")
+    env = {**os.environ, "DATABASE_URL": database_url, "DB_PROFILE": "prod"}
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--run-backend"], cwd=BACKEND_DIR, env=env)
+    return result.returncode
+
+
+def start_embedded_postgres(directory: str):
+    """返回 (asyncpg URL, 服务对象)；未安装 pgserver 时返回 (None, None)"""
+    try:
+        import pgserver
+    except ImportError:
+        return None, None
+    server = pgserver.get_server(os.path.join(directory, "pgdata"), cleanup_mode="stop")
+    server.psql("CREATE DATABASE compat;")
+    uri = server.get_uri("compat")
+    return uri.replace("postgresql://", "postgresql+asyncpg://", 1), server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查 SQLite / PostgreSQL 两种后端下各路由的数据库读写")
+    parser.add_argument("--postgres-url", help="postgresql+asyncpg:// 形式的数据库 URL，检查会在其中建表并写入数据")
+    parser.add_argument("--skip-postgres", action="store_true", help="只检查 SQLite")
+    parser.add_argument("--run-backend", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_backend:
+        failures = asyncio.run(run_backend())
+        sys.exit(1 if failures else 0)
+
+    failed = []
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_url = f"sqlite+aiosqlite:///{os.path.join(directory, 'compat.db')}"
+        if check_in_subprocess("sqlite", sqlite_url):
+            failed.append("sqlite")
+
+        if not args.skip_postgres:
+            postgres_url, server = args.postgres_url, None
+            if not postgres_url:
+                postgres_url, server = start_embedded_postgres(directory)
+            if postgres_url:
+                try:
+                    if check_in_subprocess("postgresql", postgres_url):
+                        failed.append("postgresql")
+                finally:
+                    if server is not None:
+                        server.cleanup()
+            else:
+                print("[postgresql] 未检查：请指定 --postgres-url 或安装 pgserver")
+
+    print("全部后端检查通过" if not failed else f"检查失败: {', '.join(failed)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+流式 JSON 字段校验检查
+流式接口用 validate_field 逐个校验刚解析完成的字段并立即发送，结束后再用 validate_fields 校验整个结果。
+两者对同一个值的结论必须一致，否则客户端先收到一个值、最终结果里又是另一个值：
+- 字段约束（min_length、Literal 等）在单字段校验时同样生效，空的 voice_script 不能作为有效字段发送
+- 单字段判为有效的值，整体校验后保持不变；判为无效的值，整体校验后被替换成默认值
+
+不调用大模型，不需要数据库。
+
+用法: python check_json_stream.py
+有检查失败时以非零状态退出
+"""
+
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Checker:
+    def __init__(self):
+        self.failures = 0
+
+    def assert_true(self, name: str, condition: bool, detail: str = ""):
+        print(f"  {'OK  ' if condition else 'FAIL'} {name}{'' if condition else ' -> ' + detail}")
+        self.failures += not condition
+
+
+def check_emergency_guidance(checker: Checker):
+    from app.schemas.emotional_aid import EmergencyGuidanceOutput
+    from app.services.ai import EMERGENCY_GUIDANCE_DEFAULTS
+    from app.services.json_stream import validate_field, validate_fields
+
+    print("[EmergencyGuidanceOutput]")
+    valid, _ = validate_field(EmergencyGuidanceOutput, "voice_script", "")
+    checker.assert_true("空的 voice_script 校验不通过", not valid)
+
+    cases = [
+        ("voice_script", ""),
+        ("voice_script", "慢慢吸气"),
+        ("voice_script", 123),
+        ("visual_prompt", ""),
+        ("visual_prompt", "海边的清晨"),
+        ("music_type", "relaxing_piano"),
+        ("music_type", "rock"),
+    ]
+    for key, value in cases:
+        valid, normalized = validate_field(EmergencyGuidanceOutput, key, value)
+        final = getattr(validate_fields(EmergencyGuidanceOutput, {key: value}, EMERGENCY_GUIDANCE_DEFAULTS), key)
+        expected = normalized if valid else EMERGENCY_GUIDANCE_DEFAULTS[key]
+        checker.assert_true(
+            f"{key}={value!r}: 单字段{'有效' if valid else '无效'}，与整体校验结果一致",
+            final == expected,
+            f"{final!r} != {expected!r}"
+        )
+
+
+def main():
+    sys.path.insert(0, BACKEND_DIR)
+    checker = Checker()
+    check_emergency_guidance(checker)
+    print("全部通过" if not checker.failures else f"{checker.failures} 项检查失败")
+    sys.exit(1 if checker.failures else 0)
+
+
+if __name__ == "__main__":
+    main()
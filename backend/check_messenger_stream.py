@@ -0,0 +1,197 @@
+"""
+消息流式回复检查
+用 llm_stub_server 的固定回复代替大模型，调用 /messengers/send-message/stream，
+分别检查合并模式、分步模式、高风险消息和合并调用中途失败：
+- 事件顺序：emotion_report -> reply_delta / reply_field -> ai_reply -> [DONE]
+- 拼接 reply_delta（最后一次 reply_reset 之后的）得到的是回复正文（empathy_text + 空行 + cognitive_guidance），
+  不含任何 JSON 语法；高风险时第一个片段就是危机干预提示
+- 最终 ai_reply 与逐个发送的 reply_field 一致，消息已保存
+- 合并调用发出部分正文后失败时先发送 reply_reset，再重新流式生成回复
+
+桩服务通过 ASGI 直接挂到网关的 HTTP 客户端上，不需要单独启动；数据库使用临时 SQLite 文件。
+
+用法: python check_messenger_stream.py
+有检查失败时以非零状态退出
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 键名、引号、括号、冒号分隔的键值对：正文里出现这些说明把模型输出的 JSON 原样发给了客户端
+JSON_SYNTAX = re.compile(r'[{}\[\]"]|\w+"?\s*:\s*["\[{]|empathy_text|cognitive_guidance|ai_reply')
+
+
+class Checker:
+    def __init__(self):
+        self.failures = 0
+
+    def assert_true(self, name: str, condition: bool, detail: str = ""):
+        print(f"  {'OK  ' if condition else 'FAIL'} {name}{'' if condition else ' -> ' + detail}")
+        self.failures += not condition
+
+
+def attach_stub_llm():
+    """让网关的 DashScope 客户端请求进程内的桩服务（不限速、无首字延迟）"""
+    import argparse
+
+    import httpx
+    from openai import AsyncOpenAI
+
+    from app.core.config import settings
+    from app.services.llm_gateway import llm_gateway
+    from llm_stub_server import StubConfig, create_app
+
+    stub_args = argparse.Namespace(
+        latency="fixed:0", tokens_per_sec=0, error_rate=0, error_status=500,
+        image_latency_ms=0, max_tokens_cap=2000,
+    )
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(StubConfig(stub_args))))
+    settings.OPENAI_API_KEY = "stub"
+    llm_gateway._http_client = http_client
+    llm_gateway._client = AsyncOpenAI(api_key="stub", base_url="http://llm-stub/v1", http_client=http_client)
+
+
+NORMAL_TEXT = "最近复习进度落后，晚上总是睡不好"
+CRISIS_TEXT = "复习完全跟不上，我真的受不了了"
+
+
+def fail_first_stream_after(deltas: int):
+    """让下一次 stream_text 在产出 deltas 个片段后抛出异常，之后的调用恢复正常"""
+    from app.services.llm_gateway import llm_gateway
+
+    original = llm_gateway.stream_text
+
+    async def failing_stream(*args, **kwargs):
+        llm_gateway.stream_text = original
+        sent = 0
+        async for delta in original(*args, **kwargs):
+            if sent == deltas:
+                raise ConnectionError("stream interrupted")
+            sent += 1
+            yield delta
+
+    llm_gateway.stream_text = failing_stream
+
+
+async def read_events(client, combined: bool, text: str = NORMAL_TEXT):
+    events = []
+    async with client.stream("POST", "/api/v1/messengers/send-message/stream", data={
+        "message_type": "text",
+        "text_content": text,
+        "combined_mode": str(combined).lower(),
+    }) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            payload = line[len("data: "):]
+            events.append("[DONE]" if payload == "[DONE]" else json.loads(payload))
+    return events
+
+
+def check_events(label: str, events, checker: Checker, crisis: bool = False, expect_reset: bool = False,
+                 min_deltas: int = 2):
+    types = [event if event == "[DONE]" else event["type"] for event in events]
+    checker.assert_true(
+        f"{label}: {'发送' if expect_reset else '没有'} reply_reset", ("reply_reset" in types) == expect_reset, str(types)
+    )
+    # 客户端收到 reply_reset 时丢弃之前的片段和字段，只检查最后一次 reset 之后的内容
+    if "reply_reset" in types:
+        last_reset = len(types) - 1 - types[::-1].index("reply_reset")
+        events = events[:1] + events[last_reset + 1:]
+        types = types[:1] + types[last_reset + 1:]
+    checker.assert_true(f"{label}: 没有 error 事件", "error" not in types, str(events[-2:]))
+    checker.assert_true(f"{label}: emotion_report 最先发送", types[:1] == ["emotion_report"], str(types[:3]))
+    checker.assert_true(f"{label}: 以 ai_reply、[DONE] 结束", types[-2:] == ["ai_reply", "[DONE]"], str(types[-2:]))
+    if "ai_reply" not in types:
+        return
+
+    reply_data = events[types.index("ai_reply")]["data"]
+    checker.assert_true(f"{label}: 消息已保存", reply_data.get("message_id") is not None, str(reply_data.get("message_id")))
+    reply = reply_data["ai_reply"]
+    text = "".join(event["content"] for event in events if event != "[DONE]" and event["type"] == "reply_delta")
+    deltas = types.count("reply_delta")
+    checker.assert_true(f"{label}: 回复正文分 {deltas} 段流式发送", deltas >= min_deltas, str(deltas))
+    checker.assert_true(f"{label}: reply_delta 不含 JSON 语法", not JSON_SYNTAX.search(text), repr(text[:120]))
+    expected = f"{reply['empathy_text']}\n\n{reply['cognitive_guidance']}"
+    checker.assert_true(f"{label}: reply_delta 拼接后等于回复正文", text == expected, f"{text!r} != {expected!r}")
+    if crisis:
+        from app.routers.messengers import crisis_reply_prefix
+        first_delta = next((event["content"] for event in events[1:] if event != "[DONE]" and event["type"] == "reply_delta"), "")
+        checker.assert_true(f"{label}: 第一个片段是危机干预提示", first_delta == crisis_reply_prefix("red"), repr(first_delta[:40]))
+
+    fields = {event["key"]: event["value"] for event in events if event != "[DONE]" and event["type"] == "reply_field"}
+    checker.assert_true(
+        f"{label}: reply_field 与最终回复一致",
+        bool(fields) and all(reply.get(key) == value for key, value in fields.items()),
+        str(fields)
+    )
+    first_field = types.index("reply_field") if "reply_field" in types else len(types)
+    checker.assert_true(f"{label}: reply_field 在 ai_reply 之前发送", first_field < types.index("ai_reply"))
+
+
+def build_app():
+    from fastapi import FastAPI
+    # User 的关系引用这些模型，只挂载部分路由时需手动导入
+    from app.models.mood import MoodEntry
+    from app.models.task import TaskEntry
+    from app.models.calendar_note import CalendarNote
+    from app.models.sleep import SleepEntry
+    from app.routers import sqlite_auth as auth, messengers
+
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/v1/auth")
+    app.include_router(messengers.router, prefix="/api/v1/messengers")
+    return app
+
+
+async def run() -> int:
+    import httpx
+    from app.db.sqlite_database import create_tables, engine
+    from app.services.llm_gateway import llm_gateway
+
+    checker = Checker()
+    attach_stub_llm()
+    try:
+        await create_tables()
+        async with httpx.AsyncClient(app=build_app(), base_url="http://messenger") as client:
+            response = await client.post("/api/v1/auth/register", json={
+                "email": f"stream-{uuid.uuid4().hex[:8]}@example.com", "username": "stream", "password": "secret123"
+            })
+            client.headers["Authorization"] = f"Bearer {response.json().get('access_token')}"
+            for label, combined in (("合并模式", True), ("分步模式", False)):
+                print(f"[{label}]")
+                check_events(label, await read_events(client, combined), checker)
+                print(f"[{label}，高风险]")
+                check_events(label, await read_events(client, combined, CRISIS_TEXT), checker, crisis=True)
+            for label, combined in (("合并模式中途失败", True), ("分步模式中途失败", False)):
+                print(f"[{label}]")
+                # 情绪报告和部分正文发出之后中断
+                fail_first_stream_after(120 if combined else 40)
+                # 分步模式中途失败时改用默认回复，正文整段发送一次
+                check_events(label, await read_events(client, combined), checker, expect_reset=True,
+                             min_deltas=2 if combined else 1)
+    finally:
+        await llm_gateway.aclose()
+        await engine.dispose()
+    return checker.failures
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        # 引擎在导入时按 DATABASE_URL 创建，必须先设置
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(directory, 'stream.db')}"
+        sys.path.insert(0, BACKEND_DIR)
+        failures = asyncio.run(run())
+    print("全部通过" if not failures else f"{failures} 项检查失败")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+检查热点查询的执行计划
+对各接口实际使用的查询执行 EXPLAIN QUERY PLAN，断言每条都通过预期的索引做范围查找，
+没有全表扫描，也没有为排序额外建临时 B 树。检查两种数据库：
+- fresh: 按当前模型新建的数据库
+- upgraded: 模拟旧版本数据库（没有版本记录和复合索引、日历备注有重复日期），执行全部迁移之后的结果
+
+用法: python check_query_plans.py [--database 已有数据库路径]
+有查询不满足时以非零状态退出
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import desc, select, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import load_only
+
+from app.db.migrations import run_migrations
+from app.db.sqlite_database import Base, create_sqlite_engine
+from app.models.sqlite_user import User
+from app.models.mood import MoodEntry
+from app.models.task import TaskEntry
+from app.models.sleep import SleepEntry
+from app.models.calendar_note import CalendarNote
+from app.models.messenger import MessengerEntry
+from app.models.sqlite_models import PaintingEntryORM
+from app.models.ai import AIChatMessageORM
+from app.models.daily_user_stats import DailyUserStats
+
+USER_ID = 1
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+WEEK_AGO = NOW - timedelta(days=7)
+TODAY = date(2026, 3, 1)
+
+
+def hot_queries():
+    """(接口, 查询语句, 预期使用的索引)，语句与对应路由中的写法一致"""
+    return [
+        ("GET /moods/", select(MoodEntry).where(MoodEntry.user_id == USER_ID)
+            .order_by(desc(MoodEntry.created_at)), "ix_mood_entries_user_created"),
+        ("GET /moods/latest", select(MoodEntry).where(MoodEntry.user_id == USER_ID)
+            .order_by(desc(MoodEntry.created_at)).limit(1), "ix_mood_entries_user_created"),
+        ("GET /moods/weekly-stats", select(DailyUserStats).where(
+            DailyUserStats.user_id == USER_ID, DailyUserStats.stat_date >= WEEK_AGO.date()
+        ).order_by(DailyUserStats.stat_date), "uq_daily_user_stats_user_date"),
+        ("GET /sleeps/", select(SleepEntry).where(SleepEntry.user_id == USER_ID)
+            .order_by(desc(SleepEntry.created_at)), "ix_sleep_entries_user_created"),
+        ("GET /sleeps/today", select(SleepEntry).where(
+            SleepEntry.user_id == USER_ID,
+            SleepEntry.created_at >= NOW.replace(hour=0),
+            SleepEntry.created_at < NOW.replace(hour=0) + timedelta(days=1)
+        ), "ix_sleep_entries_user_created"),
+        ("GET /sleeps/weekly-data", select(DailyUserStats).where(
+            DailyUserStats.user_id == USER_ID, DailyUserStats.stat_date >= WEEK_AGO.date()
+        ).order_by(DailyUserStats.stat_date), "uq_daily_user_stats_user_date"),
+        ("POST /sleeps/ 刷新汇总", select(SleepEntry).where(
+            SleepEntry.user_id == USER_ID, SleepEntry.sleep_date >= WEEK_AGO, SleepEntry.sleep_date < NOW
+        ), "ix_sleep_entries_user_sleep_date"),
+        ("GET /tasks/today", select(TaskEntry).where(
+            TaskEntry.user_id == USER_ID, TaskEntry.task_date == TODAY
+        ), "ix_task_entries_user_date"),
+        ("GET /calendar-notes/", select(CalendarNote).where(CalendarNote.user_id == USER_ID)
+            .order_by(CalendarNote.note_date), "uq_calendar_notes_user_date"),
+        ("GET /calendar-notes/date/{date}", select(CalendarNote).where(
+            CalendarNote.user_id == USER_ID, CalendarNote.note_date == TODAY
+        ), "uq_calendar_notes_user_date"),
+        ("GET /calendar-notes/stress-scores/range", select(CalendarNote).where(
+            CalendarNote.user_id == USER_ID,
+            CalendarNote.note_date >= TODAY - timedelta(days=30),
+            CalendarNote.note_date <= TODAY
+        ), "uq_calendar_notes_user_date"),
+        ("GET /paintings/list", select(PaintingEntryORM).where(PaintingEntryORM.user_id == str(USER_ID)).options(
+            load_only(PaintingEntryORM.id, PaintingEntryORM.image_hash, PaintingEntryORM.created_at)
+        ).order_by(PaintingEntryORM.created_at.desc(), PaintingEntryORM.id.desc()).limit(21),
+            "ix_painting_entries_user_created"),
+        ("POST /ai/chat 历史", select(AIChatMessageORM).where(AIChatMessageORM.user_id == str(USER_ID))
+            .order_by(AIChatMessageORM.created_at.desc(), AIChatMessageORM.id.desc()).limit(60),
+            "ix_ai_chat_messages_user_created"),
+    ]
+
+
+def check_plan(plan_rows, expected_index):
+    """返回不满足要求的原因列表"""
+    details = [row[3] for row in plan_rows]
+    problems = []
+    if not any(f"INDEX {expected_index} " in detail + " " for detail in details):
+        problems.append(f"未使用索引 {expected_index}")
+    for detail in details:
+        if detail.startswith("SCAN "):
+            problems.append(f"全表扫描: {detail}")
+        if "TEMP B-TREE" in detail:
+            problems.append(f"额外排序: {detail}")
+    return problems
+
+
+async def explain_all(engine, label: str) -> int:
+    failures = 0
+    print(f"[{label}]")
+    async with engine.connect() as conn:
+        for endpoint, statement, expected_index in hot_queries():
+            sql = str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+            rows = (await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))).all()
+            problems = check_plan(rows, expected_index)
+            status = "OK  " if not problems else "FAIL"
+            print(f"  {status} {endpoint}: {' | '.join(row[3] for row in rows)}")
+            for problem in problems:
+                print(f"       -> {problem}")
+            failures += bool(problems)
+    return failures
+
+
+async def seed(engine):
+    """写入少量数据，让检查在非空表上进行"""
+    async with engine.begin() as conn:
+        for user_id in range(1, 21):
+            for day in range(30):
+                created_at = NOW - timedelta(days=day)
+                await conn.execute(MoodEntry.__table__.insert().values(
+                    user_id=user_id, mood="calm", stress_level=5, created_at=created_at))
+                await conn.execute(SleepEntry.__table__.insert().values(
+                    user_id=user_id, sleep_hours=7.0, sleep_date=created_at - timedelta(days=1), created_at=created_at))
+                await conn.execute(TaskEntry.__table__.insert().values(
+                    user_id=user_id, text="复习", completed=False, task_date=created_at.date(), created_at=created_at))
+
+
+async def check_fresh(directory: str) -> int:
+    engine = create_sqlite_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'fresh.db')}", "bench")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await seed(engine)
+        return await explain_all(engine, "fresh")
+    finally:
+        await engine.dispose()
+
+
+async def check_upgraded(directory: str) -> int:
+    engine = create_sqlite_engine(f"sqlite+aiosqlite:///{os.path.join(directory, 'legacy.db')}", "bench")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            # 去掉热点查询依赖的索引，模拟旧版本建出、没有版本记录的数据库
+            for _, _, index_name in hot_queries():
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+            for note_id in range(3):
+                await conn.execute(CalendarNote.__table__.insert().values(
+                    user_id=USER_ID, note_date=TODAY, note_text=f"重复 {note_id}", color="#ffffff",
+                    progress=0, stress_score=0, created_at=NOW, updated_at=NOW))
+        await seed(engine)
+
+        await run_migrations(engine)
+        failures = await explain_all(engine, "upgraded")
+        async with engine.connect() as conn:
+            notes = (await conn.execute(select(CalendarNote.note_text).where(
+                CalendarNote.user_id == USER_ID, CalendarNote.note_date == TODAY
+            ))).scalars().all()
+        if notes != ["重复 2"]:
+            print(f"  FAIL 重复日历备注未正确去重: {notes}")
+            failures += 1
+        return failures
+    finally:
+        await engine.dispose()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="检查热点查询的执行计划")
+    parser.add_argument("--database", help="额外检查一个已有的 SQLite 数据库文件（只读）")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        failures = await check_fresh(directory) + await check_upgraded(directory)
+    if args.database:
+        engine = create_sqlite_engine(f"sqlite+aiosqlite:///{os.path.abspath(args.database)}", "prod")
+        try:
+            failures += await explain_all(engine, args.database)
+        finally:
+            await engine.dispose()
+
+    print("全部查询均走索引" if not failures else f"{failures} 条查询不满足要求")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,97 @@
+"""
+AI 响应缓存检查
+ResponseCache 每个键写入 variants_per_key 次回复后开始命中：
+- 模型输出固定（每次回复相同）时，重复写入同样计入次数，键能写满并命中，缓存里只保存一条
+- 回复各不相同时，写满之后命中，返回值来自已收集的回复
+- get_or_generate 在键写满之前继续调用 generate，写满之后不再调用
+
+不调用大模型，不需要数据库。
+
+用法: python check_response_cache.py
+有检查失败时以非零状态退出
+"""
+
+import asyncio
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class Checker:
+    def __init__(self):
+        self.failures = 0
+
+    def assert_true(self, name: str, condition: bool, detail: str = ""):
+        print(f"  {'OK  ' if condition else 'FAIL'} {name}{'' if condition else ' -> ' + detail}")
+        self.failures += not condition
+
+
+def check_repeated_puts(checker: Checker):
+    from app.services.ai_cache import ResponseCache
+
+    print("[重复写入相同回复]")
+    cache = ResponseCache(name="check", max_entries=8, ttl_seconds=60, variants_per_key=3)
+    reply = {"voice_script": "慢慢吸气，再慢慢呼气"}
+    for _ in range(2):
+        cache.put("key", reply)
+    checker.assert_true("写入次数不足时未命中", cache.get("key") is None)
+    cache.put("key", reply)
+    cached = cache.get("key")
+    checker.assert_true("写满后命中", cached == reply, repr(cached))
+    checker.assert_true("相同回复只保存一条", len(cache._entries["key"]["variants"]) == 1,
+                        str(len(cache._entries["key"]["variants"])))
+    if cached is not None:
+        cached["voice_script"] = "被调用方修改"
+        checker.assert_true("返回副本，修改不影响缓存", cache.get("key") == reply)
+
+
+def check_distinct_puts(checker: Checker):
+    from app.services.ai_cache import ResponseCache
+
+    print("[写入不同回复]")
+    cache = ResponseCache(name="check", max_entries=8, ttl_seconds=60, variants_per_key=3)
+    replies = [{"n": n} for n in range(5)]
+    for reply in replies[:2]:
+        cache.put("key", reply)
+    checker.assert_true("写入次数不足时未命中", cache.get("key") is None)
+    for reply in replies[2:]:
+        cache.put("key", reply)
+    variants = cache._entries["key"]["variants"]
+    checker.assert_true("最多保存 variants_per_key 条", variants == replies[:3], repr(variants))
+    checker.assert_true("命中返回已收集的回复", all(cache.get("key") in replies[:3] for _ in range(10)))
+
+
+def check_get_or_generate(checker: Checker):
+    from app.services.ai_cache import ResponseCache
+
+    print("[get_or_generate，模型输出固定]")
+    cache = ResponseCache(name="check", max_entries=8, ttl_seconds=60, variants_per_key=3)
+    calls = 0
+
+    async def generate():
+        nonlocal calls
+        calls += 1
+        return {"voice_script": "慢慢吸气"}, True
+
+    async def run():
+        for _ in range(10):
+            await cache.get_or_generate("key", generate)
+
+    asyncio.run(run())
+    checker.assert_true("只调用 variants_per_key 次大模型", calls == 3, str(calls))
+    checker.assert_true("其余请求全部命中", cache.hits == 7, str(cache.stats()))
+
+
+def main():
+    sys.path.insert(0, BACKEND_DIR)
+    checker = Checker()
+    check_repeated_puts(checker)
+    check_distinct_puts(checker)
+    check_get_or_generate(checker)
+    print("全部通过" if not checker.failures else f"{checker.failures} 项检查失败")
+    sys.exit(1 if checker.failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+本地大模型桩服务（OpenAI chat-completions 协议）
+用于离线压测：按提示词关键字返回与 services/ai.py、messenger_ai.py、stress_analysis.py 解析逻辑匹配的固定内容，
+支持 SSE 流式输出、多模态 image_url 消息，以及可配置的首字延迟分布、输出速度与错误率
+
+用法:
+    python llm_stub_server.py --port 9000 --latency lognormal:800,0.4 --tokens-per-sec 40 --error-rate 0.01
+
+    # 让应用改为调用桩服务（API Key 填任意非空值即可）
+    OPENAI_API_BASE=http://127.0.0.1:9000/v1 OPENAI_API_KEY=stub \
+    DEEPSEEK_BASE_URL=http://127.0.0.1:9000 DEEPSEEK_API_KEY=stub \
+    python run_server.py
+
+延迟分布格式:
+    fixed:毫秒                 固定延迟
+    uniform:最小毫秒,最大毫秒   均匀分布
+    normal:均值毫秒,标准差毫秒  正态分布（截断到 0 以上）
+    lognormal:中位数毫秒,sigma  对数正态分布，适合模拟长尾
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+# ---------- 固定回复 ----------
+# 按顺序匹配提示词中的关键字，第一个命中的生效
+
+CANNED_RESPONSES: List[Tuple[str, str]] = [
+    # messenger_ai：合并模式（情绪报告 + 回复）
+    ("并直接给出回复", json.dumps({
+        "emotion_report": {
+            "stress_index": 68,
+            "main_emotions": ["焦虑", "疲惫"],
+            "possible_causes": ["复习进度落后", "睡眠不足"],
+            "risk_level": "yellow",
+            "explanation": "文字中多次提到进度和睡眠，整体压力偏高但情绪仍可调节。",
+            "risk_keywords": []
+        },
+        "ai_reply": {
+            "empathy_text": "听起来你最近真的很辛苦，一边追进度一边还睡不好，会累是很正常的。",
+            "cognitive_guidance": "进度落后不等于失败，把注意力放回今天能完成的一小步上，焦虑会慢慢变小。",
+            "practical_tips": ["睡前30分钟放下手机做4-7-8呼吸", "把明天的任务拆成三个25分钟的番茄钟"],
+            "follow_up_tasks": ["今晚记录一件今天完成的小事"],
+            "resource_links": []
+        }
+    }, ensure_ascii=False)),
+    # messenger_ai：情绪分析
+    ("情绪状态", json.dumps({
+        "stress_index": 66,
+        "main_emotions": ["焦虑", "疲惫"],
+        "possible_causes": ["复习进度落后", "睡眠不足"],
+        "risk_level": "yellow",
+        "explanation": "文字中多次提到进度和睡眠，整体压力偏高但情绪仍可调节。",
+        "risk_keywords": []
+    }, ensure_ascii=False)),
+    # messenger_ai：回复生成
+    ("empathy_text", json.dumps({
+        "empathy_text": "听起来你最近真的很辛苦，会累是很正常的。",
+        "cognitive_guidance": "进度落后不等于失败，先专注今天能完成的一小步。",
+        "practical_tips": ["做5分钟深呼吸", "把任务拆成25分钟的小块"],
+        "follow_up_tasks": ["今晚早睡30分钟"],
+        "resource_links": []
+    }, ensure_ascii=False)),
+    # ai.py：90秒情绪急救
+    ("急救方案", json.dumps({
+        "voice_script": "现在，慢慢吸气，数到四；屏住呼吸，数到四；再缓缓呼气，数到六。感受肩膀一点点放松下来，你是安全的。",
+        "visual_prompt": "清晨的湖面，薄雾轻轻飘动，阳光从远处的山后缓缓升起",
+        "music_type": "nature_sounds"
+    }, ensure_ascii=False)),
+    # ai.py：场景模拟
+    ("进入状态", json.dumps({
+        "preparation_steps": ["深呼吸三次，放松肩颈", "快速浏览一遍知识框架", "对自己说一句积极暗示"],
+        "mindset_guidance": "你已经为这一刻准备了很久，紧张说明你在乎，把它转化为专注。",
+        "visualization_script": "想象自己坐在考场里，拿到试卷后从容地写下第一道题的答案。"
+    }, ensure_ascii=False)),
+    # ai.py：画作额外数据
+    ("mood_radar", json.dumps({
+        "mood_radar": {"焦虑程度": 6, "压力水平": 6, "积极情绪": 5, "创造力": 7, "专注度": 5, "情绪稳定性": 5},
+        "color_analysis": {"emotion_tendency": "冷色为主，略显压抑", "cool_color_ratio": "65%", "warm_color_ratio": "35%", "color_diversity": "适中"},
+        "brush_analysis": {"stroke_characteristics": "线条较密集", "pressure_level": "偏重", "stroke_consistency": "略有断续", "emotional_stability": "中等"},
+        "composition_analysis": {"密度": "偏密，心理负荷较高", "空间利用率": "70%", "中心位置": "偏左", "元素排列方式": "较集中"}
+    }, ensure_ascii=False)),
+    # ai.py：心灵镜像
+    ("积极版本", json.dumps({
+        "positive_image_description": "同样的小屋和树，阳光从云层间洒下，屋前多了一片开满小花的草地，整体色调温暖明亮。",
+        "guidance_text": "看，如果给这里加一缕阳光，是不是感觉充满了希望？"
+    }, ensure_ascii=False)),
+    # ai.py：画作多维度分析
+    ("绘画模式", "  画面中心是一座小屋，周围环绕着高大的树木，元素清晰。\n"
+              "  整体以蓝绿冷色调为主，暖色较少，饱和度中等。\n"
+              "  线条较为密集，局部有反复涂抹的痕迹，力度偏重。\n"
+              "  构图重心偏左，右侧留白较多。\n"
+              "  画面反映出一定的压力与对安全感的需要，建议每天安排固定的放松时间，保持规律作息。"),
+    # ai.py：疗愈故事
+    ("疗愈小故事", "小树在山谷里等了很久的春天。它以为自己长得太慢，直到有一天，一只小鸟落在它的枝头说："
+               "正是你扎得深的根，让你在风里站得这么稳。那天起，小树不再数自己的叶子，而是认真感受每一缕阳光。"),
+    # ai.py：正念绘画引导
+    ("正念绘画引导", "请先闭上眼睛，深深吸一口气，再慢慢呼出。想象一束温暖的橙色光从胸口出发，流向你的手臂和指尖。"
+                "拿起画笔时，不必想着画得好不好，只跟随呼吸的节奏，让线条自然地延展。"),
+    # stress_analysis.py：压力处方（DeepSeek）
+    ("压力处方", "【压力诊断】你当前的压力主要来自任务截止和睡眠不足，整体处于中等偏高水平。\n\n"
+              "【具体建议】\n1. 把本周的DDL按紧急程度排序，每天只盯住最重要的两件事。\n"
+              "2. 保证每晚至少7小时睡眠，睡前一小时不再刷题。\n3. 每学习50分钟起身活动5分钟。\n\n"
+              "【鼓励】你已经走了很远，稳住节奏，就是最好的进步。"),
+    # StressRadar：备考计划
+    ("考研规划", "2025年9月28日-2025年10月4日：英语：背诵核心词汇；政治：学习马克思主义基本原理；专业课一：复习高等数学第一章\n\n"
+              "2025年10月5日-2025年10月11日：英语：阅读理解精读；政治：学习毛泽东思想；专业课一：线性代数基础"),
+    # ai.py：文字情绪分析
+    ("压力指数（0-1之间）", "压力指数: 0.62\n情绪雷达: 焦虑偏高，疲惫明显，积极情绪尚存\n"
+                       "解释: 文本中反复出现对进度的担忧，情绪紧张但仍有改善动力。\n干预建议: 尝试10分钟正念呼吸并适当休息。"),
+]
+
+DEFAULT_RESPONSE = "我在这里陪着你。考研路上有起伏很正常，先照顾好自己，我们一步一步来。"
+
+# 中文按每字 1 token，其他字符约每 4 个字符 1 token
+_TOKEN_PATTERN = re.compile(r"[一-鿿]|[^一-鿿]{1,4}")
+IMAGE_TOKENS = 800
+
+
+def message_text(messages: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """拼接全部消息文本，并统计 image_url 片段数量"""
+    parts: List[str] = []
+    images = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+        elif isinstance(content, list):
+            for part in content:
+                if not isinstance(part, dict):
+                    continue
+                if part.get("type") == "text":
+                    parts.append(str(part.get("text", "")))
+                elif part.get("type") == "image_url":
+                    images += 1
+    return "\n".join(parts), images
+
+
+def pick_response(prompt: str) -> str:
+    for keyword, payload in CANNED_RESPONSES:
+        if keyword in prompt:
+            return payload
+    return DEFAULT_RESPONSE
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_PATTERN.findall(text)
+
+
+# ---------- 延迟与错误注入 ----------
+
+class LatencyModel:
+    """首字延迟分布（秒）"""
+
+    def __init__(self, spec: str):
+        self.spec = spec
+        kind, _, raw = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in raw.split(",") if p.strip()] if raw else []
+        if self.kind not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"不支持的延迟分布: {spec}")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            ms = p[0] if p else 0.0
+        elif self.kind == "uniform":
+            ms = random.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            ms = random.gauss(p[0], p[1])
+        else:
+            ms = random.lognormvariate(math.log(max(p[0], 1e-3)), p[1] if len(p) > 1 else 0.5)
+        return max(0.0, ms) / 1000.0
+
+
+class StubConfig:
+    def __init__(self, args: argparse.Namespace):
+        self.latency = LatencyModel(args.latency)
+        self.tokens_per_sec = args.tokens_per_sec
+        self.error_rate = args.error_rate
+        self.error_status = args.error_status
+        self.image_latency = args.image_latency_ms / 1000.0
+        self.max_tokens_cap = args.max_tokens_cap
+
+
+def create_app(config: StubConfig) -> FastAPI:
+    app = FastAPI(title="LLM Stub Server")
+    stats: Counter = Counter()
+
+    def error_response() -> JSONResponse:
+        error_type = "rate_limit_error" if config.error_status == 429 else "server_error"
+        return JSONResponse(
+            status_code=config.error_status,
+            content={"error": {"message": "stub injected error", "type": error_type, "code": config.error_status}},
+        )
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "stub-model")
+        messages = body.get("messages", [])
+        stream = bool(body.get("stream"))
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        prompt, images = message_text(messages)
+        stats["requests"] += 1
+        stats[f"model:{model}"] += 1
+
+        if config.error_rate > 0 and random.random() < config.error_rate:
+            stats["errors"] += 1
+            return error_response()
+
+        tokens = tokenize(pick_response(prompt))
+        max_tokens = body.get("max_tokens") or config.max_tokens_cap
+        tokens = tokens[:max(1, min(int(max_tokens), config.max_tokens_cap))]
+        usage = {
+            "prompt_tokens": len(tokenize(prompt)) + images * IMAGE_TOKENS,
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        ttft = config.latency.sample() + images * config.image_latency
+        per_token = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+
+        if not stream:
+            await asyncio.sleep(ttft + per_token * len(tokens))
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        async def event_stream():
+            await asyncio.sleep(ttft)
+            yield chunk({"role": "assistant", "content": ""})
+            for token in tokens:
+                if per_token:
+                    await asyncio.sleep(per_token)
+                yield chunk({"content": token})
+            yield chunk({}, "stop")
+            if include_usage:
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                           "model": model, "choices": [], "usage": usage}
+                yield f"data: {json.dumps(payload)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    # DashScope 兼容模式的 base_url 带 /v1，DeepSeek 客户端请求 /v1/chat/completions，两种路径都支持
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/chat/completions", chat_completions, methods=["POST"])
+
+    @app.get("/v1/models")
+    async def list_models():
+        models = ["qwen-plus", "qwen-vl-plus", "qwen3-omni-flash", "deepseek-chat", "deepseek-v3"]
+        return {"object": "list", "data": [{"id": m, "object": "model", "owned_by": "stub"} for m in models]}
+
+    @app.get("/stats")
+    async def get_stats():
+        return dict(stats)
+
+    return app
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="OpenAI 协议的本地大模型桩服务")
+    parser.add_argument("--host", default=os.getenv("LLM_STUB_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("LLM_STUB_PORT", "9000")))
+    parser.add_argument("--latency", default=os.getenv("LLM_STUB_LATENCY", "lognormal:600,0.5"),
+                        help="首字延迟分布，如 fixed:300 / uniform:200,800 / normal:500,100 / lognormal:600,0.5")
+    parser.add_argument("--tokens-per-sec", type=float, default=float(os.getenv("LLM_STUB_TOKENS_PER_SEC", "50")),
+                        help="输出速度，0 表示不限速")
+    parser.add_argument("--error-rate", type=float, default=float(os.getenv("LLM_STUB_ERROR_RATE", "0")),
+                        help="注入错误的概率 0-1")
+    parser.add_argument("--error-status", type=int, default=int(os.getenv("LLM_STUB_ERROR_STATUS", "500")),
+                        help="注入错误的 HTTP 状态码，如 500 / 429")
+    parser.add_argument("--image-latency-ms", type=float, default=float(os.getenv("LLM_STUB_IMAGE_LATENCY_MS", "300")),
+                        help="每张图片额外增加的首字延迟")
+    parser.add_argument("--max-tokens-cap", type=int, default=2000, help="单次回复的最大 token 数")
+    parser.add_argument("--seed", type=int, default=None, help="随机种子，便于复现压测结果")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.seed is not None:
+        random.seed(args.seed)
+    print(f"LLM 桩服务启动: http://{args.host}:{args.port}  延迟={args.latency}  "
+          f"速度={args.tokens_per_sec} tok/s  错误率={args.error_rate}")
+    uvicorn.run(create_app(StubConfig(args)), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,44 @@
+"""
+重建每日汇总表 daily_user_stats
+汇总表随心情、睡眠、任务、日历备注的写入自动刷新，迁移到版本 6 时也会回填一次；
+这个脚本用于手动回填（例如直接往数据库导入了原始记录之后）或修复不一致的数据
+
+用法（在 backend 目录下执行）：
+  python rebuild_daily_stats.py                      重建全部用户
+  python rebuild_daily_stats.py --user-id 3          只重建指定用户
+  python rebuild_daily_stats.py --database 路径或URL   重建指定的数据库
+"""
+
+import argparse
+import asyncio
+import sys
+
+from app.db.migrations import LATEST_VERSION, get_schema_version
+from app.db.sqlite_database import create_database_engine
+from app.services.daily_rollup import rebuild_daily_stats
+from migrate import resolve_database_url
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="重建每日汇总表 daily_user_stats")
+    parser.add_argument("--user-id", type=int, help="只重建指定用户，默认全部用户")
+    parser.add_argument("--database", help="SQLite 数据库文件路径或数据库 URL，默认使用后端配置的数据库")
+    args = parser.parse_args()
+
+    engine = create_database_engine(resolve_database_url(args.database), "prod")
+    try:
+        version = await get_schema_version(engine)
+        if version < LATEST_VERSION:
+            print(f"数据库版本 {version} 低于最新版本 {LATEST_VERSION}，请先执行 python migrate.py upgrade")
+            sys.exit(1)
+        await rebuild_daily_stats(engine, user_id=args.user_id)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except Exception as e:
+        print(f"重建失败: {type(e).__name__}: {e}")
+        sys.exit(1)